@@ -7,20 +7,46 @@ cli commands:
         test_case - Fully qualified path to test. Examples:
                     tests.builder_test.G3dBuilderTest
                     tests.builder_test.G3dBuilderTest.test_flags
+    - bench blender_exe [--runs N] [--threshold T] [--scale S] [--baseline file] [--update]
+        runs the benchmark suite N times and compares median timings of the each case with the baseline,
+        exits with 1 if the throughput of any case drops more than T (0.2 = 20%).
+        --update - overwrites the baseline by the current results
+    - unittest
+        runs blender-free tests (unittest_modules) with the current python, requires numpy
+    - bench-encoder [--floats N...] [--repeat N] [--animations N] [--output file]
+        runs blender-free encoder micro-benchmark with the current python
 """
 
+import argparse
 import hashlib
+import json
+import statistics
 import subprocess
 import sys
 import os
 import platform
+import tempfile
 from pathlib import Path
 import shutil
-from typing import List
+from typing import Any, Dict, List
 
 addon_package = 'g3d_exporter'
 source_dir = Path("g3d_exporter")
 build_path = Path("build")
+benchmark_baseline = Path("tests/benchmark_baseline.json")
+benchmark_stages = ["build", "encode_json", "encode_binary"]
+# tests which can run without blender
+unittest_modules = [
+    "tests.baker_test",
+    "tests.cache_test",
+    "tests.dirty_test",
+    "tests.encoder_test",
+    "tests.fcurve_test",
+    "tests.keyframes_test",
+    "tests.meshopt_test",
+    "tests.snapshot_test",
+    "tests.spatial_test",
+]
 
 def addon_install_path():
     osname = platform.system()
@@ -106,6 +132,131 @@ def run_tests(blend_exe: str, args: List[str]):
     subprocess.run([blend_exe, "--factory-startup", "--background", "-noaudio", "--python", script, "--", *args])
 
 
+def run_benchmark(blend_exe: str, runs: int, scale: int) -> List[List[Dict[str, Any]]]:
+    """runs benchmark suite in blender, returns results of the each run"""
+    with tempfile.TemporaryDirectory() as tmp:
+        out = Path(tmp) / "bench.json"
+
+        env = dict(os.environ)
+        env["G3D_BENCH_RUNS"] = str(runs)
+        env["G3D_BENCH_SCALE"] = str(scale)
+        env["G3D_BENCH_OUTPUT"] = str(out)
+
+        script = "tests/runner.py"
+        result = subprocess.run([blend_exe, "--factory-startup", "--background", "-noaudio", "--python", script,
+                                 "--", "tests.benchmark.BenchmarkSuite"], env=env)
+
+        # failed case is missing in the results
+        if result.returncode != 0:
+            raise ValueError(f"benchmark suite failed with code {result.returncode}, check the blender output")
+
+        if not out.exists():
+            raise ValueError("benchmark suite has no results, check the blender output")
+
+        with open(out) as f:
+            return json.load(f)
+
+
+def summarize_benchmark(runs: List[List[Dict[str, Any]]]) -> Dict[str, Dict[str, Dict[str, float]]]:
+    """median and relative spread (max - min) / median of the each case stage"""
+    timings: Dict[str, Dict[str, List[float]]] = dict()
+
+    for results in runs:
+        for result in results:
+            case = timings.setdefault(result['case'], dict())
+            for stage in benchmark_stages:
+                case.setdefault(stage, list()).append(result[stage])
+
+    summary = dict()
+    for case, stages in timings.items():
+        summary[case] = dict()
+        for stage, values in stages.items():
+            median = statistics.median(values)
+            spread = (max(values) - min(values)) / median if median > 0 else 0.0
+            summary[case][stage] = {'median': median, 'spread': spread, 'runs': len(values)}
+    return summary
+
+
+def compare_benchmark(summary: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """returns regressions, the throughput is inverse of the median time. Missing case or stage is a regression"""
+    regressions = list()
+
+    print("{:<16} {:<14} {:>12} {:>12} {:>10} {:>8}".format("CASE", "STAGE", "BASE(ms)", "NOW(ms)", "THRPT", "SPREAD"))
+
+    for case, stages in summary.items():
+        base_stages = baseline.get(case, None)
+        if base_stages is None:
+            print(f"{case:<16} no baseline")
+            continue
+
+        for stage, now in stages.items():
+            base = base_stages.get(stage, None)
+            if base is None or now['median'] <= 0:
+                continue
+
+            # < 1.0 - slower than baseline
+            ratio = base['median'] / now['median']
+            print("{:<16} {:<14} {:>12.2f} {:>12.2f} {:>9.1f}% {:>7.1f}%"
+                  .format(case, stage, base['median'] * 1000, now['median'] * 1000, (ratio - 1) * 100,
+                          now['spread'] * 100))
+
+            if ratio < 1.0 - threshold:
+                regressions.append(f"{case}/{stage}: throughput {(ratio - 1) * 100:.1f}% "
+                                   f"(threshold -{threshold * 100:.1f}%)")
+
+    for case, base_stages in baseline.items():
+        stages = summary.get(case, None)
+        if stages is None:
+            regressions.append(f"{case}: missing in the results")
+            continue
+        for stage in base_stages:
+            if stage not in stages:
+                regressions.append(f"{case}/{stage}: missing in the results")
+    return regressions
+
+
+def bench(blend_exe: str, args: List[str]) -> int:
+    parser = argparse.ArgumentParser(prog="build.py bench")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--threshold", type=float, default=0.2)
+    parser.add_argument("--scale", type=int, default=1)
+    parser.add_argument("--baseline", type=Path, default=benchmark_baseline)
+    parser.add_argument("--update", action='store_true')
+    opt = parser.parse_args(args)
+
+    summary = summarize_benchmark(run_benchmark(blend_exe, opt.runs, opt.scale))
+
+    if opt.update:
+        with open(opt.baseline, 'w') as f:
+            json.dump({'scale': opt.scale, 'cases': summary}, f, indent=2)
+        print(f"update baseline {opt.baseline}")
+        return 0
+
+    if not opt.baseline.exists():
+        print(f"baseline not found: {opt.baseline}, create it with --update")
+        return 1
+
+    with open(opt.baseline) as f:
+        baseline = json.load(f)
+
+    if baseline['scale'] != opt.scale:
+        print(f"baseline scale {baseline['scale']} does not match --scale {opt.scale}")
+        return 1
+
+    regressions = compare_benchmark(summary, baseline['cases'], opt.threshold)
+    for r in regressions:
+        print(f"REGRESSION {r}")
+    return 1 if regressions else 0
+
+
+def run_unittests() -> int:
+    return subprocess.run([sys.executable, "-m", "unittest", *unittest_modules]).returncode
+
+
+def run_encoder_benchmark(args: List[str]) -> int:
+    return subprocess.run([sys.executable, "-m", "tests.encoder_benchmark", *args]).returncode
+
+
 def export_demo(blend_exe: str):
     blend_file = "demo/demo.blend"
     script = "demo/export_script.py"
@@ -130,6 +281,12 @@ if __name__ == "__main__":
         uninstall()
     elif cmd == "test":
         run_tests(sys.argv[2], sys.argv[3:])
+    elif cmd == "bench":
+        sys.exit(bench(sys.argv[2], sys.argv[3:]))
+    elif cmd == "unittest":
+        sys.exit(run_unittests())
+    elif cmd == "bench-encoder":
+        sys.exit(run_encoder_benchmark(sys.argv[2:]))
     elif cmd == "demo":
         export_demo(sys.argv[2])
     else:
@@ -13,39 +13,67 @@ bl_info = {
     "wiki_url": "https://github.com/haz00/blender-g3d-exporter",
 }
 
-if "bpy" in locals():
+if "bpy" in locals() and bpy is not None:
     import importlib
+    # dependencies go first, builder and export_operator import the reloaded modules
+    importlib.reload(g3d_exporter.profiler)
+    importlib.reload(g3d_exporter.puremath)
     importlib.reload(g3d_exporter.common)
+    importlib.reload(g3d_exporter.model)
+    importlib.reload(g3d_exporter.fcurve)
+    importlib.reload(g3d_exporter.keyframes)
+    importlib.reload(g3d_exporter.baker)
+    importlib.reload(g3d_exporter.meshopt)
+    importlib.reload(g3d_exporter.spatial)
+    importlib.reload(g3d_exporter.snapshot)
+    importlib.reload(g3d_exporter.cache)
+    importlib.reload(g3d_exporter.dirty)
     importlib.reload(g3d_exporter.encoder)
     importlib.reload(g3d_exporter.builder)
-    importlib.reload(g3d_exporter.model)
     importlib.reload(g3d_exporter.export_operator)
-    importlib.reload(g3d_exporter.profiler)
 else:
-    import bpy
-    import g3d_exporter.common
-    import g3d_exporter.encoder
-    import g3d_exporter.builder
-    import g3d_exporter.model
-    import g3d_exporter.export_operator
-    import g3d_exporter.profiler
+    try:
+        import bpy
+    except ImportError:
+        # imported outside of blender: only model, encoder and simpleubjson are usable
+        bpy = None
+
+    if bpy is not None:
+        import g3d_exporter.profiler
+        import g3d_exporter.puremath
+        import g3d_exporter.common
+        import g3d_exporter.model
+        import g3d_exporter.fcurve
+        import g3d_exporter.keyframes
+        import g3d_exporter.baker
+        import g3d_exporter.meshopt
+        import g3d_exporter.spatial
+        import g3d_exporter.snapshot
+        import g3d_exporter.cache
+        import g3d_exporter.dirty
+        import g3d_exporter.encoder
+        import g3d_exporter.builder
+        import g3d_exporter.export_operator
 
-classes = [
-    export_operator.G3djExportOperator,
-    export_operator.G3dbExportOperator,
-]
+if bpy is not None:
+    classes = [
+        export_operator.G3djExportOperator,
+        export_operator.G3dbExportOperator,
+    ]
 
 
 def register():
     for cls in classes:
         bpy.utils.register_class(cls)
     export_operator.register()
+    dirty.register()
 
 
 def unregister():
     for cls in classes:
         bpy.utils.unregister_class(cls)
     export_operator.unregister()
+    dirty.unregister()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,410 @@
+# <pep8 compliant>
+"""
+Animation baking on the keyframe data extracted from blender.
+Doesn't refer to blender data, so the actions can be baked by the worker processes.
+"""
+import concurrent.futures
+import logging
+import multiprocessing
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from g3d_exporter import fcurve, keyframes, model
+from g3d_exporter.common import *
+from g3d_exporter.profiler import profile, span, tracer
+
+log = logging.getLogger(__name__)
+
+
+class BoneCurves(object):
+    """Keyframe data of the single bone in the action"""
+
+    def __init__(self, bone_name: str, rest: Matrix, use_euler: bool, euler_order: str,
+                 loc_data: List[fcurve.CurveData],
+                 scale_data: List[fcurve.CurveData],
+                 quat_data: List[fcurve.CurveData],
+                 euler_data: List[fcurve.CurveData]) -> None:
+        """rest - rest pose relative to parent"""
+        self.bone_name = bone_name
+        self.rest: Matrix = rest
+        self.rest_trs: Tuple[Vector, Quaternion, Vector] = rest.decompose()
+        self.use_euler = use_euler
+        self.euler_order = euler_order
+        self.loc_data = loc_data
+        self.scale_data = scale_data
+        self.quat_data = quat_data
+        self.euler_data = euler_data
+
+    def __getstate__(self):
+        """matrices are sent as rows, so blender and the worker processes use their own math"""
+        state = dict(self.__dict__)
+        state['rest'] = [list(row) for row in self.rest]
+        del state['rest_trs']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.rest = Matrix(state['rest'])
+        self.rest_trs = self.rest.decompose()
+
+    def portable(self) -> bool:
+        """all the curves can be evaluated without blender"""
+        return all(c.supported for c in self.curve_data())
+
+    def curve_data(self) -> List[fcurve.CurveData]:
+        return flatten([self.loc_data, self.scale_data, self.quat_data, self.euler_data])
+
+    def eval_pose(self, frame: float) -> Matrix:
+        return self.eval_poses([frame])[0]
+
+    def channel_data(self) -> Dict[str, List[fcurve.CurveData]]:
+        """curves of the each output channel"""
+        rotation = self.euler_data if self.use_euler else self.quat_data
+        return {'translation': self.loc_data, 'rotation': rotation, 'scaling': self.scale_data}
+
+    def rest_channels(self) -> Dict[str, List[float]]:
+        (loc, rot, sca) = self.rest_trs
+        return {'translation': conv_vec(loc), 'rotation': conv_quat(rot), 'scaling': conv_vec(sca)}
+
+    @profile
+    def eval_trs(self, frames: Sequence[float]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """translations, rotations (xyzw) and scales relative to parent, all the curves are sampled at once"""
+        return (self.eval_channel('translation', frames),
+                self.eval_channel('rotation', frames),
+                self.eval_channel('scaling', frames))
+
+    @profile
+    def eval_channel(self, channel: str, frames: Sequence[float]) -> np.ndarray:
+        """
+        (frames x values) of the channel composed with the rest pose, rotation is xyzw as in the output.
+        Expects uniform rest scale, as bones have.
+        """
+        (rest_loc, rest_rot, rest_sca) = self.rest_trs
+
+        if channel == 'translation':
+            locs = fcurve.sample_curves(self.loc_data, frames, (0.0, 0.0, 0.0)) * list(rest_sca)
+            rot = np.array([list(row) for row in rest_rot.to_matrix()])
+            return locs @ rot.T + list(rest_loc)
+
+        if channel == 'rotation':
+            quats = _quat_mul(np.array(list(rest_rot)), self._sample_quats(frames))
+            return quats[:, [1, 2, 3, 0]]
+
+        return fcurve.sample_curves(self.scale_data, frames, (1.0, 1.0, 1.0)) * list(rest_sca)
+
+    def _sample_quats(self, frames: Sequence[float]) -> np.ndarray:
+        """normalized wxyz"""
+        if self.use_euler:
+            eulers = fcurve.sample_curves(self.euler_data, frames, (0.0, 0.0, 0.0))
+            quats = _euler_to_quats(eulers, self.euler_order)
+        else:
+            quats = fcurve.sample_curves(self.quat_data, frames, (1.0, 0.0, 0.0, 0.0))
+
+        norms = np.linalg.norm(quats, axis=1, keepdims=True)
+        return quats / np.where(norms > 0, norms, 1.0)
+
+
+def _quat_mul(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """hamilton product of wxyz quaternions, broadcasts over the rows"""
+    (aw, ax, ay, az) = np.moveaxis(np.asarray(a), -1, 0)
+    (bw, bx, by, bz) = np.moveaxis(np.asarray(b), -1, 0)
+    return np.stack((aw * bw - ax * bx - ay * by - az * bz,
+                     aw * bx + ax * bw + ay * bz - az * by,
+                     aw * by - ax * bz + ay * bw + az * bx,
+                     aw * bz + ax * by - ay * bx + az * bw), axis=-1)
+
+
+def _euler_to_quats(eulers: np.ndarray, order: str) -> np.ndarray:
+    """(n x 3) angles to wxyz, the first axis of the order is applied first"""
+    half = eulers * 0.5
+    cos = np.cos(half)
+    sin = np.sin(half)
+
+    axes = dict()
+    for idx, axis in enumerate('XYZ'):
+        quat = np.zeros((len(eulers), 4))
+        quat[:, 0] = cos[:, idx]
+        quat[:, idx + 1] = sin[:, idx]
+        axes[axis] = quat
+
+    return _quat_mul(_quat_mul(axes[order[2]], axes[order[1]]), axes[order[0]])
+
+
+class ActionBaker(object):
+    """
+    Creates bone keyframes of single action. Bakes for non-linear.
+    The first keyframe of the each bone will have 0 millis.
+    Populates missing curves (location, rotation, scale) with the rest pose.
+
+    Note that the Keyframe time (in Graph Editor) will be rounded to int,
+    the adaptive sampling keeps sub-frame times and bakes non-linear segments until the error is below the tolerance.
+    """
+    # max difference of the channel values considered as same
+    EPSILON = 1e-6
+    # min distance of the adaptive samples, in frames
+    ADAPTIVE_MIN_STEP = 0.25
+
+    def __init__(self, fps: int, counters: model.G3dCounters, adaptive: keyframes.Tolerance = None):
+        """adaptive - max error of the adaptive sampling, bakes every frame of non-linear segments if None"""
+        self.fps = fps
+        self.counters = counters
+        self.adaptive = adaptive
+
+    @profile
+    def bake(self, bone_curves: List[BoneCurves]) -> List[model.GBoneAnimation]:
+        """all the curves of the each bone are sampled at once into the keyframe arrays"""
+        anims = list()
+        ms_per_frame = 1000.0 / self.fps
+
+        for bone in bone_curves:
+            anim = model.GBoneAnimation(bone.bone_name)
+            curves = bone.curve_data()
+            self.counters.raw_keyframes += sum(len(c) for c in curves)
+
+            if self.adaptive:
+                frames = self._refine(curves, lambda f, b=bone: _trs_rows(b.eval_trs(f)),
+                                      *keyframes.pose_metric(self.adaptive))
+            else:
+                frames = self._timeline(curves)
+
+            if frames:
+                frames = np.asarray(frames, dtype=np.float64)
+                # first keyframe is the start of animation, so it's millis is 0
+                anim.set_keyframes(ms_per_frame * (frames - frames[0]), *bone.eval_trs(frames))
+
+            self.counters.baked_keyframes += anim.keyframe_count()
+            anims.append(anim)
+        return anims
+
+    @profile
+    def bake_channels(self, bone_actions: List[BoneCurves]) -> List[model.GBoneAnimation]:
+        """
+        Separate translation, rotation and scaling tracks, each channel is baked by its own curves.
+        Channels which stay in the rest pose are omitted, constant channels have single keyframe.
+        """
+        anims = list()
+        ms_per_frame = 1000.0 / self.fps
+
+        for bone_action in bone_actions:
+            anim = model.GBoneAnimation(bone_action.bone_name)
+            self.counters.raw_keyframes += sum(len(c) for c in bone_action.curve_data())
+
+            timelines = {name: self._channel_timeline(bone_action, name, curves)
+                         for name, curves in bone_action.channel_data().items()}
+            # channels of the bone share the start
+            start = min((frames[0] for frames in timelines.values() if frames), default=0)
+            rest = bone_action.rest_channels()
+
+            for name, frames in timelines.items():
+                if not frames:
+                    continue
+
+                values = bone_action.eval_channel(name, frames)
+
+                if self._all_same(values, rest[name]):
+                    continue
+
+                if self._all_same(values, values[0]):
+                    frames = frames[:1]
+                    values = values[:1]
+
+                setattr(anim, name, [model.GChannelKeyframe(ms_per_frame * (frame - start), value)
+                                     for frame, value in zip(frames, values.tolist())])
+
+            self.counters.baked_keyframes += anim.key_count()
+            anims.append(anim)
+        return anims
+
+    def _channel_timeline(self, bone_action: 'BoneCurves', channel: str, curves: List[fcurve.CurveData]):
+        if not self.adaptive:
+            return self._timeline(curves)
+
+        (interpolate, close) = keyframes.channel_metrics(self.adaptive)[channel]
+        return self._refine(curves, lambda f: bone_action.eval_channel(channel, f).tolist(), interpolate, close)
+
+    def _refine(self, curves: List[fcurve.CurveData], sample, interpolate, close) -> List[float]:
+        """exact (sub-frame) keyframe times and the adaptive samples between them"""
+        times = fcurve.keyframe_times(curves).tolist()
+        return keyframes.refine(times, sample, interpolate, close, self.ADAPTIVE_MIN_STEP)
+
+    def _all_same(self, values: np.ndarray, value: Sequence[float]) -> bool:
+        same = np.abs(values - value).max(axis=1) <= self.EPSILON
+        if values.shape[1] == 4:
+            # q and -q are the same rotation
+            same |= np.abs(values + value).max(axis=1) <= self.EPSILON
+        return bool(np.all(same))
+
+    def _timeline(self, curves: List[fcurve.CurveData]) -> List[int]:
+        """frames to evaluate"""
+        # if the key true - keyframe will be baked
+        keyframes: Dict[int, bool] = dict()
+
+        # collect the time of all keyframes and decide which should be baked
+        for curve in curves:
+            for x, interpolation in zip(curve.co[:, 0].tolist(), curve.interpolation.tolist()):
+                frame = int(x)
+                must_bake = interpolation != fcurve.LINEAR
+                # must_bake is always primary
+                keyframes[frame] = must_bake or keyframes.get(frame, must_bake)
+
+        timeline: List[int] = sorted(keyframes)
+        frames: List[int] = list()
+
+        for idx, frame in enumerate(timeline):
+            # check if we should bake to the next keyframe
+            if keyframes[frame] and idx + 1 < len(timeline):
+                frames.extend(range(frame, timeline[idx + 1]))
+            else:
+                frames.append(frame)
+        return frames
+
+
+def _trs_rows(trs: Tuple[np.ndarray, np.ndarray, np.ndarray]) -> List[keyframes.Trs]:
+    return list(zip(*(values.tolist() for values in trs)))
+
+
+class BakeOptions(object):
+    def __init__(self, fps: int, animation_format: str = 'KEYFRAMES',
+                 adaptive: Optional[keyframes.Tolerance] = None,
+                 simplify: Optional[keyframes.Tolerance] = None):
+        """adaptive, simplify - tolerances or None if disabled"""
+        self.fps = fps
+        self.animation_format = animation_format
+        self.adaptive = adaptive
+        self.simplify = simplify
+
+    def key(self) -> Tuple:
+        tolerances = tuple((t.translation, t.rotation, t.scale) if t else None for t in (self.adaptive, self.simplify))
+        return (self.fps, self.animation_format) + tolerances
+
+
+class BakeJob(object):
+    """single action of the armature"""
+    def __init__(self, anim_id: str, action: str, bones: List[BoneCurves], opt: BakeOptions):
+        self.anim_id = anim_id
+        self.action = action
+        self.bones = bones
+        self.opt = opt
+
+    def portable(self) -> bool:
+        return all(b.portable() for b in self.bones)
+
+    def track_keys(self) -> List[Tuple]:
+        """
+        Content keys of the bone tracks: the same action, bone, rotation mode, rest pose and options
+        give the same baked track, whichever armature it belongs to.
+        """
+        opt = self.opt.key()
+        return [(self.action, b.bone_name, b.use_euler, b.euler_order,
+                 tuple(round(v, 6) for row in b.rest for v in row), opt)
+                for b in self.bones]
+
+
+@profile
+def bake(job: BakeJob) -> Tuple[model.GAnimation, model.G3dCounters]:
+    """animation may have no bones if the action doesn't change the pose"""
+    counters = model.G3dCounters()
+    anim = model.GAnimation(job.anim_id)
+
+    with span('action', animation=job.anim_id) as sp:
+        baker = ActionBaker(job.opt.fps, counters, job.opt.adaptive)
+        if job.opt.animation_format == 'CHANNELS':
+            bone_anims = baker.bake_channels(job.bones)
+        else:
+            bone_anims = baker.bake(job.bones)
+
+        for bone_anim in bone_anims:
+            if job.opt.simplify:
+                counters.removed_keyframes += keyframes.simplify(bone_anim, job.opt.simplify)
+            if bone_anim.key_count() > 0:
+                anim.bones.append(bone_anim)
+
+        if tracer.enabled:
+            sp.attrs['bones'] = len(anim.bones)
+            sp.attrs['keyframes'] = sum(b.key_count() for b in anim.bones)
+
+    return anim, counters
+
+
+@profile
+def bake_all(jobs: List[BakeJob], workers: int = 0,
+             share: bool = False) -> List[Tuple[model.GAnimation, model.G3dCounters]]:
+    """
+    Results are in the order of jobs. The identical bone tracks are baked once and reused.
+    workers - count of processes for the portable jobs, the others and all with 0 or 1 workers are baked in this process
+    share - animation which tracks are the same as of the previous one has no bones, so it's not written
+    """
+    seen: Set[Tuple] = set()
+    unique_jobs: List[BakeJob] = list()
+    job_keys: List[List[Tuple]] = list()
+    reused: List[int] = list()
+
+    for job in jobs:
+        keys = job.track_keys()
+        job_keys.append(keys)
+
+        bones = list()
+        for key, bone in zip(keys, job.bones):
+            if key not in seen:
+                seen.add(key)
+                bones.append(bone)
+        if bones:
+            unique_jobs.append(BakeJob(job.anim_id, job.action, bones, job.opt))
+        reused.append(len(job.bones) - len(bones))
+
+    # key -> baked track, the tracks which don't change the pose are missing
+    tracks: Dict[Tuple, model.GBoneAnimation] = dict()
+    counters: Dict[str, model.G3dCounters] = dict()
+
+    for job, (anim, job_counters) in zip(unique_jobs, _bake_jobs(unique_jobs, workers)):
+        counters[job.anim_id] = job_counters
+        baked = {b.bone_id: b for b in anim.bones}
+        for key, bone in zip(job.track_keys(), job.bones):
+            if bone.bone_name in baked:
+                tracks[key] = baked[bone.bone_name]
+
+    results = list()
+    shared: Dict[Tuple, str] = dict()
+
+    for job, keys, reused_tracks in zip(jobs, job_keys, reused):
+        anim = model.GAnimation(job.anim_id)
+        # tracks are shared by the animations
+        anim.bones = [tracks[key] for key in keys if key in tracks]
+        job_counters = counters.get(job.anim_id, None) or model.G3dCounters()
+        job_counters.reused_tracks += reused_tracks
+
+        if share and anim.bones:
+            content = tuple(key for key in keys if key in tracks)
+            if content in shared:
+                log.debug("animation %s is shared with %s", anim.id, shared[content])
+                anim.bones = list()
+                anim.shared_with = shared[content]
+                job_counters.shared_animations += 1
+            else:
+                shared[content] = anim.id
+
+        results.append((anim, job_counters))
+    return results
+
+
+def _bake_jobs(jobs: List[BakeJob], workers: int) -> List[Tuple[model.GAnimation, model.G3dCounters]]:
+    if workers <= 1 or len(jobs) <= 1:
+        return [bake(job) for job in jobs]
+
+    results: List[Optional[Tuple[model.GAnimation, model.G3dCounters]]] = [None] * len(jobs)
+
+    # spawn: forked blender process is not safe
+    context = multiprocessing.get_context('spawn')
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        futures = {idx: pool.submit(bake, job) for idx, job in enumerate(jobs) if job.portable()}
+
+        # while the workers are busy
+        for idx, job in enumerate(jobs):
+            if idx not in futures:
+                results[idx] = bake(job)
+
+        for idx, future in futures.items():
+            results[idx] = future.result()
+
+    return results
@@ -2,21 +2,23 @@
 import collections
 import logging
 import math
+import re
 
 import bmesh
 import typing
 import bpy
 
-from mathutils import Euler
 from bpy_extras.node_shader_utils import PrincipledBSDFWrapper
 from bpy_extras.node_shader_utils import ShaderImageTextureWrapper
 
-from typing import Tuple, Set, Dict
+from typing import Tuple, Set, Dict, Iterable, Sequence, Callable, Optional
 import os
 
-from g3d_exporter import model
+import numpy as np
+
+from g3d_exporter import baker, cache, dirty, fcurve, keyframes, meshopt, model, snapshot, spatial
 from g3d_exporter.common import *
-from g3d_exporter.profiler import profile
+from g3d_exporter.profiler import profile, profile_memory, span, tracer
 
 log = logging.getLogger(__name__)
 
@@ -48,7 +50,31 @@ class ModelOptions(object):
         self.add_bone_tip = True
         self.apply_modifiers = True
         self.fps = bpy.context.scene.render.fps
+        self.animation_format = 'KEYFRAMES'
+        self.adaptive_bake = False
+        self.adaptive_error = 0.001
+        self.bake_workers = 0
+        self.share_animations = False
+        self.simplify_keyframes = False
+        self.keyframe_tolerance = keyframes.Tolerance()
         self.primitive_type = 'AUTO'
+        self.optimize_vertex_cache = False # changes the order of the triangles
+        self.optimize_vertex_fetch = True
+        self.measure = False # computes the counters which are only reported (acmr), descriptor or metrics output
+        self.lod_count = 0 # decimated levels after the base mesh
+        self.lod_ratio = 0.5 # faces of the level relative to the previous one
+        self.chunk_faces = 0 # max faces of the spatial chunk node, 0 - mesh isn't split
+        self.incremental = False # reuse meshes converted by the previous exports if their content is the same
+        self.cache_dir = "" # on-disk cache of the converted meshes shared by the sessions, empty - disabled
+        self.cache_size = 512 * 1024 * 1024 # bytes, least recently used meshes are evicted above
+
+
+# options which change the converted meshes, they are the part of the mesh fingerprint
+MESH_OPTIONS = ('use_normal', 'use_color', 'packed_color', 'use_uv', 'flip_uv', 'use_tangent', 'use_binormal',
+                'use_armature', 'bones_per_vertex', 'max_bones_per_nodepart', 'max_vertices_per_mesh',
+                'max_indices_per_meshpart', 'use_shapekeys', 'apply_modifiers', 'primitive_type', 'chunk_faces')
+# options which the records of the dirty tracker depend on
+DIRTY_OPTIONS = MESH_OPTIONS + ('use_material', 'deform_bones_only', 'share_animations')
 
 
 @profile
@@ -60,6 +86,17 @@ def build(opt: ModelOptions) -> model.G3dModel:
     return G3Builder(opt).build()
 
 
+# node id suffix of the level of detail, followed by the level number
+LOD_SUFFIX = "_LOD"
+# temporary modifier which makes the levels
+LOD_MODIFIER = "g3d_lod"
+# node id suffix of the spatial chunk, followed by the chunk number
+CHUNK_SUFFIX = "_chunk"
+
+# primitive types which indices are made of the mesh edges or vertices instead of the faces
+EDGE_PRIMITIVES = ('LINES', 'LINE_STRIP', 'POINTS')
+
+
 class G3MeshData(object):
     def __init__(self, index: int, attributes: Tuple[model.VertexFlag]) -> None:
         self.index = index
@@ -93,10 +130,27 @@ class TextureBuilder(object):
 class G3Data(object):
     def __init__(self):
         self.animations: Dict[str, model.GAnimation] = dict()
+        # shared animation id -> id of the written animation with the same tracks
+        self.animation_aliases: Dict[str, str] = dict()
         self.materials: Dict[str, model.GMaterial] = dict()
         self.meshes: List[G3MeshData] = list()
         self.mesh_node_data: Dict[int, MeshNodeData] = dict()
         self.nodes: List[model.GNode] = list()
+        self.counters = model.G3dCounters()
+        # built on the first armature
+        self.action_index: ActionIndex = None
+        # animation id -> action to bake
+        self.bake_jobs: Dict[str, baker.BakeJob] = dict()
+        # animation id -> animation of the previous export which action wasn't changed
+        self.reused_animations: Dict[str, model.GAnimation] = dict()
+        # animations in the order they were found
+        self.animation_ids: List[str] = list()
+        # mesh_node_data key -> fingerprint of the mesh, incremental export only
+        self.fingerprints: Dict[int, str] = dict()
+        # snapshots used by this build
+        self.snapshot_keys: Set[str] = set()
+        # object name -> converted mesh, for the dirty tracker
+        self.records: Dict[str, dirty.ObjectRecord] = dict()
 
 
 class MaterialBuilder(object):
@@ -177,9 +231,10 @@ class Vertex(object):
 
 
 class NodePartBuilder(object):
-    def __init__(self, material: model.GMaterial, meshpart: MeshpartData) -> None:
+    def __init__(self, material: model.GMaterial, meshpart: MeshpartData, chunk: int = 0) -> None:
         self.material = material
         self.meshpart = meshpart
+        self.chunk = chunk # spatial chunk of the faces
         self.bones: typing.OrderedDict[str, model.BonePart] = collections.OrderedDict()
 
     @profile
@@ -300,6 +355,20 @@ class FaceInfo(object):
             yield Vertex(v_info.vert, tuple(data))
 
 
+class ElementInfo(FaceInfo):
+    """edge or vertex of the line and point primitives, its vertices have no loops"""
+    def __init__(self, vertices: Sequence[int], material: model.GMaterial, opt: ModelOptions) -> None:
+        super().__init__(None, material, opt)
+        self.indices = vertices
+        self.size = len(vertices)
+
+    @profile
+    def setup(self, meta: MeshMetaInfo):
+        for vert_idx in self.indices:
+            self.vertices.append(VertexInfo(meta.mesh.vertices[vert_idx], None, meta.obj, meta.mesh, self.opt))
+        self.size = len(self.vertices)
+
+
 class FaceListener(object):
     def on_new_face(self, face: FaceInfo):
         raise ValueError("not implemented")
@@ -525,6 +594,9 @@ class MeshNodeData(object):
     """Holds data that can be used for multiple nodes"""
     def __init__(self):
         self.parts: List[NodePartBuilder] = list()
+        self.chunks = 1 # nodes of the spatial chunks if there are more than one
+        self.mesh_name = ""
+        self.loops = 0
 
 
 class MeshNodeDataBuilder(object):
@@ -536,6 +608,7 @@ class MeshNodeDataBuilder(object):
         self._nodepart_filters: List[NodePartFilter] = list()
         self._g3mesh: G3MeshData = None # cache
         self._nodepart: NodePartBuilder = None # cache
+        self._chunk = 0 # spatial chunk of the current face
 
     def build(self, obj: bpy.types.Object,
               mesh: bpy.types.Mesh,
@@ -547,22 +620,55 @@ class MeshNodeDataBuilder(object):
             status({'WARNING'}, "Object has no materials: " + obj.name)
             return None
 
-        if not len(mesh.polygons):
+        primitive_type = self._get_primitive_type(obj)
+        if primitive_type == 'POINTS':
+            elements = len(mesh.vertices)
+        elif primitive_type in EDGE_PRIMITIVES:
+            elements = len(mesh.edges)
+        else:
+            elements = len(mesh.polygons)
+
+        if not elements:
             log.warning("object has empty mesh: %s", obj.name)
             status({'WARNING'}, "Object has empty mesh: " + obj.name)
             return None
 
-        meta = self._analyze_mesh(obj, mesh, armature)
-        return self._convert(meta)
+        with span('mesh', object=obj.name, mesh=mesh.name, polygons=len(mesh.polygons)) as sp:
+            meta = self._analyze_mesh(obj, mesh, armature)
+            if primitive_type in EDGE_PRIMITIVES:
+                meshdata = self._convert_elements(meta, primitive_type)
+            else:
+                meshdata = self._convert(meta)
+            meshdata.mesh_name = mesh.name
+            meshdata.loops = len(mesh.loops)
+            self.g3data.counters.input_loops += len(mesh.loops)
+            if tracer.enabled:
+                sp.attrs['loops'] = len(mesh.loops)
+                sp.attrs['indices'] = sum(len(p.meshpart.indices) for p in meshdata.parts)
+                sp.attrs['nodeparts'] = len(meshdata.parts)
+        return meshdata
 
     @profile
+    @profile_memory
     def _convert(self, meta: MeshMetaInfo) -> MeshNodeData:
         """converts blender mesh to g3d mesh"""
         meshdata = MeshNodeData()
         mesh = meta.mesh
         obj = meta.obj
 
-        for polygon in mesh.polygons:
+        # faces of the same chunk are converted together to their own nodeparts
+        order = range(len(mesh.polygons))
+        chunks = None
+        if 0 < self.opt.chunk_faces < len(mesh.polygons):
+            chunks = self._split_faces(mesh)
+            order = np.argsort(chunks, kind='stable').tolist()
+            meshdata.chunks = int(chunks.max()) + 1
+            chunks = chunks.tolist()
+
+        for polygon_idx in order:
+            polygon = mesh.polygons[polygon_idx]
+            if chunks is not None:
+                self._chunk = chunks[polygon_idx]
 
             matslot = obj.material_slots[polygon.material_index]
             material = self._get_material(matslot.material)
@@ -581,8 +687,125 @@ class MeshNodeDataBuilder(object):
 
         return meshdata
 
+    @profile
+    @profile_memory
+    def _convert_elements(self, meta: MeshMetaInfo, primitive_type: str) -> MeshNodeData:
+        """converts the edges or vertices of the mesh, loose ones too, to the lines or points"""
+        meshdata = MeshNodeData()
+        mesh = meta.mesh
+        obj = meta.obj
+
+        if primitive_type == 'POINTS':
+            elements = np.arange(len(mesh.vertices), dtype=np.int64).reshape(-1, 1)
+            materials = self._element_materials(mesh, 'vertex_index', len(mesh.vertices))
+        else:
+            elements = _read_buffer(mesh.edges, 'vertices', np.int64, 2).reshape(-1, 2)
+            materials = self._element_materials(mesh, 'edge_index', len(mesh.edges))
+        materials = np.minimum(materials, len(obj.material_slots) - 1)
+
+        if self._face_listeners:
+            # vertex data of the skinned mesh depends on the bones of its nodepart
+            self._convert_skinned_elements(meta, meshdata, elements, materials)
+        else:
+            vertices = [self._build_element_vertex(meta, vert) for vert in mesh.vertices]
+            for material_index in np.unique(materials).tolist():
+                material = self._get_material(obj.material_slots[material_index].material)
+                self._add_elements(meta, meshdata, vertices, elements[materials == material_index], material)
+
+        if primitive_type == 'LINE_STRIP':
+            for nodepart in meshdata.parts:
+                meshpart = nodepart.meshpart
+                strip = meshopt.chain_lines(meshpart.indices)
+                if strip is None:
+                    log.debug("%s: edges of %s aren't a single chain, use lines", obj.name, meshpart.id)
+                    meshpart.primitive_type = 'LINES'
+                else:
+                    meshpart.indices = strip
+
+        return meshdata
+
+    def _build_element_vertex(self, meta: MeshMetaInfo, vert: bpy.types.MeshVertex) -> Vertex:
+        """vertex of the lines and points, the attributes don't depend on the nodepart without blendweights"""
+        info = VertexInfo(vert, None, meta.obj, meta.mesh, self.opt)
+        data: List[float] = list()
+        for attr in meta.attributes:
+            attr.build(info, data, None)
+        return Vertex(vert, tuple(data))
+
+    @profile
+    def _add_elements(self, meta: MeshMetaInfo, meshdata: MeshNodeData,
+                      vertices: List[Vertex], elements: np.ndarray, material: model.GMaterial):
+        """adds the elements of the same material by the batches fitting into the g3mesh and the meshpart"""
+        size = elements.shape[1]
+        start = 0
+
+        while start < len(elements):
+            # the first element always fits into the found ones
+            element = ElementInfo(elements[start].tolist(), material, self.opt)
+            g3mesh = self._get_g3mesh(meta, element)
+            nodepart = self._get_nodepart(meta, g3mesh, element, meshdata.parts)
+            meshpart = nodepart.meshpart
+
+            batch = elements[start:start + (self.opt.max_indices_per_meshpart - len(meshpart.indices)) // size]
+            (used, first) = np.unique(batch, return_index=True)
+
+            # vertices which aren't in the g3mesh yet, counted by the element using them first
+            new = np.fromiter((hash(vertices[i]) not in g3mesh.vertex_index for i in used.tolist()),
+                              dtype=bool, count=len(used))
+            added = np.bincount(first[new] // size, minlength=len(batch))
+            fits = np.cumsum(added) <= self.opt.max_vertices_per_mesh - len(g3mesh.vertices)
+            batch = batch[:int(fits.sum())]
+
+            (used, first, inverse) = np.unique(batch, return_index=True, return_inverse=True)
+            index = np.empty(len(used), dtype=np.int64)
+            for i in np.argsort(first, kind='stable').tolist():
+                index[i] = self._vertex_index(vertices[used[i]], g3mesh)
+
+            meshpart.indices.extend(index[inverse.reshape(-1)].tolist())
+            start += len(batch)
+
+    def _convert_skinned_elements(self, meta: MeshMetaInfo, meshdata: MeshNodeData,
+                                  elements: np.ndarray, materials: np.ndarray):
+        """each element is converted like the face, its bones choose the nodepart"""
+        for indices, material_index in zip(elements.tolist(), materials.tolist()):
+            matslot = meta.obj.material_slots[material_index]
+            element = ElementInfo(indices, self._get_material(matslot.material), self.opt)
+            element.setup(meta)
+
+            for ls in self._face_listeners:
+                ls.on_new_face(element)
+
+            g3mesh = self._get_g3mesh(meta, element)
+            nodepart = self._get_nodepart(meta, g3mesh, element, meshdata.parts)
+
+            for vert in element.build(meta, nodepart):
+                self._add_vertex(vert, g3mesh, nodepart.meshpart)
+
+    def _element_materials(self, mesh: bpy.types.Mesh, prop: str, count: int) -> np.ndarray:
+        """material index of the first face using the each edge or vertex, 0 for the loose ones"""
+        loop_elements = _read_buffer(mesh.loops, prop, np.int64, 1)
+        loop_materials = np.repeat(_read_buffer(mesh.polygons, 'material_index', np.int64, 1),
+                                   _read_buffer(mesh.polygons, 'loop_total', np.int64, 1))
+
+        (used, first) = np.unique(loop_elements, return_index=True)
+        materials = np.zeros(count, dtype=np.int64)
+        materials[used] = loop_materials[first]
+        return materials
+
+    @profile
+    def _split_faces(self, mesh: bpy.types.Mesh) -> np.ndarray:
+        """spatial chunk of the each polygon"""
+        centers = np.empty(len(mesh.polygons) * 3, dtype=np.float64)
+        mesh.polygons.foreach_get('center', centers)
+        chunks = spatial.split_faces(centers.reshape(-1, 3), self.opt.chunk_faces)
+        log.debug("split %s into %d chunks", mesh.name, int(chunks.max()) + 1)
+        return chunks
+
     @profile
     def _add_vertex(self, vert: Vertex, g3mesh: G3MeshData, meshpart: MeshpartData):
+        meshpart.indices.append(self._vertex_index(vert, g3mesh))
+
+    def _vertex_index(self, vert: Vertex, g3mesh: G3MeshData) -> int:
         vhash = hash(vert)
         vert_idx = g3mesh.vertex_index.get(vhash, None)
 
@@ -592,7 +815,7 @@ class MeshNodeDataBuilder(object):
             g3mesh.vertex_index[vhash] = vert_idx
             g3mesh.vertices.append(vert)
 
-        meshpart.indices.append(vert_idx)
+        return vert_idx
 
     @profile
     def _analyze_mesh(self, obj: bpy.types.Object,
@@ -610,24 +833,27 @@ class MeshNodeDataBuilder(object):
         if self.opt.use_normal:
             meta.attributes.append(NormalAttributeBuilder())
 
-        if self.opt.use_tangent:
+        # lines and points are made of the vertices, the attributes of the face corners are skipped
+        loops = self._get_primitive_type(obj) not in EDGE_PRIMITIVES
+
+        if self.opt.use_tangent and loops:
             meta.attributes.append(TangentAttributeBuilder())
 
-        if self.opt.use_binormal:
+        if self.opt.use_binormal and loops:
             meta.attributes.append(BiTangentAttributeBuilder())
 
-        if self.opt.use_tangent or self.opt.use_binormal:
+        if (self.opt.use_tangent or self.opt.use_binormal) and loops:
             mesh.calc_tangents()
 
         color_layers = mesh.vertex_colors
-        if self.opt.use_color and len(color_layers) > 0:
+        if self.opt.use_color and len(color_layers) > 0 and loops:
             if self.opt.packed_color:
                 meta.attributes.append(PackedColorAttributeBuilder(color_layers))
             else:
                 meta.attributes.append(ColorAttributeBuilder(color_layers))
 
         uv_layers = mesh.uv_layers
-        if self.opt.use_uv and len(uv_layers) > 0:
+        if self.opt.use_uv and len(uv_layers) > 0 and loops:
             meta.attributes.append(UvAttributeBuilder(uv_layers, self.opt.flip_uv))
 
         if armature is not None:
@@ -652,6 +878,58 @@ class MeshNodeDataBuilder(object):
             self.g3data.materials[mat.name] = material
         return material
 
+    @profile
+    def capture(self, meshdata: MeshNodeData) -> snapshot.MeshSnapshot:
+        """snapshot of the converted mesh, vertices of the each part are copied out of the shared g3mesh"""
+        parts = list()
+        for nodepart in meshdata.parts:
+            meshpart = nodepart.meshpart
+            (vertices, indices) = snapshot.local_indices(meshpart.indices, meshpart.g3mesh.vertices)
+            parts.append(snapshot.PartSnapshot(nodepart.material.id, meshpart.g3mesh.attributes,
+                                               meshpart.primitive_type, nodepart.chunk, list(nodepart.bones.values()),
+                                               [v.data for v in vertices], indices))
+        return snapshot.MeshSnapshot(meshdata.mesh_name, meshdata.loops, meshdata.chunks, parts)
+
+    @profile
+    def replay(self, snap: snapshot.MeshSnapshot) -> MeshNodeData:
+        """adds the vertices of the snapshot to the meshes of this build instead of the conversion"""
+        meshdata = MeshNodeData()
+        meshdata.mesh_name = snap.mesh_name
+        meshdata.loops = snap.loops
+        meshdata.chunks = snap.chunks
+        self.g3data.counters.input_loops += snap.loops
+
+        for part in snap.parts:
+            material = self._get_material(bpy.data.materials[part.material])
+            g3mesh = self._get_replay_g3mesh(part)
+
+            meshpartid = f"{snap.mesh_name}_mesh{g3mesh.index}_part{len(g3mesh.parts)}"
+            meshpart = MeshpartData(meshpartid, part.primitive_type, g3mesh)
+            g3mesh.parts[meshpartid] = meshpart
+
+            nodepart = NodePartBuilder(material, meshpart, part.chunk)
+            for bonepart in part.bones:
+                nodepart.bones[bonepart.name] = bonepart
+            meshdata.parts.append(nodepart)
+
+            vertices = [Vertex(None, data) for data in part.vertices]
+            for idx in part.indices:
+                self._add_vertex(vertices[idx], g3mesh, meshpart)
+
+        return meshdata
+
+    def _get_replay_g3mesh(self, part: snapshot.PartSnapshot) -> G3MeshData:
+        """g3mesh of the same attributes which has room for all the part vertices"""
+        for g3mesh in self.g3data.meshes:
+            if g3mesh.attributes == part.attributes \
+                    and len(g3mesh.vertices) + len(part.vertices) <= self.opt.max_vertices_per_mesh:
+                return g3mesh
+
+        g3mesh = G3MeshData(len(self.g3data.meshes), part.attributes)
+        self.g3data.meshes.append(g3mesh)
+        log.debug("add g3mesh: %s", g3mesh)
+        return g3mesh
+
     @profile
     def _get_g3mesh(self, meta: MeshMetaInfo, face: FaceInfo) -> G3MeshData:
         """get appropriate g3mesh by face data or create new"""
@@ -692,7 +970,7 @@ class MeshNodeDataBuilder(object):
             meshpart = MeshpartData(meshpartid, self._get_primitive_type(meta.obj), g3mesh)
             g3mesh.parts[meshpartid] = meshpart
 
-            nodepart = NodePartBuilder(face.material, meshpart)
+            nodepart = NodePartBuilder(face.material, meshpart, self._chunk)
             nodeparts.append(nodepart)
             log.debug("%s add nodepart: %d", meta.obj.name, len(nodeparts))
 
@@ -727,8 +1005,9 @@ class MeshNodeDataBuilder(object):
     def _validate_nodepart(self, part: NodePartBuilder, g3mesh: G3MeshData, face: FaceInfo):
         """true - if nodepart can accept the face data"""
         return part.meshpart.g3mesh == g3mesh \
+                and part.chunk == self._chunk \
                 and part.material == face.material \
-                and len(part.meshpart.indices) + len(face.vertices) <= self.opt.max_indices_per_meshpart \
+                and len(part.meshpart.indices) + face.size <= self.opt.max_indices_per_meshpart \
                 and self._validate_nodepart_filters(part)
 
     @profile
@@ -767,11 +1046,26 @@ class MeshNodeBuilder(NodeBuilder):
         node = super().build(id_prefix)
         if not self.meshdata:
             log.warning("meshnode has no meshdata: %s", node.id)
+        elif self.meshdata.chunks > 1:
+            self._add_chunks(node)
         else:
             for builder in self.meshdata.parts:
                 node.parts.append(builder.build())
         return node
 
+    def _add_chunks(self, node: model.GNode):
+        """each spatial chunk becomes a child node, so the engine can cull it separately"""
+        children = list()
+        for chunk in range(self.meshdata.chunks):
+            child = model.GNode(f"{node.id}{CHUNK_SUFFIX}{chunk}", self.obj)
+            (child.translation, child.rotation, child.scale) = (Vector((0, 0, 0)), Quaternion(), Vector((1, 1, 1)))
+            children.append(child)
+
+        for builder in self.meshdata.parts:
+            children[builder.chunk].parts.append(builder.build())
+
+        node.children.extend(children)
+
 
 class ArmatureNodeBuilder(NodeBuilder):
     """Creates armature bones tree and bake animation"""
@@ -835,90 +1129,124 @@ class ArmatureNodeBuilder(NodeBuilder):
         return self.opt.deform_bones_only and bone.use_deform
 
     def _create_armature_animations(self, armature: model.GNode):
-        for action in bpy.data.actions:
-            if action.users == 0:
-                continue
+        rest_poses = self._rest_poses()
 
-            anim = model.GAnimation(f'{armature.id}|{action.name}')
+        if self.g3data.action_index is None:
+            self.g3data.action_index = ActionIndex(bpy.data.actions)
 
-            if anim.id in self.g3data.animations:
-                log.debug("skip handled animation: %s", anim.id)
-                return
-
-            for bone in self.obj.pose.bones:
-                bone_anim = self._new_bone_animation(action, bone)
-
-                if len(bone_anim.keyframes) > 0:
-                    anim.bones.append(bone_anim)
-
-            if len(anim.bones) > 0:
-                log.debug("add animation: %s", anim.id)
-                self.g3data.animations[anim.id] = anim
-
-    def _new_bone_animation(self, action: bpy.types.Action, b_bone: bpy.types.PoseBone) -> model.GBoneAnimation:
-        """
-        Creates bone keyframes. Bakes for non-linear.
-        The first keyframe will have 0 millis.
-        Populates missing curves (location, rotation, scale) with the rest pose.
+        for action in self.g3data.action_index.actions_for(self.obj.pose.bones.keys()):
+            anim_id = f'{armature.id}|{action.name}'
 
-        Note that the Keyframe time (in Graph Editor) will be rounded to int.
-        """
-
-        anim_bone = model.GBoneAnimation(b_bone.name)
-
-        if b_bone.name not in action.groups:
-            return anim_bone
-
-        bone_action = BoneAction(b_bone, action)
-
-        # if the key true - keyframe will be baked
-        keyframes: Dict[int, bool] = dict()
-
-        # collect the time of all keyframes and decide which should be baked
-        for curve in bone_action.curves():
-            for keyframe in curve.keyframe_points:
-                frame = int(keyframe.co[0])
-                must_bake = keyframe.interpolation != 'LINEAR'
-                # must_bake is always primary
-                keyframes[frame] = must_bake or keyframes.get(frame, must_bake)
+            if anim_id in self.g3data.bake_jobs or anim_id in self.g3data.reused_animations:
+                log.debug("skip handled animation: %s", anim_id)
+                return
+            self.g3data.animation_ids.append(anim_id)
+
+            # shared animations depend on the other ones, they are baked again
+            if self.opt.incremental and not self.opt.share_animations:
+                anim = dirty.tracker.clean_animation(anim_id, self.obj.name, self.obj.data.name, action.name,
+                                                     self._bake_options().key())
+                if anim is not None:
+                    log.debug("reuse animation: %s", anim_id)
+                    self.g3data.reused_animations[anim_id] = anim
+                    continue
 
-        timeline: List[int] = sorted(keyframes)
+            with span('extract', armature=armature.id, action=action.name):
+                bones = [bone_curves(b_bone, action, rest_poses[b_bone.name])
+                         for b_bone in self.obj.pose.bones if b_bone.name in action.groups]
 
-        for idx, frame in enumerate(timeline):
-            eval_count = 1
+            # baked at once after the all armatures
+            self.g3data.bake_jobs[anim_id] = baker.BakeJob(anim_id, action.name, bones, self._bake_options())
 
-            # check if we should bake to the next keyframe
-            if keyframes[frame] and idx + 1 < len(timeline):
-                eval_count = timeline[idx + 1] - frame
+    def _bake_options(self) -> baker.BakeOptions:
+        opt = baker.BakeOptions(self.opt.fps, self.opt.animation_format)
 
-            for eval_idx in range(eval_count):
-                cur_frame = frame + eval_idx
-                # first keyframe is the start of animation, so it's millis is 0
-                millis = (1.0 / self.opt.fps) * 1000 * (cur_frame - timeline[0])
+        if self.opt.adaptive_bake:
+            opt.adaptive = keyframes.Tolerance(self.opt.adaptive_error, self.opt.adaptive_error,
+                                               self.opt.adaptive_error)
+        if self.opt.simplify_keyframes:
+            opt.simplify = self.opt.keyframe_tolerance
+        return opt
 
-                pose = bone_action.eval_pose(cur_frame)
-                key = model.GBoneKeyframe(millis, pose)
-                anim_bone.keyframes.append(key)
+    def _rest_poses(self) -> Dict[str, Matrix]:
+        """rest matrix of the each bone relative to its parent, shared by all actions"""
+        rest_poses = dict()
+        inverted: Dict[str, Matrix] = dict()
 
-        return anim_bone
+        for bone in self.obj.data.bones:
+            rest = bone.matrix_local
+            if bone.parent:
+                parent_inv = inverted.get(bone.parent.name, None)
+                if parent_inv is None:
+                    parent_inv = bone.parent.matrix_local.inverted()
+                    inverted[bone.parent.name] = parent_inv
+                rest = parent_inv @ rest
+            rest_poses[bone.name] = rest
+        return rest_poses
 
 
 class G3Builder(object):
     def __init__(self, opt: ModelOptions):
         self.opt = opt
         self.data = G3Data()
+        self.disk_cache = cache.DiskCache(Path(opt.cache_dir), opt.cache_size) if opt.cache_dir else None
 
+    @profile_memory
     def build(self) -> model.G3dModel:
         log.debug('start building...')
         root = bpy.context.view_layer.layer_collection
 
-        # blender has 2 collection types: layer and data collection
-        # layer collection is primary because it has inheritence and data collection
-        for node in self._process_layer_collection(root):
-            self.data.nodes.append(node)
-            log.debug("add root node %s", node.id)
+        if self.opt.incremental:
+            # pending updates are sent to the dirty tracker
+            bpy.context.evaluated_depsgraph_get()
+            dirty.tracker.begin(tuple(getattr(self.opt, name) for name in DIRTY_OPTIONS))
 
-        return self._make()
+        with span('build'), self.data.counters.stage('build'):
+            # blender has 2 collection types: layer and data collection
+            # layer collection is primary because it has inheritence and data collection
+            for node in self._process_layer_collection(root):
+                self.data.nodes.append(node)
+                log.debug("add root node %s", node.id)
+
+            if self.opt.incremental:
+                snapshot.store.retain(self.data.snapshot_keys)
+
+            self._bake_animations()
+
+            if self.opt.incremental:
+                dirty.tracker.reset(self.data.records, self._animation_records())
+
+            return self._make()
+
+    def _bake_animations(self):
+        """bakes the actions of all armatures, the animations are in the order they were found"""
+        jobs = list(self.data.bake_jobs.values())
+        baked: Dict[str, model.GAnimation] = dict(self.data.reused_animations)
+        self.data.counters.reused_animations += len(self.data.reused_animations)
+
+        with span('bake', jobs=len(jobs), workers=self.opt.bake_workers), self.data.counters.stage('bake'):
+            for anim, counters in baker.bake_all(jobs, self.opt.bake_workers, self.opt.share_animations):
+                self.data.counters.merge(counters)
+                baked[anim.id] = anim
+
+        for anim_id in self.data.animation_ids:
+            anim = baked[anim_id]
+            if len(anim.bones) > 0:
+                log.debug("add animation: %s", anim.id)
+                self.data.animations[anim.id] = anim
+            elif anim.shared_with is not None:
+                self.data.animation_aliases[anim.id] = anim.shared_with
+
+    def _animation_records(self) -> Dict[str, Tuple[Tuple, model.GAnimation]]:
+        """animations of this build for the next one, with the options they were baked with"""
+        records = dict()
+        for anim_id, anim in self.data.animations.items():
+            job = self.data.bake_jobs.get(anim_id, None)
+            if job is not None:
+                records[anim_id] = (job.opt.key(), anim)
+            elif anim_id in self.data.reused_animations:
+                records[anim_id] = dirty.tracker.animations[anim_id]
+        return records
 
     def _process_layer_collection(self,
                                   layer_col: bpy.types.LayerCollection) -> typing.Generator[model.GNode, None, None]:
@@ -973,19 +1301,50 @@ class G3Builder(object):
         if obj.type == 'MESH':
 
             node: model.GNode = None
+            lod_nodes: List[model.GNode] = list()
 
             if self._can_adopt(obj, selected_only):
-                (eval_obj, eval_mesh) = evaluate(obj, self.opt.apply_modifiers)
-
-                meshdata_key = hash(eval_mesh)
-                meshdata = self.data.mesh_node_data.get(meshdata_key, None)
-
-                if meshdata is None:
-                    armature = self._get_attached_armature(obj, selected_only)
-                    meshdata = MeshNodeDataBuilder(self.data, self.opt).build(eval_obj, eval_mesh, armature)
-                    self.data.mesh_node_data[meshdata_key] = meshdata
-
-                node = MeshNodeBuilder(obj, meshdata).build(id_prefix)
+                with span('object', object=obj.name, type=obj.type) as sp:
+                    record = self._clean_record(obj, selected_only) if self.opt.incremental else None
+                    sp.attrs['clean'] = record is not None
+
+                    if record is not None:
+                        # the mesh wasn't changed since the previous export, its snapshot is replayed.
+                        # the evaluated mesh of the recorded key can be freed, the key must differ from this build
+                        meshdata_key = hash((record.meshdata_key, record.fingerprint))
+                        meshdata = self.data.mesh_node_data.get(meshdata_key, None)
+                        if meshdata is None:
+                            self.data.fingerprints[meshdata_key] = record.fingerprint
+                            # the snapshot is in the store, nothing is converted
+                            meshdata = self._convert_mesh(record.fingerprint, None)
+                            self.data.mesh_node_data[meshdata_key] = meshdata
+                        self.data.records[obj.name] = record
+                    else:
+                        with span('evaluate', object=obj.name):
+                            (eval_obj, eval_mesh) = evaluate(obj, self.opt.apply_modifiers)
+
+                        meshdata_key = hash(eval_mesh)
+                        meshdata = self.data.mesh_node_data.get(meshdata_key, None)
+                        sp.attrs['shared'] = meshdata is not None
+
+                        armature = self._get_attached_armature(obj, selected_only)
+                        if meshdata is None:
+                            if self.opt.incremental or self.disk_cache:
+                                with span('fingerprint', object=obj.name):
+                                    self.data.fingerprints[meshdata_key] = mesh_fingerprint(eval_obj, eval_mesh,
+                                                                                            armature, self.opt)
+                            meshdata = self._convert_mesh(self.data.fingerprints.get(meshdata_key, None),
+                                                          lambda b: b.build(eval_obj, eval_mesh, armature))
+                            self.data.mesh_node_data[meshdata_key] = meshdata
+
+                        if self.opt.incremental:
+                            self.data.records[obj.name] = dirty.ObjectRecord(
+                                meshdata_key, self.data.fingerprints[meshdata_key], armature.name if armature else None)
+
+                    node = MeshNodeBuilder(obj, meshdata).build(id_prefix)
+
+                    if self.opt.lod_count > 0:
+                        lod_nodes = self._make_lods(obj, meshdata_key, selected_only, id_prefix)
                 log.debug("new node %s", node.id)
             else:
                 log.debug("%s cannot adopt", obj.name)
@@ -1001,12 +1360,18 @@ class G3Builder(object):
             if node:
                 yield node
 
+            # levels are the siblings of the base node
+            for lod in lod_nodes:
+                log.debug("add lod node %s", lod.id)
+                yield lod
+
         elif obj.type == 'ARMATURE':
 
             node: model.GNode = None
 
             if self._can_adopt(obj, selected_only):
-                node = ArmatureNodeBuilder(obj, self.data, self.opt).build(id_prefix)
+                with span('object', object=obj.name, type=obj.type):
+                    node = ArmatureNodeBuilder(obj, self.data, self.opt).build(id_prefix)
                 log.debug("new node %s", node.id)
             else:
                 log.debug("%s cannot adopt", obj.name)
@@ -1048,6 +1413,97 @@ class G3Builder(object):
         else:
             log.debug("skip export for %s due type: %s", obj.name, obj.type)
 
+    @profile
+    def _clean_record(self, obj: bpy.types.Object, selected_only: bool) -> Optional[dirty.ObjectRecord]:
+        """record of the previous export if the object and everything its mesh is made of weren't changed"""
+        materials = [slot.material.name for slot in obj.material_slots if slot.material]
+        record = dirty.tracker.clean_record(obj.name, obj.data.name, materials)
+        if record is None or record.fingerprint not in snapshot.store.snapshots:
+            return None
+
+        armature = self._get_attached_armature(obj, selected_only)
+        if armature is None:
+            return record if record.armature is None else None
+        if armature.name != record.armature or not dirty.tracker.is_clean_armature(armature.name, armature.data.name):
+            return None
+        return record
+
+    def _convert_mesh(self, fingerprint: Optional[str],
+                      convert: Optional[Callable[[MeshNodeDataBuilder], MeshNodeData]]) -> Optional[MeshNodeData]:
+        """converts the mesh or replays the snapshot of the same mesh from the previous export"""
+        mesh_builder = MeshNodeDataBuilder(self.data, self.opt)
+        if fingerprint is None:
+            return convert(mesh_builder)
+
+        snap = self._find_snapshot(fingerprint)
+        if snap is not None:
+            self.data.counters.reused_meshes += 1
+            with span('replay', mesh=snap.mesh_name):
+                return mesh_builder.replay(snap)
+
+        meshdata = convert(mesh_builder)
+        if meshdata is not None:
+            snap = mesh_builder.capture(meshdata)
+            if self.opt.incremental:
+                snapshot.store.put(fingerprint, snap)
+            if self.disk_cache:
+                with span('cache_write', mesh=snap.mesh_name):
+                    self.disk_cache.put(fingerprint, snap)
+        return meshdata
+
+    def _find_snapshot(self, fingerprint: str) -> Optional[snapshot.MeshSnapshot]:
+        """snapshot of the previous export in this session or in the disk cache"""
+        snap = None
+        if self.opt.incremental:
+            self.data.snapshot_keys.add(fingerprint)
+            snap = snapshot.store.get(fingerprint)
+
+        if snap is None and self.disk_cache:
+            with span('cache_read'):
+                snap = self.disk_cache.get(fingerprint)
+            if snap is not None and self.opt.incremental:
+                snapshot.store.put(fingerprint, snap)
+        return snap
+
+    @profile
+    def _make_lods(self, obj: bpy.types.Object, meshdata_key: int,
+                   selected_only: bool, id_prefix: str) -> List[model.GNode]:
+        """nodes of the decimated object mesh, the levels of the linked objects are converted once"""
+        nodes = list()
+
+        for level in range(1, self.opt.lod_count + 1):
+            key = hash((meshdata_key, level))
+            meshdata = self.data.mesh_node_data.get(key, None)
+
+            if meshdata is None:
+                ratio = self.opt.lod_ratio ** level
+
+                def convert(mesh_builder: MeshNodeDataBuilder) -> MeshNodeData:
+                    mesh = evaluate_lod(obj, ratio, self.opt.apply_modifiers)
+                    try:
+                        armature = self._get_attached_armature(obj, selected_only)
+                        return mesh_builder.build(obj, mesh, armature)
+                    finally:
+                        bpy.data.meshes.remove(mesh)
+
+                # decimation is skipped too when the base mesh is the same
+                fingerprint = self.data.fingerprints.get(meshdata_key, None)
+                if fingerprint is not None:
+                    fingerprint = snapshot.Fingerprint().add_value((fingerprint, level, ratio)).hexdigest()
+
+                with span('lod', object=obj.name, level=level):
+                    meshdata = self._convert_mesh(fingerprint, convert)
+                self.data.mesh_node_data[key] = meshdata
+
+            if meshdata is None:
+                continue
+
+            node = MeshNodeBuilder(obj, meshdata).build(id_prefix)
+            node.id = f"{node.id}{LOD_SUFFIX}{level}"
+            nodes.append(node)
+
+        return nodes
+
     @profile
     def _can_adopt(self, obj: bpy.types.Object, selected_only: bool) -> bool:
         return not obj.hide_viewport and (obj.select_get() if selected_only else True)
@@ -1067,8 +1523,14 @@ class G3Builder(object):
     @profile
     def _make(self) -> model.G3dModel:
         mod = model.G3dModel()
+        mod.counters = self.data.counters
 
         self._make_meshes(mod)
+        if self.opt.optimize_vertex_cache:
+            self._optimize_vertex_cache(mod)
+        self._make_strips(mod)
+        if self.opt.optimize_vertex_fetch:
+            self._optimize_vertex_fetch(mod)
         self._make_materials(mod)
         self._make_nodes(mod)
         self._make_animations(mod)
@@ -1076,19 +1538,72 @@ class G3Builder(object):
         return mod
 
     @profile
+    @profile_memory
     def _make_meshes(self, mod: model.G3dModel):
         for g3mesh in self.data.meshes:
-            mesh = model.GMesh(g3mesh.attributes)
+            with span('make_mesh', mesh=g3mesh.index, vertices=len(g3mesh.vertices)):
+                mesh = model.GMesh(g3mesh.attributes)
 
-            for v in g3mesh.vertices:
-                mesh.vertices.extend(v.data)
+                for v in g3mesh.vertices:
+                    mesh.vertices.extend(v.data)
 
-            for part_builder in g3mesh.parts.values():
-                part = model.GMeshPart(part_builder.id, part_builder.primitive_type)
-                part.indices = part_builder.indices
-                mesh.parts.append(part)
+                for part_builder in g3mesh.parts.values():
+                    part = model.GMeshPart(part_builder.id, part_builder.primitive_type)
+                    part.indices = part_builder.indices
+                    mesh.parts.append(part)
 
-            mod.meshes.append(mesh)
+                mod.meshes.append(mesh)
+
+    @profile
+    def _optimize_vertex_cache(self, mod: model.G3dModel):
+        """reorders triangles of the each meshpart"""
+        counters = self.data.counters
+
+        with span('optimize_vertex_cache'), counters.stage('optimize_vertex_cache'):
+            for mesh in mod.meshes:
+                for part in mesh.parts:
+                    # strips are made of the optimized triangle list
+                    if part.type not in ('TRIANGLES', 'TRIANGLE_STRIP'):
+                        continue
+
+                    # cache simulation costs about as much as the reordering
+                    if self.opt.measure:
+                        counters.cache_triangles += len(part.indices) // 3
+                        counters.cache_misses_before += meshopt.cache_misses(part.indices)
+                    part.indices = meshopt.tipsify(part.indices)
+                    if self.opt.measure:
+                        counters.cache_misses_after += meshopt.cache_misses(part.indices)
+
+    @profile
+    def _make_strips(self, mod: model.G3dModel):
+        """converts triangle lists of the strip meshparts, the list is kept if the strip isn't shorter"""
+        counters = self.data.counters
+
+        with span('make_strips'), counters.stage('make_strips'):
+            for mesh in mod.meshes:
+                for part in mesh.parts:
+                    if part.type != 'TRIANGLE_STRIP':
+                        continue
+
+                    counters.strip_list_indices += len(part.indices)
+                    strip = meshopt.stripify(part.indices)
+                    if len(strip) < len(part.indices):
+                        part.indices = strip
+                    else:
+                        log.debug("%s: strip has %d indices of %d, keep triangles",
+                                  part.id, len(strip), len(part.indices))
+                        part.type = 'TRIANGLES'
+                    counters.strip_indices += len(part.indices)
+
+    @profile
+    def _optimize_vertex_fetch(self, mod: model.G3dModel):
+        """renumbers vertices of the each mesh in the order of the indices"""
+        with span('optimize_vertex_fetch'), self.data.counters.stage('optimize_vertex_fetch'):
+            for mesh in mod.meshes:
+                (mesh.vertices, indices) = meshopt.optimize_vertex_fetch(mesh.vertices, mesh.vertex_size(),
+                                                                         [p.indices for p in mesh.parts])
+                for part, part_indices in zip(mesh.parts, indices):
+                    part.indices = part_indices
 
     def _make_materials(self, mod: model.G3dModel):
         mod.materials = list(self.data.materials.values())
@@ -1107,56 +1622,72 @@ class G3Builder(object):
     @profile
     def _make_animations(self, mod: model.G3dModel):
         mod.animations = list(self.data.animations.values())
+        mod.animation_aliases = dict(self.data.animation_aliases)
 
 
-class BoneAction(object):
-    """Encapsulates valid curves"""
+EULER_ORDERS = {'XYZ', 'XZY', 'YXZ', 'YZX', 'ZXY', 'ZYX'}
 
-    def __init__(self, b_bone: bpy.types.PoseBone, action: bpy.types.Action) -> None:
-        self.b_bone = b_bone
-        self.loc_curves: List[bpy.types.FCurve] = []
-        self.scale_curves: List[bpy.types.FCurve] = []
-        self.quat_curves: List[bpy.types.FCurve] = []
-        self.euler_curves: List[bpy.types.FCurve] = []
 
-        for curve in action.groups[b_bone.name].channels:
-            # TODO respect existing but disabled curves?
-            if curve.data_path.endswith('location'):
-                self.loc_curves.append(curve)
-            elif curve.data_path.endswith('scale'):
-                self.scale_curves.append(curve)
-            elif curve.data_path.endswith('rotation_quaternion'):
-                self.quat_curves.append(curve)
-            elif curve.data_path.endswith('rotation_euler'):
-                self.euler_curves.append(curve)
+class ActionIndex(object):
+    """Bone names targeted by the each used action (groups and channel paths), built once per export"""
 
-    def curves(self) -> List[bpy.types.FCurve]:
-        return flatten([self.loc_curves, self.scale_curves, self.quat_curves, self.euler_curves])
+    BONE_PATH = re.compile(r'^pose\.bones\["((?:[^"\\]|\\.)*)"\]')
 
-    def eval_pose(self, frame: int) -> Matrix:
-        loc = self._eval_curves(frame, self.loc_curves, Vector())
-        scale = self._eval_curves(frame, self.scale_curves, Vector((1, 1, 1)))
-        quat = self._eval_curves(frame, self.quat_curves, Quaternion())
-        euler = self._eval_curves(frame, self.euler_curves, Euler())
+    def __init__(self, actions: Iterable[bpy.types.Action]):
+        self.actions: List[bpy.types.Action] = [a for a in actions if a.users > 0]
+        # bone name -> indices of the actions
+        self.bones: Dict[str, List[int]] = dict()
 
-        if self.b_bone.rotation_mode != 'QUATERNION':
-            quat = euler.to_quaternion()
+        for idx, action in enumerate(self.actions):
+            names = set(group.name for group in action.groups)
+            for curve in action.fcurves:
+                match = self.BONE_PATH.match(curve.data_path)
+                if match:
+                    names.add(re.sub(r'\\(.)', r'\1', match.group(1)))
 
-        trans = new_transorm_matrix(loc, quat, scale)
-        rest = self.b_bone.bone.matrix_local
+            for name in names:
+                self.bones.setdefault(name, list()).append(idx)
 
-        if self.b_bone.parent:
-            # relative to parent
-            rest = self.b_bone.parent.bone.matrix_local.inverted() @ rest
+    def actions_for(self, bone_names: Iterable[str]) -> List[bpy.types.Action]:
+        """actions which target any of the bones, in the blend-file order"""
+        indices: Set[int] = set()
+        for name in bone_names:
+            indices.update(self.bones.get(name, ()))
+        return [self.actions[idx] for idx in sorted(indices)]
 
-        return rest @ trans
 
-    def _eval_curves(self, frame: int,
-                     curves: List[bpy.types.FCurve],
-                     into: Union[Vector, Quaternion, Euler]) -> Union[Vector, Quaternion, Euler]:
-        for curve in curves:
-            into[curve.array_index] = curve.evaluate(frame)
-        return into
+@profile
+def bone_curves(b_bone: bpy.types.PoseBone, action: bpy.types.Action, rest: Matrix = None) -> baker.BoneCurves:
+    """reads the valid curves of the bone once"""
+    if rest is None:
+        # relative to parent
+        rest = b_bone.bone.matrix_local
+        if b_bone.parent:
+            rest = b_bone.parent.bone.matrix_local.inverted() @ rest
+
+    loc_curves: List[bpy.types.FCurve] = []
+    scale_curves: List[bpy.types.FCurve] = []
+    quat_curves: List[bpy.types.FCurve] = []
+    euler_curves: List[bpy.types.FCurve] = []
+
+    for curve in action.groups[b_bone.name].channels:
+        # TODO respect existing but disabled curves?
+        if curve.data_path.endswith('location'):
+            loc_curves.append(curve)
+        elif curve.data_path.endswith('scale'):
+            scale_curves.append(curve)
+        elif curve.data_path.endswith('rotation_quaternion'):
+            quat_curves.append(curve)
+        elif curve.data_path.endswith('rotation_euler'):
+            euler_curves.append(curve)
+
+    return baker.BoneCurves(b_bone.name, rest,
+                            b_bone.rotation_mode != 'QUATERNION',
+                            b_bone.rotation_mode if b_bone.rotation_mode in EULER_ORDERS else 'XYZ',
+                            [fcurve.CurveData.from_fcurve(c) for c in loc_curves],
+                            [fcurve.CurveData.from_fcurve(c) for c in scale_curves],
+                            [fcurve.CurveData.from_fcurve(c) for c in quat_curves],
+                            [fcurve.CurveData.from_fcurve(c) for c in euler_curves])
 
 
 @profile
@@ -1191,6 +1722,83 @@ def evaluate(obj: bpy.types.Object, apply_modifiers: bool) -> Tuple[bpy.types.Ob
     return obj, mesh
 
 
+@profile
+def mesh_fingerprint(obj: bpy.types.Object, mesh: bpy.types.Mesh, armature: bpy.types.Object,
+                     opt: ModelOptions) -> str:
+    """content hash of everything the conversion of the mesh reads"""
+    fp = snapshot.Fingerprint()
+    fp.add_value((mesh.name, obj.display_type, len(mesh.vertices), len(mesh.edges), len(mesh.loops)))
+    fp.add_value(tuple(getattr(opt, name) for name in MESH_OPTIONS))
+    fp.add_value(tuple(slot.material.name if slot.material else None for slot in obj.material_slots))
+    fp.add_value(tuple((m.name, m.type, m.show_viewport) for m in obj.modifiers))
+    fp.add_value(tuple(g.name for g in obj.vertex_groups))
+
+    fp.add_array(_read_buffer(mesh.vertices, 'co', np.float32, 3))
+    fp.add_array(_read_buffer(mesh.vertices, 'normal', np.float32, 3))
+    fp.add_array(_read_buffer(mesh.edges, 'vertices', np.int32, 2))
+    fp.add_array(_read_buffer(mesh.loops, 'vertex_index', np.int32, 1))
+    for prop in ('loop_start', 'loop_total', 'material_index'):
+        fp.add_array(_read_buffer(mesh.polygons, prop, np.int32, 1))
+
+    for layer in mesh.uv_layers:
+        fp.add_value(layer.name).add_array(_read_buffer(layer.data, 'uv', np.float32, 2))
+    for layer in mesh.vertex_colors:
+        fp.add_value(layer.name).add_array(_read_buffer(layer.data, 'color', np.float32, 4))
+
+    if armature is not None:
+        for bone in armature.data.bones:
+            fp.add_value((bone.name, bone.use_deform, tuple(tuple(row) for row in bone.matrix_local)))
+        fp.add_array(np.array([(v.index, g.group, g.weight) for v in mesh.vertices for g in v.groups],
+                              dtype=np.float64))
+
+    return fp.hexdigest()
+
+
+def _read_buffer(collection, prop: str, dtype, width: int) -> np.ndarray:
+    data = np.empty(len(collection) * width, dtype=dtype)
+    collection.foreach_get(prop, data)
+    return data
+
+
+@profile
+def evaluate_lod(obj: bpy.types.Object, ratio: float, apply_modifiers: bool) -> bpy.types.Mesh:
+    """
+    Returns triangulated copy of the mesh decimated by the ratio, it should be removed by the caller.
+    Decimation goes first, so the other modifiers (armature too) deform the decimated mesh.
+    The object isn't changed: the modifiers are evaluated on a temporary copy which shares its mesh,
+    vertex groups and the settings of the modifiers.
+    """
+    log.debug("evaluate lod %s, ratio %f, apply modifiers %s", obj.name, ratio, apply_modifiers)
+
+    collection = bpy.data.collections.new(LOD_MODIFIER)
+    temp = obj.copy()
+    try:
+        bpy.context.scene.collection.children.link(collection)
+        collection.objects.link(temp)
+
+        # modifiers are not applied to the base mesh
+        if not apply_modifiers:
+            for mod in temp.modifiers:
+                mod.show_viewport = False
+
+        decimate = temp.modifiers.new(LOD_MODIFIER, 'DECIMATE')
+        decimate.decimate_type = 'COLLAPSE'
+        decimate.ratio = ratio
+        decimate.use_collapse_triangulate = True
+        with bpy.context.temp_override(object=temp, active_object=temp):
+            bpy.ops.object.modifier_move_to_index(modifier=decimate.name, index=0)
+
+        depsgraph = bpy.context.evaluated_depsgraph_get()
+        mesh = bpy.data.meshes.new_from_object(temp.evaluated_get(depsgraph), preserve_all_data_layers=True,
+                                               depsgraph=depsgraph)
+    finally:
+        bpy.data.objects.remove(temp)
+        bpy.data.collections.remove(collection)
+
+    triangulate(mesh)
+    return mesh
+
+
 def status(type, msg):
     """pushes message to blender status bar"""
     if b_log:
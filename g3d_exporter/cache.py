@@ -0,0 +1,186 @@
+# <pep8 compliant>
+"""
+On-disk cache of the mesh snapshots shared by the exports of different files and blender sessions.
+Entry is a single file named by the mesh fingerprint: header, json description of the parts
+and raw float64 vertices and int32 indices, read through mmap.
+Least recently used entries are evicted when the cache exceeds its size limit.
+Blender-free.
+"""
+import json
+import logging
+import mmap
+import os
+import struct
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+from g3d_exporter import model, snapshot
+from g3d_exporter.common import *
+from g3d_exporter.profiler import profile
+
+log = logging.getLogger(__name__)
+
+MAGIC = b'G3DC'
+VERSION = 3
+SUFFIX = ".g3dc"
+# part of the size limit which is left after the eviction, so the directory isn't scanned on every write
+EVICT_TO = 0.9
+
+# magic, version, description length
+_HEADER = struct.Struct('<4sII')
+_ALIGN = 8
+
+
+class DiskCache(object):
+    def __init__(self, directory: Path, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        # bytes of the entries, the directory is scanned on the first write
+        self._total: Optional[int] = None
+
+    def path(self, key: str) -> Path:
+        return self.directory / (key + SUFFIX)
+
+    @profile
+    def get(self, key: str) -> Optional[snapshot.MeshSnapshot]:
+        path = self.path(key)
+        try:
+            snap = read_snapshot(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (ValueError, KeyError, TypeError, BufferError, struct.error) as e:
+            log.warning("drop broken cache entry %s: %s", path, e)
+            _remove(path)
+            self.misses += 1
+            return None
+
+        # access time of the entry for the eviction, atime can be disabled by the file system
+        os.utime(path)
+        self.hits += 1
+        return snap
+
+    @profile
+    def put(self, key: str, snap: snapshot.MeshSnapshot):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.path(key)
+        if self._total is None:
+            self._total = self.size()
+
+        # other exports can read the cache at the same time
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp, 'wb') as f:
+            write_snapshot(f, snap)
+        self._total += tmp.stat().st_size - (path.stat().st_size if path.exists() else 0)
+        os.replace(tmp, path)
+
+        if self._total > self.max_bytes:
+            self.evict(int(self.max_bytes * EVICT_TO))
+
+    def evict(self, limit: Optional[int] = None):
+        """removes least recently used entries until the cache fits the limit, max_bytes by default"""
+        if limit is None:
+            limit = self.max_bytes
+
+        entries = list()
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(SUFFIX):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for (_, size, path) in sorted(entries):
+            if total <= limit:
+                break
+            _remove(Path(path))
+            total -= size
+            log.debug("evict %s", path)
+        self._total = total
+
+    def size(self) -> int:
+        if not self.directory.exists():
+            return 0
+        return sum(e.stat().st_size for e in os.scandir(self.directory) if e.name.endswith(SUFFIX))
+
+
+def write_snapshot(f, snap: snapshot.MeshSnapshot):
+    arrays: List[np.ndarray] = list()
+    offset = 0
+
+    def add(array: np.ndarray) -> List[int]:
+        nonlocal offset
+        arrays.append(array)
+        location = [offset, len(array)]
+        offset += _aligned(array.nbytes)
+        return location
+
+    parts = list()
+    for part in snap.parts:
+        desc = dict()
+        desc['material'] = part.material
+        desc['attributes'] = [[a.name, a.length] for a in part.attributes]
+        desc['primitive_type'] = part.primitive_type
+        desc['chunk'] = part.chunk
+        desc['bones'] = [[b.name, b.index, [list(row) for row in b.matrix]] for b in part.bones]
+        # float64, so the replayed vertices are the same as the converted ones in g3dj
+        desc['vertices'] = add(np.array(part.vertices, dtype='<f8').ravel())
+        desc['indices'] = add(np.array(part.indices, dtype='<i4'))
+        parts.append(desc)
+
+    root = dict()
+    root['mesh_name'] = snap.mesh_name
+    root['loops'] = snap.loops
+    root['chunks'] = snap.chunks
+    root['parts'] = parts
+    description = json.dumps(root).encode()
+
+    f.write(_HEADER.pack(MAGIC, VERSION, len(description)))
+    f.write(description)
+    f.write(b'\0' * (_aligned(_HEADER.size + len(description)) - _HEADER.size - len(description)))
+    for array in arrays:
+        f.write(array.tobytes())
+        f.write(b'\0' * (_aligned(array.nbytes) - array.nbytes))
+
+
+def read_snapshot(path: Path) -> snapshot.MeshSnapshot:
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        (magic, version, length) = _HEADER.unpack_from(mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"unsupported entry {magic}/{version}")
+
+        root = json.loads(bytes(mm[_HEADER.size:_HEADER.size + length]))
+        start = _aligned(_HEADER.size + length)
+
+        parts = list()
+        for desc in root['parts']:
+            attributes = tuple(model.VertexFlag(name, size) for name, size in desc['attributes'])
+            width = sum(size for _, size in desc['attributes'])
+            vertices = _read_array(mm, start, desc['vertices'], '<f8').reshape(-1, width)
+            indices = _read_array(mm, start, desc['indices'], '<i4')
+            bones = [model.BonePart(name, Matrix(rows), index) for name, index, rows in desc['bones']]
+
+            parts.append(snapshot.PartSnapshot(desc['material'], attributes, desc['primitive_type'], desc['chunk'],
+                                               bones, [tuple(v) for v in vertices.tolist()], indices.tolist()))
+
+        return snapshot.MeshSnapshot(root['mesh_name'], root['loops'], root['chunks'], parts)
+
+
+def _read_array(mm: mmap.mmap, start: int, location: List[int], dtype: str) -> np.ndarray:
+    """copy of the array, a view of the mapped file would keep it from closing when the entry is broken"""
+    (offset, count) = location
+    return np.frombuffer(mm, dtype=dtype, count=count, offset=start + offset).copy()
+
+
+def _aligned(size: int) -> int:
+    return (size + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def _remove(path: Path):
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
@@ -4,9 +4,13 @@ import struct
 from pathlib import Path
 from typing import Any, Union, List
 
-from mathutils import Color, Matrix, Quaternion, Vector
+try:
+    from mathutils import Color, Euler, Matrix, Quaternion, Vector
+except ImportError:
+    # outside of blender
+    from g3d_exporter.puremath import Color, Euler, Matrix, Quaternion, Vector
 
-from g3d_exporter.profiler import profile
+from g3d_exporter.profiler import profile, profile_memory
 
 log = logging.getLogger(__name__)
 
@@ -49,19 +53,24 @@ def conv_quat(v: Union[List[float], Quaternion]) -> List[float]:
 
 @profile
 def new_transorm_matrix(loc: Vector, rot: Quaternion, sca: Vector) -> Matrix:
-    mat_rot = rot.to_matrix().to_4x4()
+    """loc @ rot @ sca without intermediate matrices"""
+    mat = rot.to_matrix()
 
-    mat_loc = Matrix.Translation(loc)
+    # multiplying by diagonal scale matrix scales the columns
+    for row in range(3):
+        mat[row][0] *= sca[0]
+        mat[row][1] *= sca[1]
+        mat[row][2] *= sca[2]
 
-    mat_scax = Matrix.Scale(sca[0], 4, (1.0, 0.0, 0.0))
-    mat_scay = Matrix.Scale(sca[1], 4, (0.0, 1.0, 0.0))
-    mat_scaz = Matrix.Scale(sca[2], 4, (0.0, 0.0, 1.0))
-    mat_sca = mat_scax @ mat_scay @ mat_scaz
-
-    return mat_loc @ mat_rot @ mat_sca
+    mat = mat.to_4x4()
+    mat[0][3] = loc[0]
+    mat[1][3] = loc[1]
+    mat[2][3] = loc[2]
+    return mat
 
 
 @profile
+@profile_memory
 def write(data, file: Path, mode='w') -> Path:
     file.parent.mkdir(exist_ok=True)
 
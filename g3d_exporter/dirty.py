@@ -0,0 +1,157 @@
+# <pep8 compliant>
+"""
+Datablocks changed since the last incremental export, collected by the depsgraph update handler.
+The objects which weren't changed skip the evaluation and the fingerprint of their mesh,
+the snapshot recorded by the previous export is replayed. Actions which weren't changed aren't baked again.
+Blender-free except the handler registration, the updates are read by the id type and name.
+"""
+import logging
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from g3d_exporter import model
+
+try:
+    import bpy
+except ImportError:
+    # the tracker can be used outside of blender
+    bpy = None
+
+log = logging.getLogger(__name__)
+
+
+class ObjectRecord(object):
+    """mesh of the object converted by the previous export"""
+    def __init__(self, meshdata_key: int, fingerprint: str, armature: Optional[str]):
+        self.meshdata_key = meshdata_key
+        self.fingerprint = fingerprint
+        self.armature = armature # attached armature object name
+
+
+class DirtyTracker(object):
+    """
+    Names of the changed datablocks by id type, lives as long as the addon is loaded.
+    Everything is dirty until the first export, after the file load or undo and while the handler isn't registered.
+    """
+    def __init__(self):
+        self.listening = False
+        self.objects: Set[str] = set()
+        self.meshes: Set[str] = set()
+        self.materials: Set[str] = set()
+        self.actions: Set[str] = set()
+        self.armatures: Set[str] = set()
+        self.everything = True
+        # evaluated meshes can be deformed by the armature, shape keys or animated modifiers at the other frame
+        self.frame_changed = False
+        # options of the previous export which the records depend on
+        self.options_key: Optional[Tuple] = None
+        # object name -> record of the previous export
+        self.records: Dict[str, ObjectRecord] = dict()
+        # animation id -> (bake key, animation) of the previous export
+        self.animations: Dict[str, Tuple[Tuple, model.GAnimation]] = dict()
+
+    def on_depsgraph_update(self, updates: Iterable):
+        """depsgraph.updates: objects are dirty only by geometry, transforms are exported anyway"""
+        for update in updates:
+            id_type = update.id.id_type
+            name = update.id.name
+            if id_type == 'OBJECT':
+                if update.is_updated_geometry:
+                    self.objects.add(name)
+            elif id_type == 'MESH':
+                self.meshes.add(name)
+            elif id_type == 'MATERIAL':
+                self.materials.add(name)
+            elif id_type == 'ACTION':
+                self.actions.add(name)
+            elif id_type == 'ARMATURE':
+                self.armatures.add(name)
+
+    def on_frame_change(self):
+        """frame change doesn't send the depsgraph updates, every object mesh is dirty"""
+        self.frame_changed = True
+
+    def begin(self, options_key: Tuple):
+        """export with the other options can't reuse the records"""
+        if options_key != self.options_key:
+            log.debug("options changed, everything is dirty")
+            self.invalidate()
+            self.options_key = options_key
+
+    def is_clean_object(self, name: str, mesh: str, materials: Iterable[str]) -> bool:
+        if self.everything or self.frame_changed or name in self.objects or mesh in self.meshes:
+            return False
+        return not any(m in self.materials for m in materials)
+
+    def is_clean_armature(self, name: str, armature: str) -> bool:
+        return not self.everything and name not in self.objects and armature not in self.armatures
+
+    def clean_record(self, name: str, mesh: str, materials: Iterable[str]) -> Optional[ObjectRecord]:
+        if not self.is_clean_object(name, mesh, materials):
+            return None
+        return self.records.get(name, None)
+
+    def clean_animation(self, anim_id: str, armature: str, armature_data: str, action: str,
+                        key: Tuple) -> Optional[model.GAnimation]:
+        """animation of the previous export if the action, armature and bake options are the same"""
+        if action in self.actions or not self.is_clean_armature(armature, armature_data):
+            return None
+        (prev_key, anim) = self.animations.get(anim_id, (None, None))
+        return anim if prev_key == key else None
+
+    def reset(self, records: Dict[str, ObjectRecord], animations: Dict[str, Tuple[Tuple, model.GAnimation]]):
+        """results of the finished export, everything is clean after it"""
+        self.objects.clear()
+        self.meshes.clear()
+        self.materials.clear()
+        self.actions.clear()
+        self.armatures.clear()
+        self.frame_changed = False
+        # changes can't be known without the handler
+        self.everything = not self.listening
+        self.records = records
+        self.animations = animations
+
+    def invalidate(self):
+        self.everything = True
+        self.records.clear()
+        self.animations.clear()
+
+
+tracker = DirtyTracker()
+
+
+if bpy is not None:
+    @bpy.app.handlers.persistent
+    def _on_depsgraph_update(scene, depsgraph):
+        tracker.on_depsgraph_update(depsgraph.updates)
+
+    @bpy.app.handlers.persistent
+    def _on_frame_change(scene, depsgraph):
+        tracker.on_frame_change()
+
+    @bpy.app.handlers.persistent
+    def _on_invalidate(*args):
+        tracker.invalidate()
+
+    _handlers = (
+        (bpy.app.handlers.depsgraph_update_post, _on_depsgraph_update),
+        (bpy.app.handlers.frame_change_post, _on_frame_change),
+        (bpy.app.handlers.load_post, _on_invalidate),
+        (bpy.app.handlers.undo_post, _on_invalidate),
+        (bpy.app.handlers.redo_post, _on_invalidate),
+    )
+
+
+def register():
+    for (handlers, handler) in _handlers:
+        if handler not in handlers:
+            handlers.append(handler)
+    tracker.listening = True
+
+
+def unregister():
+    for (handlers, handler) in _handlers:
+        if handler in handlers:
+            handlers.remove(handler)
+    tracker.listening = False
+    tracker.invalidate()
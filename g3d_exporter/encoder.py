@@ -2,10 +2,12 @@
 import collections
 import json
 from json.encoder import encode_basestring_ascii, INFINITY
-from typing import Sequence
+from typing import Optional, Sequence
 
 from g3d_exporter import simpleubjson
 from g3d_exporter.model import *
+from g3d_exporter.profiler import profile_memory
+from g3d_exporter.spatial import ModelBounds
 
 
 def _default_bin_mapper(obj):
@@ -18,13 +20,27 @@ def _default_bin_mapper(obj):
 
 
 @profile
-def encode_binary(g3d: G3dModel) -> Any:
-    return simpleubjson.encode(g3d, old_format_json=True, default=_default_bin_mapper)
+@profile_memory
+def encode_binary(g3d: G3dModel, sizes: Optional[Dict[str, int]] = None) -> Any:
+    """sizes - gets the encoded bytes of each top-level section, the key included"""
+    if sizes is None:
+        return simpleubjson.encode(g3d, old_format_json=True, default=_default_bin_mapper)
+
+    encoder = simpleubjson.Draft9Encoder(_default_bin_mapper)
+    chunks = [simpleubjson.draft9.OBJECT_OPEN]
+    for key, value in g3d.to_dict().items():
+        chunk = encoder.encode_str(key) + encoder.encode_next(value)
+        sizes[key] = len(chunk)
+        chunks.append(chunk)
+    chunks.append(simpleubjson.draft9.OBJECT_CLOSE)
+    return bytes().join(chunks)
 
 
 @profile
-def encode_json(obj):
-    return json.dumps(obj, cls=G3DJsonEncoder)
+@profile_memory
+def encode_json(obj, sizes: Optional[Dict[str, int]] = None):
+    """sizes - gets the encoded bytes of each top-level section, the key included"""
+    return json.dumps(obj, cls=G3DJsonEncoder, sizes=sizes)
 
 
 def encode_info(info: G3dModelInfo) -> str:
@@ -45,9 +61,40 @@ def encode_info(info: G3dModelInfo) -> str:
     for anim in info.animations:
         res += f"\t- {anim}\n"
 
+    res += f"animation_aliases:\n"
+    for alias, anim in info.animation_aliases.items():
+        res += f"  {alias}: {anim}\n"
+
+    res += f"nodeparts: {sum(info.nodeparts.values())}\n"
+    res += f"max_nodepart_bones: {max(flatten(info.nodepart_bones.values()), default=0)}\n"
+
+    for name, value in vars(info.counters).items():
+        if name != 'stages':
+            res += f"{name}: {value}\n"
+
+    for name, value in info.ratios().items():
+        res += f"{name}: {value:.4f}\n"
+
+    res += f"sections:\n"
+    for name, size in info.sections.items():
+        res += f"  {name}: {size}\n"
+
+    res += f"vertices_per_sec:\n"
+    for name, value in info.throughput().items():
+        res += f"  {name}: {value:.1f}\n"
+
     return res
 
 
+def encode_metrics(info: G3dModelInfo) -> str:
+    """machine-readable model statistics (json)"""
+    return json.dumps(info.to_dict(), indent=2)
+
+
+def encode_bounds(bounds: ModelBounds) -> str:
+    """bounding volumes sidecar (json)"""
+    return json.dumps(bounds.to_dict(), indent=2)
+
 
 class G3DJsonEncoder(json.JSONEncoder):
     ln = '\n'
@@ -57,6 +104,10 @@ class G3DJsonEncoder(json.JSONEncoder):
     _encoder = encode_basestring_ascii
     float_format = "%9.6f"
 
+    def __init__(self, *args, sizes: Optional[Dict[str, int]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.sizes = sizes
+
     def iterencode(self, obj: object, _one_shot=False):
         for chunk in self._interencode_object(obj, 0):
             yield chunk
@@ -77,27 +128,12 @@ class G3DJsonEncoder(json.JSONEncoder):
             value = items[key]
 
             yield self._indentln(content_lvl)
-            yield self._encoder(key)
-            yield self.key_sep
-
-            if isinstance(value, str):
-                yield self._encoder(value)
-            elif isinstance(value, int):
-                yield str(value)
-            elif isinstance(value, float):
-                yield self._floatstr(value)
-            elif isinstance(value, collections.abc.Sequence):
-                series_break = None
-
-                if isinstance(obj, GMesh) and key == "vertices":
-                    series_break = obj.vertex_size()
-                elif isinstance(obj, GMeshPart) and key == 'indices':
-                    series_break = 12
 
-                for chunk in self._interencode_list(value, content_lvl, series_break):
-                    yield chunk
-            else:
-                raise ValueError(f'unknown type for key value: {key}: {type(value)}')
+            chunks = self._interencode_item(obj, key, value, content_lvl)
+            if lvl == 0 and self.sizes is not None:
+                chunks = self._measure(key, chunks)
+            for chunk in chunks:
+                yield chunk
 
             count += 1
             if count < len(items):
@@ -105,6 +141,37 @@ class G3DJsonEncoder(json.JSONEncoder):
 
         yield self._indentln(lvl) + '}'
 
+    def _interencode_item(self, obj: object, key: str, value: object, lvl: int):
+        yield self._encoder(key)
+        yield self.key_sep
+
+        if isinstance(value, str):
+            yield self._encoder(value)
+        elif isinstance(value, int):
+            yield str(value)
+        elif isinstance(value, float):
+            yield self._floatstr(value)
+        elif isinstance(value, collections.abc.Sequence):
+            series_break = None
+
+            if isinstance(obj, GMesh) and key == "vertices":
+                series_break = obj.vertex_size()
+            elif isinstance(obj, GMeshPart) and key == 'indices':
+                series_break = 12
+
+            for chunk in self._interencode_list(value, lvl, series_break):
+                yield chunk
+        else:
+            raise ValueError(f'unknown type for key value: {key}: {type(value)}')
+
+    def _measure(self, key: str, chunks):
+        """top-level section, the output is ascii so the characters are bytes"""
+        size = 0
+        for chunk in chunks:
+            size += len(chunk)
+            yield chunk
+        self.sizes[key] = size
+
     def _interencode_list(self, items: Sequence[Any], lvl: int, series_break: int = None):
         content_lvl = lvl + 1
 
@@ -5,16 +5,19 @@ import traceback
 
 import bpy
 from bpy_extras.io_utils import ExportHelper
-from bpy.props import BoolProperty, IntProperty, EnumProperty
+from bpy.props import BoolProperty, IntProperty, FloatProperty, EnumProperty, StringProperty
 from bpy.types import Operator
 
 import shutil
+from typing import Dict, Optional
 
 from g3d_exporter import builder
 from g3d_exporter.builder import ModelOptions
+from g3d_exporter.keyframes import Tolerance
 from g3d_exporter.model import G3dModel, G3dModelInfo
 from g3d_exporter.common import *
-from g3d_exporter import encoder
+from g3d_exporter import encoder, spatial
+from g3d_exporter.profiler import memory, span, tracer
 
 log = logging.getLogger(__name__)
 
@@ -38,12 +41,56 @@ class BaseG3dExportOperator(ExportHelper):
         default=True,
     )
 
+    incremental: BoolProperty(
+        name="Incremental",
+        description="Reuse meshes converted by the previous export when the object content is the same",
+        default=False,
+    )
+
+    cache_dir: StringProperty(
+        name="Cache directory",
+        description="On-disk cache of the converted meshes shared by exports of the other files. Empty - disabled",
+        default="",
+        subtype='DIR_PATH',
+    )
+
+    cache_size: IntProperty(
+        name="Cache size (MB)",
+        description="Least recently used meshes are removed from the cache above this size",
+        default=512,
+        min=1,
+    )
+
     descriptor: BoolProperty(
         name="Descriptor",
         description="Create human-readable model description (.yaml)",
         default=False,
     )
 
+    metrics: BoolProperty(
+        name="Metrics",
+        description="Write machine-readable export metrics (.metrics.json)",
+        default=False,
+    )
+
+    bounds: BoolProperty(
+        name="Bounds",
+        description="Write bounding boxes and spheres of nodes, mesh parts and skinned animations (.bounds.json)",
+        default=False,
+    )
+
+    trace: BoolProperty(
+        name="Trace",
+        description="Write timeline of export stages in Chrome trace-event format (.trace.json)",
+        default=False,
+    )
+
+    track_memory: BoolProperty(
+        name="Memory",
+        description="Write tracemalloc peaks and top allocation sites of export stages (.memory.txt). Slows down the export",
+        default=False,
+    )
+
     use_normal: BoolProperty(
         name="Normal",
         description="Include vertex normal attribute",
@@ -154,6 +201,77 @@ class BaseG3dExportOperator(ExportHelper):
         default=24,
     )
 
+    animation_format: EnumProperty(
+        name="Animation format",
+        description="How the bone animation is written",
+        default='KEYFRAMES',
+        items=(
+            ('KEYFRAMES', 'Keyframes', 'Translation, rotation and scale in the each keyframe'),
+            ('CHANNELS', 'Channels', 'Separate translation, rotation and scaling tracks, '
+                                     'channels which stay in the rest pose are omitted'))
+    )
+
+    adaptive_bake: BoolProperty(
+        name="Adaptive bake",
+        description="Bake non-linear curves only until the pose error is below max error, keeps sub-frame keytimes",
+        default=False,
+    )
+
+    adaptive_error: FloatProperty(
+        name="Max bake error",
+        description="Max translation, rotation (radians) and scale error of the adaptive bake",
+        default=0.001,
+        min=0.000001,
+        precision=5,
+    )
+
+    bake_workers: IntProperty(
+        name="Bake workers",
+        description="Processes baking the actions in parallel, 0 - bake in the blender process",
+        default=0,
+        min=0,
+        max=64,
+    )
+
+    share_animations: BoolProperty(
+        name="Share animations",
+        description="Write the action once for the armatures with the same bones and rest poses. "
+                    "The animations of the other armatures aren't written, "
+                    "their ids are listed in the descriptor as aliases of the written one",
+        default=False,
+    )
+
+    simplify_keyframes: BoolProperty(
+        name="Simplify keyframes",
+        description="Drop baked keyframes which are reproduced by interpolation of their neighbours",
+        default=False,
+    )
+
+    keyframe_tolerance_translation: FloatProperty(
+        name="Translation tolerance",
+        description="Max translation error of dropped keyframe",
+        default=0.0001,
+        min=0.0,
+        precision=5,
+    )
+
+    keyframe_tolerance_rotation: FloatProperty(
+        name="Rotation tolerance",
+        description="Max rotation error of dropped keyframe",
+        subtype='ANGLE',
+        default=0.0005,
+        min=0.0,
+        precision=5,
+    )
+
+    keyframe_tolerance_scale: FloatProperty(
+        name="Scale tolerance",
+        description="Max scale error of dropped keyframe",
+        default=0.0001,
+        min=0.0,
+        precision=5,
+    )
+
     primitive_type: EnumProperty(
         name="Primitive type",
         description="Used to specify the primitive type of the mesh part",
@@ -167,6 +285,42 @@ class BaseG3dExportOperator(ExportHelper):
             ( 'LINE_STRIP', 'Line strip', ''))
     )
 
+    optimize_vertex_cache: BoolProperty(
+        name="Optimize vertex cache",
+        description="Reorder triangles of the each mesh part for the GPU post-transform vertex cache. "
+                    "Changes the order of the exported indices",
+        default=False,
+    )
+
+    optimize_vertex_fetch: BoolProperty(
+        name="Optimize vertex fetch",
+        description="Renumber vertices in the order they are referenced by the indices",
+        default=True,
+    )
+
+    lod_count: IntProperty(
+        name="LOD levels",
+        description="Decimated levels of detail exported as sibling nodes with _LOD<level> suffix",
+        default=0,
+        min=0,
+        max=8,
+    )
+
+    lod_ratio: FloatProperty(
+        name="LOD ratio",
+        description="Faces of the each level relative to the previous one",
+        default=0.5,
+        min=0.01,
+        max=1.0,
+    )
+
+    chunk_faces: IntProperty(
+        name="Chunk faces",
+        description="Split meshes into spatial chunk nodes of this many faces at most, for culling. 0 - disabled",
+        default=0,
+        min=0,
+    )
+
     def draw(self, context):
         layout = self.layout
         layout.use_property_split = True
@@ -176,8 +330,17 @@ class BaseG3dExportOperator(ExportHelper):
 
         layout.row().prop(operator, "selected_only")
         layout.row().prop(operator, "apply_modifiers")
+        layout.row().prop(operator, "incremental")
+        layout.row().prop(operator, "cache_dir")
+        row = layout.row()
+        row.enabled = bool(self.cache_dir)
+        row.prop(operator, "cache_size")
         layout.row().prop(operator, "y_up")
         layout.row().prop(operator, "descriptor")
+        layout.row().prop(operator, "metrics")
+        layout.row().prop(operator, "bounds")
+        layout.row().prop(operator, "trace")
+        layout.row().prop(operator, "track_memory")
 
         # mesh attributes
         box = layout.box()
@@ -204,6 +367,13 @@ class BaseG3dExportOperator(ExportHelper):
         # will be replaced with alternative implementation
         # box.row().prop(operator, "use_shapekeys")
         box.row().prop(operator, "primitive_type")
+        box.row().prop(operator, "optimize_vertex_cache")
+        box.row().prop(operator, "optimize_vertex_fetch")
+        box.row().prop(operator, "lod_count")
+        row = box.row()
+        row.enabled = self.lod_count > 0
+        row.prop(operator, "lod_ratio")
+        box.row().prop(operator, "chunk_faces")
 
         # material
         box = layout.box()
@@ -243,25 +413,66 @@ class BaseG3dExportOperator(ExportHelper):
         row.enabled = self.use_actions
         row.prop(operator, "fps")
 
+        row = box.row()
+        row.enabled = self.use_actions
+        row.prop(operator, "animation_format")
+
+        row = box.row()
+        row.enabled = self.use_actions
+        row.prop(operator, "adaptive_bake")
+        row = box.row()
+        row.enabled = self.use_actions and self.adaptive_bake
+        row.prop(operator, "adaptive_error")
+
+        row = box.row()
+        row.enabled = self.use_actions
+        row.prop(operator, "bake_workers")
+
+        row = box.row()
+        row.enabled = self.use_actions
+        row.prop(operator, "share_animations")
+
+        row = box.row()
+        row.enabled = self.use_actions
+        row.prop(operator, "simplify_keyframes")
+        for name in ("keyframe_tolerance_translation", "keyframe_tolerance_rotation", "keyframe_tolerance_scale"):
+            row = box.row()
+            row.enabled = self.use_actions and self.simplify_keyframes
+            row.prop(operator, name)
+
     def execute(self, context):
         """called by blender"""
 
         start = time.process_time()
+
+        if self.trace:
+            tracer.start()
+
+        if self.track_memory:
+            memory.start()
+
+        out = Path(self.filepath)
         try:
-            opt = self._build_options()
+            with span('export', file=out.name):
+                opt = self._build_options()
 
-            builder.b_log = self.report
-            model = builder.build(opt)
+                builder.b_log = self.report
+                model = builder.build(opt)
 
-            out = Path(self.filepath)
+                if self.copy_textures:
+                    with span('copy_textures'):
+                        self._copy_textures(out.parent, model)
 
-            if self.copy_textures:
-                self._copy_textures(out.parent, model)
+                # sections are measured while the model is encoded
+                sizes = dict() if self.descriptor or self.metrics else None
+                writepath = self.export_g3d(out, model, sizes)
 
-            writepath = self.export_g3d(out, model)
+                if sizes is not None:
+                    self._write_description(model, writepath, sizes)
 
-            if self.descriptor:
-                self._write_description(model, writepath.with_suffix(".yaml"))
+                if self.bounds:
+                    with span('bounds'):
+                        write(encoder.encode_bounds(spatial.model_bounds(model)), writepath.with_suffix(".bounds.json"))
 
             duration = time.process_time() - start
             self.report({'INFO'}, "Export {:s} ({:.2f} sec)".format(str(writepath), duration))
@@ -270,12 +481,28 @@ class BaseG3dExportOperator(ExportHelper):
             self.report({'ERROR'}, str(e))
             log.exception(str(e))
 
+        finally:
+            if self.trace:
+                tracer.stop()
+                trace_file = tracer.dump(out.with_suffix(".trace.json"))
+                log.debug("write trace %s", trace_file)
+
+            if self.track_memory:
+                memory.stop()
+                write(memory.format(), out.with_suffix(".memory.txt"))
+
         return {'FINISHED'}
 
-    def _write_description(self, g3d: G3dModel, path):
+    def _write_description(self, g3d: G3dModel, path: Path, sizes: Dict[str, int]):
         info = G3dModelInfo()
         info.update(g3d)
-        write(encoder.encode_info(info), path)
+        info.sections = sizes
+
+        if self.descriptor:
+            write(encoder.encode_info(info), path.with_suffix(".yaml"))
+
+        if self.metrics:
+            write(encoder.encode_metrics(info), path.with_suffix(".metrics.json"))
 
     def _build_options(self) -> ModelOptions:
         opt = ModelOptions()
@@ -298,10 +525,29 @@ class BaseG3dExportOperator(ExportHelper):
         opt.add_bone_tip = self.add_bone_tip
         opt.apply_modifiers = self.apply_modifiers
         opt.fps = self.fps
+        opt.animation_format = self.animation_format
+        opt.adaptive_bake = self.adaptive_bake
+        opt.adaptive_error = self.adaptive_error
+        opt.bake_workers = self.bake_workers
+        opt.share_animations = self.share_animations
+        opt.simplify_keyframes = self.simplify_keyframes
+        opt.keyframe_tolerance = Tolerance(self.keyframe_tolerance_translation,
+                                           self.keyframe_tolerance_rotation,
+                                           self.keyframe_tolerance_scale)
         opt.primitive_type = self.primitive_type
+        opt.optimize_vertex_cache = self.optimize_vertex_cache
+        opt.measure = self.descriptor or self.metrics
+        opt.optimize_vertex_fetch = self.optimize_vertex_fetch
+        opt.lod_count = self.lod_count
+        opt.lod_ratio = self.lod_ratio
+        opt.chunk_faces = self.chunk_faces
+        opt.incremental = self.incremental
+        opt.cache_dir = bpy.path.abspath(self.cache_dir) if self.cache_dir else ""
+        opt.cache_size = self.cache_size * 1024 * 1024
         return opt
 
-    def export_g3d(self, out: Path, model: G3dModel) -> Path:
+    def export_g3d(self, out: Path, model: G3dModel, sizes: Optional[Dict[str, int]]) -> Path:
+        """sizes - gets the encoded bytes of the model sections if not none"""
         raise ValueError("not implemented")
 
     def _copy_textures(self, source_dir: Path, model: G3dModel):
@@ -336,9 +582,11 @@ class G3djExportOperator(Operator, BaseG3dExportOperator):
     filename_ext = ".g3dj"
     bl_options = {'PRESET'}
 
-    def export_g3d(self, filepath: Path, model: G3dModel) -> Path:
-        data = encoder.encode_json(model)
-        return write(data, filepath.with_suffix('.g3dj'), 'w')
+    def export_g3d(self, filepath: Path, model: G3dModel, sizes: Optional[Dict[str, int]]) -> Path:
+        with span('encode', format='g3dj'), model.counters.stage('encode'):
+            data = encoder.encode_json(model, sizes)
+        with span('write', bytes=len(data)), model.counters.stage('write'):
+            return write(data, filepath.with_suffix('.g3dj'), 'w')
 
 
 class G3dbExportOperator(Operator, BaseG3dExportOperator):
@@ -347,9 +595,11 @@ class G3dbExportOperator(Operator, BaseG3dExportOperator):
     filename_ext = ".g3db"
     bl_options = {'PRESET'}
 
-    def export_g3d(self, filepath: Path, model: G3dModel) -> Path:
-        data = encoder.encode_binary(model)
-        return write(data, filepath.with_suffix('.g3db'), 'wb')
+    def export_g3d(self, filepath: Path, model: G3dModel, sizes: Optional[Dict[str, int]]) -> Path:
+        with span('encode', format='g3db'), model.counters.stage('encode'):
+            data = encoder.encode_binary(model, sizes)
+        with span('write', bytes=len(data)), model.counters.stage('write'):
+            return write(data, filepath.with_suffix('.g3db'), 'wb')
 
 
 def menu_func_export(self, context):
@@ -0,0 +1,230 @@
+# <pep8 compliant>
+"""
+Vectorized evaluation of blender f-curves.
+Keyframe points are read once and the curves are sampled for all frames at once,
+follows blender's fcurve_eval_keyframes (constant, linear and bezier segments, constant and linear extrapolation).
+Curves with other interpolation types or modifiers are evaluated by FCurve.evaluate.
+"""
+from typing import List, Sequence
+
+import numpy as np
+
+from g3d_exporter.profiler import profile
+
+# values of the blender interpolation enum, the easing types follow BEZIER
+CONSTANT = 0
+LINEAR = 1
+BEZIER = 2
+
+# iterations to solve bezier x(t) = frame, enough for double precision
+_BISECT_ITERATIONS = 48
+_EPSILON = 1e-8
+
+
+class CurveData(object):
+    """keyframe points of a single f-curve as arrays"""
+    def __init__(self, array_index: int,
+                 co: np.ndarray,
+                 handle_left: np.ndarray,
+                 handle_right: np.ndarray,
+                 interpolation: np.ndarray,
+                 extrapolation: str = 'CONSTANT',
+                 fcurve=None):
+        self.array_index = array_index
+        self.co = co # (n, 2)
+        self.handle_left = handle_left # (n, 2)
+        self.handle_right = handle_right # (n, 2)
+        self.interpolation = interpolation # (n,) int codes
+        self.extrapolation = extrapolation
+        self.fcurve = fcurve # used for unsupported curves
+        self.supported = fcurve is None or _is_supported(fcurve, interpolation)
+
+    def __len__(self):
+        return len(self.co)
+
+    def __getstate__(self):
+        """blender curve stays in blender, so unsupported curve can't be evaluated by the other process"""
+        state = dict(self.__dict__)
+        state['fcurve'] = None
+        return state
+
+    @staticmethod
+    @profile
+    def from_fcurve(fcurve) -> 'CurveData':
+        """reads bpy.types.FCurve keyframe points once"""
+        points = fcurve.keyframe_points
+        n = len(points)
+
+        co = np.empty(n * 2, dtype=np.float64)
+        handle_left = np.empty(n * 2, dtype=np.float64)
+        handle_right = np.empty(n * 2, dtype=np.float64)
+        points.foreach_get('co', co)
+        points.foreach_get('handle_left', handle_left)
+        points.foreach_get('handle_right', handle_right)
+
+        interpolation = np.empty(n, dtype=np.int8)
+        points.foreach_get('interpolation', interpolation)
+
+        return CurveData(fcurve.array_index,
+                         co.reshape(n, 2), handle_left.reshape(n, 2), handle_right.reshape(n, 2),
+                         interpolation, fcurve.extrapolation, fcurve)
+
+
+def _is_supported(fcurve, interpolation: np.ndarray) -> bool:
+    return len(fcurve.modifiers) == 0 and bool(np.all(interpolation <= BEZIER))
+
+
+@profile
+def sample(curve: CurveData, frames: np.ndarray) -> np.ndarray:
+    """values of the curve at the frames"""
+    frames = np.asarray(frames, dtype=np.float64)
+
+    if not curve.supported:
+        return np.array([curve.fcurve.evaluate(f) for f in frames], dtype=np.float64)
+
+    n = len(curve)
+    result = np.zeros(len(frames), dtype=np.float64)
+
+    if n == 0:
+        return result
+
+    xs = curve.co[:, 0]
+    ys = curve.co[:, 1]
+
+    # index of the keyframe before the frame
+    idx = np.searchsorted(xs, frames, side='right') - 1
+
+    before = idx < 0
+    after = idx >= n - 1
+    inside = ~(before | after)
+
+    result[before] = _extrapolate_start(curve, frames[before])
+    result[after] = _extrapolate_end(curve, frames[after])
+
+    if np.any(inside):
+        i = idx[inside]
+        t = frames[inside]
+        ipo = curve.interpolation[i]
+        values = np.empty(len(i), dtype=np.float64)
+
+        mask = ipo == CONSTANT
+        values[mask] = ys[i[mask]]
+
+        mask = ipo == LINEAR
+        if np.any(mask):
+            j = i[mask]
+            dx = xs[j + 1] - xs[j]
+            fac = np.where(dx != 0, (t[mask] - xs[j]) / np.where(dx != 0, dx, 1), 0)
+            values[mask] = ys[j] + (ys[j + 1] - ys[j]) * fac
+
+        mask = ipo == BEZIER
+        if np.any(mask):
+            values[mask] = _eval_bezier(curve, i[mask], t[mask])
+
+        result[inside] = values
+
+    return result
+
+
+def sample_curves(curves: Sequence[CurveData], frames: np.ndarray, defaults: Sequence[float]) -> np.ndarray:
+    """(frames x channels) array, channels without curve have default value"""
+    frames = np.asarray(frames, dtype=np.float64)
+    result = np.empty((len(frames), len(defaults)), dtype=np.float64)
+    result[:] = defaults
+
+    for curve in curves:
+        if 0 <= curve.array_index < len(defaults):
+            result[:, curve.array_index] = sample(curve, frames)
+    return result
+
+
+def _extrapolate_start(curve: CurveData, frames: np.ndarray) -> np.ndarray:
+    first = curve.co[0]
+
+    if curve.extrapolation == 'LINEAR' and len(curve) > 1 and curve.interpolation[0] != CONSTANT:
+        if curve.interpolation[0] == LINEAR:
+            slope = _slope(first, curve.co[1])
+        else:
+            slope = _slope(curve.handle_left[0], first)
+        return first[1] - slope * (first[0] - frames)
+
+    return np.full(len(frames), first[1])
+
+
+def _extrapolate_end(curve: CurveData, frames: np.ndarray) -> np.ndarray:
+    last = curve.co[-1]
+
+    if curve.extrapolation == 'LINEAR' and len(curve) > 1 and curve.interpolation[-1] != CONSTANT:
+        if curve.interpolation[-1] == LINEAR:
+            slope = _slope(curve.co[-2], last)
+        else:
+            slope = _slope(last, curve.handle_right[-1])
+        return last[1] + slope * (frames - last[0])
+
+    return np.full(len(frames), last[1])
+
+
+def _slope(a: np.ndarray, b: np.ndarray) -> float:
+    dx = b[0] - a[0]
+    return (b[1] - a[1]) / dx if dx != 0 else 0.0
+
+
+def _eval_bezier(curve: CurveData, i: np.ndarray, t: np.ndarray) -> np.ndarray:
+    """segments between keyframes i and i + 1"""
+    v1 = curve.co[i].copy()
+    v2 = curve.handle_right[i].copy()
+    v3 = curve.handle_left[i + 1].copy()
+    v4 = curve.co[i + 1].copy()
+
+    _correct_bezpart(v1, v2, v3, v4)
+
+    # solve x(u) = t, x is monotonic on [0, 1] after the correction
+    c0 = v1[:, 0]
+    c1 = 3.0 * (v2[:, 0] - v1[:, 0])
+    c2 = 3.0 * (v1[:, 0] - 2.0 * v2[:, 0] + v3[:, 0])
+    c3 = v4[:, 0] - v1[:, 0] + 3.0 * (v2[:, 0] - v3[:, 0])
+
+    lo = np.zeros(len(t))
+    hi = np.ones(len(t))
+    for _ in range(_BISECT_ITERATIONS):
+        u = (lo + hi) * 0.5
+        x = ((c3 * u + c2) * u + c1) * u + c0
+        less = x < t
+        lo = np.where(less, u, lo)
+        hi = np.where(less, hi, u)
+    u = (lo + hi) * 0.5
+
+    mu = 1.0 - u
+    values = mu * mu * mu * v1[:, 1] + 3.0 * mu * mu * u * v2[:, 1] + 3.0 * mu * u * u * v3[:, 1] + u * u * u * v4[:, 1]
+
+    # flat segments
+    flat = (np.abs(v1[:, 1] - v4[:, 1]) < _EPSILON) \
+        & (np.abs(v2[:, 1] - v3[:, 1]) < _EPSILON) \
+        & (np.abs(v3[:, 1] - v4[:, 1]) < _EPSILON)
+    return np.where(flat, v1[:, 1], values)
+
+
+def _correct_bezpart(v1: np.ndarray, v2: np.ndarray, v3: np.ndarray, v4: np.ndarray):
+    """scales handles which overlap in time, same as BKE_fcurve_correct_bezpart"""
+    h1 = v1 - v2
+    h2 = v4 - v3
+
+    length = v4[:, 0] - v1[:, 0]
+    len1 = np.abs(h1[:, 0])
+    len2 = np.abs(h2[:, 0])
+    total = len1 + len2
+
+    mask = (total > 0) & (total > length)
+    if not np.any(mask):
+        return
+
+    fac = (length[mask] / total[mask])[:, None]
+    v2[mask] = v1[mask] - fac * h1[mask]
+    v3[mask] = v4[mask] - fac * h2[mask]
+
+
+def keyframe_times(curves: List[CurveData]) -> np.ndarray:
+    """sorted unique keyframe times of the curves"""
+    if not curves:
+        return np.empty(0)
+    return np.unique(np.concatenate([c.co[:, 0] for c in curves]))
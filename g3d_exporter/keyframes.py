@@ -0,0 +1,200 @@
+# <pep8 compliant>
+"""Post-bake keyframe reduction and adaptive sampling of the curves"""
+import math
+from typing import Callable, Dict, List, Tuple
+
+from g3d_exporter import model
+from g3d_exporter.profiler import profile
+
+Trs = Tuple[Tuple[float, float, float], Tuple[float, float, float, float], Tuple[float, float, float]]
+
+
+class Tolerance(object):
+    def __init__(self, translation: float = 0.0001, rotation: float = 0.0005, scale: float = 0.0001):
+        self.translation = translation # distance
+        self.rotation = rotation # radians
+        self.scale = scale # per axis
+
+
+# points of the segment where adaptive sampling measures the error
+_PROBES = (0.25, 0.5, 0.75)
+
+
+@profile
+def simplify(anim: model.GBoneAnimation, tol: Tolerance) -> int:
+    """
+    Drops keyframes which are reproduced by linear (translation, scale)
+    or spherical (rotation) interpolation of the neighbours, as libgdx does.
+    Full keyframes and channel tracks are reduced the same way.
+    Returns count of removed keyframes.
+    """
+    removed = 0
+
+    count = anim.keyframe_count()
+    if count > 2:
+        poses = list(zip(anim.translations.tolist(), anim.rotations.tolist(), anim.scales.tolist()))
+        kept = _reduce(anim.keytimes.tolist(), poses, *pose_metric(tol))
+        removed += count - len(kept)
+        anim.select_keyframes(kept)
+
+    for name, (interpolate, close) in channel_metrics(tol).items():
+        keys = getattr(anim, name)
+        if len(keys) > 2:
+            kept = _reduce([k.keytime for k in keys], [k.value for k in keys], interpolate, close)
+            removed += len(keys) - len(kept)
+            setattr(anim, name, [keys[i] for i in kept])
+
+    return removed
+
+
+@profile
+def refine(times: List[float], sample: Callable[[List[float]], List],
+           interpolate: Callable, close: Callable, min_step: float) -> List[float]:
+    """
+    Adaptive sampling: subdivides the segments between the times while interpolation of the segment ends
+    doesn't reproduce the sampled track at the probes. Segments shorter than 2 * min_step are not split.
+    sample - values at the times, evaluated in bulk for all the segments of the same level
+    """
+    values = dict(zip(times, sample(times)))
+    pending = list(zip(times, times[1:]))
+
+    while pending:
+        probes = [a + (b - a) * q for a, b in pending for q in _PROBES]
+        sampled = sample(probes)
+        split = list()
+
+        for idx, (a, b) in enumerate(pending):
+            probe_values = sampled[idx * len(_PROBES):(idx + 1) * len(_PROBES)]
+            if all(close(v, interpolate(values[a], values[b], q)) for q, v in zip(_PROBES, probe_values)):
+                continue
+            if b - a < min_step * 2:
+                continue
+
+            mid = (a + b) * 0.5
+            values[mid] = probe_values[_PROBES.index(0.5)]
+            split.append((a, mid))
+            split.append((mid, b))
+
+        pending = split
+
+    return sorted(values)
+
+
+def pose_metric(tol: Tolerance) -> Tuple[Callable, Callable]:
+    """interpolation and tolerance check of the (translation, rotation, scale) poses"""
+    return _lerp_trs, lambda a, b: _close(a, b, tol)
+
+
+def channel_metrics(tol: Tolerance) -> Dict[str, Tuple[Callable, Callable]]:
+    """interpolation and tolerance check of the each channel track"""
+    return {
+        'translation': (_lerp, lambda a, b: _distance(a, b) <= tol.translation),
+        'rotation': (_slerp, lambda a, b: _angle(a, b) <= tol.rotation),
+        'scaling': (_lerp, lambda a, b: _max_diff(a, b) <= tol.scale),
+    }
+
+
+def _reduce(times: List[float], values: List, interpolate: Callable, close: Callable) -> List[int]:
+    """
+    greedy: extends the segment from the last kept key while the keys between are reproduced.
+    The end is doubled until the segment doesn't fit and then bisected,
+    so a segment of L keys is checked O(log L) times instead of L times.
+    """
+    n = len(values)
+    kept = [0]
+    anchor = 0
+
+    while True:
+        # the neighbour key always fits
+        fits = anchor + 1
+        step = 2
+        while anchor + step < n and _segment_fits(times, values, anchor, anchor + step, interpolate, close):
+            fits = anchor + step
+            step *= 2
+
+        # the last checked end doesn't fit or is past the track
+        upper = min(anchor + step, n)
+        while upper - fits > 1:
+            mid = (fits + upper) // 2
+            if _segment_fits(times, values, anchor, mid, interpolate, close):
+                fits = mid
+            else:
+                upper = mid
+
+        if fits == n - 1:
+            break
+        anchor = fits
+        kept.append(anchor)
+
+    # the whole track is constant
+    if len(kept) == 1 and close(values[0], values[-1]):
+        return kept
+
+    kept.append(n - 1)
+    return kept
+
+
+def _segment_fits(times: List[float], values: List, start: int, end: int,
+                  interpolate: Callable, close: Callable) -> bool:
+    t0 = times[start]
+    duration = times[end] - t0
+    a = values[start]
+    b = values[end]
+
+    for i in range(start + 1, end):
+        factor = (times[i] - t0) / duration if duration > 0 else 0.0
+        if not close(values[i], interpolate(a, b, factor)):
+            return False
+    return True
+
+
+def _lerp_trs(a: Trs, b: Trs, factor: float) -> Trs:
+    return _lerp(a[0], b[0], factor), _slerp(a[1], b[1], factor), _lerp(a[2], b[2], factor)
+
+
+def _close(a: Trs, b: Trs, tol: Tolerance) -> bool:
+    return _distance(a[0], b[0]) <= tol.translation \
+        and _angle(a[1], b[1]) <= tol.rotation \
+        and _max_diff(a[2], b[2]) <= tol.scale
+
+
+def _distance(a, b) -> float:
+    return math.sqrt(sum((x - y) ** 2 for x, y in zip(a, b)))
+
+
+def _max_diff(a, b) -> float:
+    return max(abs(x - y) for x, y in zip(a, b))
+
+
+def _dot(a, b) -> float:
+    return a[0] * b[0] + a[1] * b[1] + a[2] * b[2] + a[3] * b[3]
+
+
+def _angle(a, b) -> float:
+    """angle between rotations, component order doesn't matter"""
+    length = math.sqrt(_dot(a, a) * _dot(b, b))
+    if length == 0:
+        return 0.0
+    return 2.0 * math.acos(min(1.0, abs(_dot(a, b)) / length))
+
+
+def _lerp(a, b, factor: float) -> Tuple[float, ...]:
+    return tuple(x + (y - x) * factor for x, y in zip(a, b))
+
+
+def _slerp(a, b, factor: float) -> Tuple[float, ...]:
+    cos = _dot(a, b)
+    if cos < 0:
+        b = tuple(-v for v in b)
+        cos = -cos
+
+    if cos > 0.9995:
+        res = _lerp(a, b, factor)
+        length = math.sqrt(_dot(res, res))
+        return tuple(v / length for v in res)
+
+    theta = math.acos(min(cos, 1.0))
+    sin = math.sin(theta)
+    fa = math.sin((1 - factor) * theta) / sin
+    fb = math.sin(factor * theta) / sin
+    return tuple(x * fa + y * fb for x, y in zip(a, b))
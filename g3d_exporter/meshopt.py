@@ -0,0 +1,252 @@
+# <pep8 compliant>
+"""
+Index and vertex order optimizations of the triangle lists, line strips of the edges.
+Blender-free, works on the mesh part indices.
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from g3d_exporter.profiler import profile
+
+# post-transform cache of the target GPUs, in vertices
+CACHE_SIZE = 16
+
+
+@profile
+def cache_misses(indices: Sequence[int], cache_size: int = CACHE_SIZE) -> int:
+    """vertices transformed by FIFO post-transform cache"""
+    # timestamp of the vertex caching, a vertex is in the cache while less than cache_size misses happened after
+    cached_at = dict()
+    misses = 0
+
+    for v in indices:
+        at = cached_at.get(v, None)
+        if at is None or misses - at >= cache_size:
+            cached_at[v] = misses
+            misses += 1
+    return misses
+
+
+def acmr(indices: Sequence[int], cache_size: int = CACHE_SIZE) -> float:
+    """average cache miss ratio: transformed vertices per triangle, 0.5 is ideal, 3 is the worst"""
+    triangles = len(indices) // 3
+    return cache_misses(indices, cache_size) / triangles if triangles else 0.0
+
+
+@profile
+def tipsify(indices: Sequence[int], cache_size: int = CACHE_SIZE) -> List[int]:
+    """
+    Reorders triangles for the vertex cache locality (Sander et al., Fast Triangle Reordering, 2007).
+    Linear in the count of triangles, the vertices of the each triangle keep their order.
+    """
+    if len(indices) < 6:
+        return list(indices)
+
+    (vertices, local) = np.unique(np.asarray(indices, dtype=np.int64), return_inverse=True)
+    tris = local.reshape(-1, 3)
+    (adjacency, offsets) = _adjacency(local, len(vertices))
+
+    tri_list: List[List[int]] = tris.tolist()
+    adjacency = adjacency.tolist()
+    offsets = offsets.tolist()
+    live: List[int] = np.diff(offsets).tolist()
+
+    cached_at = [0] * len(vertices)
+    emitted = [False] * len(tri_list)
+    dead_end: List[int] = list()
+    output: List[int] = list()
+
+    fanning = 0
+    stamp = cache_size + 1
+    cursor = 1
+
+    while fanning >= 0:
+        candidates = list()
+
+        for t in adjacency[offsets[fanning]:offsets[fanning + 1]]:
+            if emitted[t]:
+                continue
+            emitted[t] = True
+
+            for v in tri_list[t]:
+                output.append(v)
+                dead_end.append(v)
+                candidates.append(v)
+                live[v] -= 1
+                if stamp - cached_at[v] > cache_size:
+                    cached_at[v] = stamp
+                    stamp += 1
+
+        # next fanning vertex: in the cache after its fan is emitted, then the most recent one
+        fanning = -1
+        best = -1
+        for v in candidates:
+            if live[v] > 0:
+                priority = 0
+                if stamp - cached_at[v] + 2 * live[v] <= cache_size:
+                    priority = stamp - cached_at[v]
+                if priority > best:
+                    best = priority
+                    fanning = v
+
+        if fanning < 0:
+            while dead_end:
+                v = dead_end.pop()
+                if live[v] > 0:
+                    fanning = v
+                    break
+
+        if fanning < 0:
+            while cursor < len(vertices):
+                if live[cursor] > 0:
+                    fanning = cursor
+                    break
+                cursor += 1
+
+    return vertices[np.asarray(output, dtype=np.int64)].tolist()
+
+
+@profile
+def stripify(indices: Sequence[int]) -> List[int]:
+    """
+    Converts triangle list to a single triangle strip, greedy walk over the shared edges.
+    Strips are joined by degenerate triangles, winding of the each triangle is kept.
+    Disconnected triangles make the strip longer than the list, the caller keeps the shorter one.
+    """
+    # degenerate triangles are not drawn anyway
+    tris = [(a, b, c) for a, b, c in zip(indices[0::3], indices[1::3], indices[2::3]) if a != b and b != c and a != c]
+
+    # directed edge of the triangle winding -> triangles
+    edges: Dict[Tuple[int, int], List[int]] = dict()
+    for t, (a, b, c) in enumerate(tris):
+        for edge in ((a, b), (b, c), (c, a)):
+            edges.setdefault(edge, list()).append(t)
+
+    used = [False] * len(tris)
+    output: List[int] = list()
+
+    for start in range(len(tris)):
+        if used[start]:
+            continue
+
+        used[start] = True
+        strip = _start_rotation(tris[start], edges, used)
+        _walk_strip(strip, tris, edges, used)
+        _join_strip(output, strip)
+
+    return output
+
+
+def strip_triangles(strip: Sequence[int]) -> List[Tuple[int, int, int]]:
+    """triangles of the strip in the list winding, degenerate ones are skipped"""
+    tris = list()
+    for i in range(len(strip) - 2):
+        (a, b, c) = strip[i:i + 3]
+        if a == b or b == c or a == c:
+            continue
+        tris.append((a, b, c) if i % 2 == 0 else (b, a, c))
+    return tris
+
+
+def chain_lines(lines: Sequence[int]) -> Optional[List[int]]:
+    """single line strip of all the lines, None if the lines aren't a single path or loop"""
+    if not len(lines):
+        return list()
+
+    (vertices, local) = np.unique(np.asarray(lines, dtype=np.int64), return_inverse=True)
+    if np.any(np.bincount(local) > 2):
+        return None
+
+    pairs = local.reshape(-1, 2).tolist()
+    adjacent: List[List[int]] = [list() for _ in range(len(vertices))]
+    for e, (a, b) in enumerate(pairs):
+        adjacent[a].append(e)
+        adjacent[b].append(e)
+
+    # path starts at its end, loop anywhere
+    current = next((v for v, edges in enumerate(adjacent) if len(edges) == 1), 0)
+    used = [False] * len(pairs)
+    output = [current]
+
+    while True:
+        e = next((e for e in adjacent[current] if not used[e]), None)
+        if e is None:
+            break
+        used[e] = True
+        (a, b) = pairs[e]
+        current = b if a == current else a
+        output.append(current)
+
+    if len(output) != len(pairs) + 1:
+        return None
+    return vertices[np.asarray(output, dtype=np.int64)].tolist()
+
+
+def _start_rotation(tri: Tuple[int, int, int], edges: Dict[Tuple[int, int], List[int]],
+                    used: List[bool]) -> List[int]:
+    """rotation of the first triangle which strip continues over a free neighbour, it's walked only once"""
+    (a, b, c) = tri
+    for rotation in ((a, b, c), (b, c, a), (c, a, b)):
+        # the second triangle of the strip is drawn as (c, b, next)
+        if any(not used[t] for t in edges.get((rotation[2], rotation[1]), ())):
+            return list(rotation)
+    return [a, b, c]
+
+
+def _walk_strip(strip: List[int], tris: List[Tuple[int, int, int]],
+                edges: Dict[Tuple[int, int], List[int]], used: List[bool]):
+    """appends the triangles which continue the strip, they are marked as used"""
+    while True:
+        (p, q) = strip[-2:]
+        # odd triangles of the strip are drawn as (q, p, next)
+        edge = (q, p) if len(strip) % 2 == 1 else (p, q)
+
+        found = next((t for t in edges.get(edge, ()) if not used[t]), None)
+        if found is None:
+            return
+
+        used[found] = True
+        strip.append(next(v for v in tris[found] if v != p and v != q))
+
+
+def _join_strip(output: List[int], strip: List[int]):
+    """appends the strip by degenerate triangles, the strip starts at even position to keep its winding"""
+    if output:
+        output.append(output[-1])
+        if len(output) % 2 == 0:
+            output.append(strip[0])
+        output.append(strip[0])
+    output.extend(strip)
+
+
+@profile
+def optimize_vertex_fetch(vertices: Sequence[float], vertex_size: int,
+                          parts: List[Sequence[int]]) -> Tuple[List[float], List[List[int]]]:
+    """
+    Renumbers vertices in the order the indices of the parts reference them first,
+    vertices which aren't referenced are kept after them. Returns new vertices and indices of the each part.
+    """
+    count = len(vertices) // vertex_size if vertex_size else 0
+    arrays = [np.asarray(indices, dtype=np.int64) for indices in parts]
+    referenced = np.concatenate(arrays) if arrays else np.empty(0, dtype=np.int64)
+
+    (unique, first) = np.unique(referenced, return_index=True)
+    order = unique[np.argsort(first, kind='stable')]
+    order = np.concatenate((order, np.setdiff1d(np.arange(count), unique, assume_unique=True)))
+
+    # old index -> new index
+    remap = np.empty(count, dtype=np.int64)
+    remap[order] = np.arange(count)
+
+    table = np.asarray(vertices, dtype=np.float64).reshape(count, vertex_size)
+    return table[order].ravel().tolist(), [remap[indices].tolist() for indices in arrays]
+
+
+def _adjacency(local: np.ndarray, vertex_count: int) -> Tuple[np.ndarray, np.ndarray]:
+    """triangles of the each vertex: adjacency[offsets[v]:offsets[v + 1]]"""
+    triangle_of = np.repeat(np.arange(len(local) // 3), 3)
+    order = np.argsort(local, kind='stable')
+    offsets = np.zeros(vertex_count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(local, minlength=vertex_count), out=offsets[1:])
+    return triangle_of[order], offsets
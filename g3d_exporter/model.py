@@ -1,9 +1,17 @@
 # <pep8 compliant>
+import contextlib
+import time
 import typing
 
-import bpy
+try:
+    import bpy
+except ImportError:
+    # model and encoders can be used outside of blender
+    bpy = None
 
-from typing import Dict, Tuple
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
 
 from g3d_exporter.common import *
 from g3d_exporter.profiler import profile
@@ -66,11 +74,11 @@ class GMesh(object):
 
 
 class GTexture(object):
-    def __init__(self, id: str, type: str, filename: str, image: bpy.types.Image):
+    def __init__(self, id: str, type: str, filename: str, image: 'bpy.types.Image'):
         self.id: str = id
         self.type: str = type
         self.filename: str = filename
-        self.image: bpy.types.Image = image
+        self.image: 'bpy.types.Image' = image
 
     def __str__(self) -> str:
         return f"GTexture({self.id}, {self.type}, {self.filename})"
@@ -135,7 +143,7 @@ class GNodePart(object):
 
 class GNode(object):
     """represents blender scene object or armature bones tree"""
-    def __init__(self, id: str, original: bpy.types.Object = None):
+    def __init__(self, id: str, original: 'bpy.types.Object' = None):
         self.id = id
         self.original = original
         self.parts: List[GNodePart] = []
@@ -172,22 +180,94 @@ class GBoneKeyframe(object):
         return root
 
 
+class GChannelKeyframe(object):
+    def __init__(self, time: float, value: List[float]):
+        """value - translation, rotation (xyzw) or scaling in the output order"""
+        self.keytime: float = time
+        self.value: List[float] = value
+
+    def to_dict(self) -> Dict[str, Any]:
+        root = dict()
+        root['keytime'] = self.keytime
+        root['value'] = self.value
+        return root
+
+
 class GBoneAnimation(object):
+    """
+    Either full keyframes or separate channel tracks, missing channel means the rest pose.
+    Full keyframes are stored decomposed, as arrays of the all keyframes.
+    """
     def __init__(self, bone_id: str):
         self.bone_id: str = bone_id
-        self.keyframes: List[GBoneKeyframe] = []
+        self.keytimes: np.ndarray = np.empty(0) # (n,) millis
+        self.translations: np.ndarray = np.empty((0, 3))
+        self.rotations: np.ndarray = np.empty((0, 4)) # xyzw, the output order
+        self.scales: np.ndarray = np.empty((0, 3))
+        self.translation: List[GChannelKeyframe] = []
+        self.rotation: List[GChannelKeyframe] = []
+        self.scaling: List[GChannelKeyframe] = []
+
+    def set_keyframes(self, keytimes: np.ndarray, translations: np.ndarray, rotations: np.ndarray,
+                      scales: np.ndarray):
+        self.keytimes = np.asarray(keytimes, dtype=np.float64)
+        self.translations = np.asarray(translations, dtype=np.float64).reshape(-1, 3)
+        self.rotations = np.asarray(rotations, dtype=np.float64).reshape(-1, 4)
+        self.scales = np.asarray(scales, dtype=np.float64).reshape(-1, 3)
+
+    def select_keyframes(self, indices: Sequence[int]):
+        """keeps only the keyframes at the indices"""
+        indices = np.asarray(indices, dtype=np.intp)
+        self.set_keyframes(self.keytimes[indices], self.translations[indices], self.rotations[indices],
+                           self.scales[indices])
+
+    @property
+    def keyframes(self) -> List[GBoneKeyframe]:
+        """keyframes with composed pose matrices, created on each call"""
+        return [GBoneKeyframe(t, new_transorm_matrix(loc, Quaternion((rot[3], rot[0], rot[1], rot[2])), sca))
+                for t, loc, rot, sca in zip(self.keytimes.tolist(), self.translations.tolist(),
+                                            self.rotations.tolist(), self.scales.tolist())]
+
+    @keyframes.setter
+    def keyframes(self, keys: List[GBoneKeyframe]):
+        poses = [k.pose.decompose() for k in keys]
+        self.set_keyframes([k.keytime for k in keys],
+                           [list(loc) for loc, _, _ in poses],
+                           [conv_quat(rot) for _, rot, _ in poses],
+                           [list(sca) for _, _, sca in poses])
+
+    def keyframe_count(self) -> int:
+        return len(self.keytimes)
+
+    def key_count(self) -> int:
+        return self.keyframe_count() + len(self.translation) + len(self.rotation) + len(self.scaling)
 
     def to_dict(self) -> Dict[str, Any]:
         root = dict()
         root['boneId'] = self.bone_id
-        root['keyframes'] = self.keyframes
+        if self.keyframe_count() or not (self.translation or self.rotation or self.scaling):
+            root['keyframes'] = self._keyframe_dicts()
+        else:
+            if self.translation:
+                root['translation'] = self.translation
+            if self.rotation:
+                root['rotation'] = self.rotation
+            if self.scaling:
+                root['scaling'] = self.scaling
         return root
 
+    def _keyframe_dicts(self) -> List[Dict[str, Any]]:
+        """arrays are converted at once"""
+        return [{'keytime': t, 'rotation': rot, 'translation': loc, 'scale': sca}
+                for t, rot, loc, sca in zip(self.keytimes.tolist(), self.rotations.tolist(),
+                                            self.translations.tolist(), self.scales.tolist())]
+
 
 class GAnimation(object):
     def __init__(self, id: str):
         self.id: str = id
         self.bones: List[GBoneAnimation] = []
+        self.shared_with: Optional[str] = None # id of the written animation with the same tracks, not encoded
 
     def to_dict(self) -> Dict[str, Any]:
         root = dict()
@@ -196,6 +276,42 @@ class GAnimation(object):
         return root
 
 
+class G3dCounters(object):
+    """raw counters collected while exporting, they are not encoded into the model"""
+    def __init__(self):
+        self.input_loops = 0 # loops of the converted blender meshes
+        self.raw_keyframes = 0 # keyframe points of the baked curves
+        self.baked_keyframes = 0
+        self.removed_keyframes = 0 # dropped by the keyframe reduction
+        self.reused_tracks = 0 # bone tracks taken from the other armatures
+        self.shared_animations = 0 # not written, the same as of the other armature
+        self.cache_triangles = 0 # triangles of the meshparts optimized for the vertex cache
+        self.cache_misses_before = 0
+        self.cache_misses_after = 0
+        self.strip_list_indices = 0 # indices of the triangle lists converted to strips
+        self.strip_indices = 0
+        self.reused_meshes = 0 # replayed from the snapshots of the previous export
+        self.reused_animations = 0 # of the previous export which actions weren't changed
+        self.stages: Dict[str, float] = dict() # stage name -> sec
+
+    def merge(self, other: 'G3dCounters'):
+        """adds counters collected by the other builder or process"""
+        for name, value in vars(other).items():
+            if name != 'stages':
+                setattr(self, name, getattr(self, name) + value)
+        for name, sec in other.stages.items():
+            self.stages[name] = self.stages.get(name, 0.0) + sec
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        """accumulates wall time of the block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+
 class G3dModel(object):
     def __init__(self) -> None:
         self.version = [0, 1]
@@ -204,6 +320,8 @@ class G3dModel(object):
         self.materials: List[GMaterial] = list()
         self.nodes: List[GNode] = list()
         self.animations: List[GAnimation] = list()
+        self.animation_aliases: Dict[str, str] = dict() # shared animation id -> written animation id, not encoded
+        self.counters = G3dCounters()
 
     def to_dict(self) -> Dict[str, Any]:
         root = dict()
@@ -223,19 +341,93 @@ class G3dModelInfo(object):
         self.indices = 0
         self.materials: List[str] = list()
         self.animations: List[str] = list()
+        self.animation_aliases: Dict[str, str] = dict()
         self.armatures: List[str] = list()
+        self.nodeparts: Dict[str, int] = dict() # node id -> nodeparts count
+        self.nodepart_bones: Dict[str, List[int]] = dict() # node id -> bones count of each nodepart
+        self.counters = G3dCounters()
+        self.sections: Dict[str, int] = dict() # model section -> encoded bytes
 
     def update(self, g3d: G3dModel):
         self.vertices = sum(m.vertex_count() for m in g3d.meshes)
         self.indices = sum(sum(len(p.indices) for p in m.parts) for m in g3d.meshes)
-        self.materials = map(lambda v: v.id, g3d.materials)
-        self.animations = map(lambda v: v.id, g3d.animations)
+        self.materials = [v.id for v in g3d.materials]
+        self.animations = [v.id for v in g3d.animations]
+        self.animation_aliases = dict(g3d.animation_aliases)
 
         self.armatures = list()
         for node in g3d.nodes:
             for res in self._find_armatures_recursive(node):
                 self.armatures.append(res)
 
+        self.nodeparts = dict()
+        self.nodepart_bones = dict()
+        for node in g3d.nodes:
+            self._count_nodeparts_recursive(node)
+
+        self.counters = G3dCounters()
+        self.counters.merge(g3d.counters)
+
+    def dedup_ratio(self) -> float:
+        """unique output vertices per input loop, lower is better"""
+        loops = self.counters.input_loops
+        return self.vertices / loops if loops else 0.0
+
+    def reduction_ratio(self) -> float:
+        """part of the baked keyframes dropped by the reduction"""
+        baked = self.counters.baked_keyframes
+        return self.counters.removed_keyframes / baked if baked else 0.0
+
+    def acmr(self) -> Tuple[float, float]:
+        """average vertex cache miss ratio of the optimized meshparts, before and after"""
+        triangles = self.counters.cache_triangles
+        if not triangles:
+            return 0.0, 0.0
+        return self.counters.cache_misses_before / triangles, self.counters.cache_misses_after / triangles
+
+    def strip_ratio(self) -> float:
+        """strip indices per index of the triangle lists, lower is better"""
+        list_indices = self.counters.strip_list_indices
+        return self.counters.strip_indices / list_indices if list_indices else 0.0
+
+    def ratios(self) -> Dict[str, float]:
+        """derived from the counters"""
+        root = dict()
+        root['dedup_ratio'] = self.dedup_ratio()
+        root['reduction_ratio'] = self.reduction_ratio()
+        root['acmr_before'], root['acmr_after'] = self.acmr()
+        root['strip_ratio'] = self.strip_ratio()
+        return root
+
+    def throughput(self) -> Dict[str, float]:
+        """output vertices per second of each stage"""
+        return {name: self.vertices / sec if sec > 0 else 0.0 for name, sec in self.counters.stages.items()}
+
+    def to_dict(self) -> Dict[str, Any]:
+        root = dict()
+        root['vertices'] = self.vertices
+        root['indices'] = self.indices
+        root['materials'] = self.materials
+        root['armatures'] = self.armatures
+        root['animations'] = self.animations
+        root['animation_aliases'] = self.animation_aliases
+        root['nodeparts'] = self.nodeparts
+        root['nodepart_bones'] = self.nodepart_bones
+        root['max_nodepart_bones'] = max(flatten(self.nodepart_bones.values()), default=0)
+        root.update(vars(self.counters))
+        root.update(self.ratios())
+        root['sections'] = self.sections
+        root['vertices_per_sec'] = self.throughput()
+        return root
+
+    def _count_nodeparts_recursive(self, node: GNode):
+        if node.parts:
+            self.nodeparts[node.id] = len(node.parts)
+            self.nodepart_bones[node.id] = [len(p.bones) for p in node.parts]
+
+        for child in node.children:
+            self._count_nodeparts_recursive(child)
+
     def _find_armatures_recursive(self, node: GNode) -> typing.Generator[str, None, None]:
         if node.original and node.original.type == 'ARMATURE':
             yield node.id
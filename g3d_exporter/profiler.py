@@ -1,7 +1,13 @@
 # <pep8 compliant>
+import functools
+import json
 import logging
+import os
+import threading
 import time
-from typing import Dict, Callable, List
+import tracemalloc
+from pathlib import Path
+from typing import Any, Dict, Callable, List, Tuple
 
 
 class FunctionMetric(object):
@@ -33,3 +39,236 @@ def profile(func):
         return timed
     return func
 
+
+class MemoryMetric(object):
+    def __init__(self, name: str):
+        self.name = name # function name
+        self.calls = 0 # function calls count
+        self.retained = 0 # bytes, allocated and not released by the all calls
+        self.peak = 0 # bytes, max traced memory during any call
+        self.growth = 0 # bytes, max peak increase relative to the call start
+        self.sites: Dict[str, int] = dict() # allocation site -> retained bytes
+
+    def top_sites(self, limit: int) -> List[Tuple[str, int]]:
+        return sorted(self.sites.items(), key=lambda v: v[1], reverse=True)[:limit]
+
+
+class _MemoryFrame(object):
+    def __init__(self, current: int, snapshot: tracemalloc.Snapshot):
+        self.current = current
+        self.peak = current
+        self.snapshot = snapshot
+
+
+class MemoryTracker(object):
+    """tracemalloc based current/peak allocation per stage"""
+    def __init__(self):
+        self.enabled = False
+        self.sites = True # compare snapshots to collect allocation sites, slow and inflates outer stages
+        self.metrics: Dict[str, MemoryMetric] = dict()
+        self._stack: List[_MemoryFrame] = list()
+        self._owner = False
+
+    def start(self, sites: bool = True):
+        """enables tracking and drops previously collected metrics"""
+        self.metrics.clear()
+        self._stack.clear()
+        self.sites = sites
+        self._owner = not tracemalloc.is_tracing()
+        if self._owner:
+            tracemalloc.start()
+        self.enabled = True
+
+    def stop(self):
+        self.enabled = False
+        self._stack.clear()
+        if self._owner:
+            tracemalloc.stop()
+            self._owner = False
+
+    def enter(self):
+        current, peak = tracemalloc.get_traced_memory()
+        if self._stack:
+            # reset below hides the peak of the outer stage, so keep it in the frame
+            self._stack[-1].peak = max(self._stack[-1].peak, peak)
+        snapshot = self._snapshot() if self.sites else None
+        # snapshot itself is not a part of the stage
+        self._stack.append(_MemoryFrame(tracemalloc.get_traced_memory()[0], snapshot))
+        _reset_peak()
+
+    def exit(self, name: str):
+        current, peak = tracemalloc.get_traced_memory()
+        frame = self._stack.pop()
+        peak = max(frame.peak, peak)
+
+        if self._stack:
+            self._stack[-1].peak = max(self._stack[-1].peak, peak)
+
+        metric = self.metrics.get(name, None)
+        if not metric:
+            metric = MemoryMetric(name)
+            self.metrics[name] = metric
+
+        metric.calls += 1
+        metric.retained += current - frame.current
+        metric.peak = max(metric.peak, peak)
+        metric.growth = max(metric.growth, peak - frame.current)
+
+        if frame.snapshot is not None:
+            for stat in self._snapshot().compare_to(frame.snapshot, 'lineno'):
+                if stat.size_diff > 0:
+                    site = str(stat.traceback)
+                    metric.sites[site] = metric.sites.get(site, 0) + stat.size_diff
+
+    def format(self, sites_limit: int = 5) -> str:
+        """human-readable report, stages are sorted by peak"""
+        res = "{:<80} {:>10} {:>12} {:>12} {:>12}\n".format("FUNCTION", "CALLS", "PEAK(KiB)", "GROWTH(KiB)", "RETAIN(KiB)")
+
+        for m in sorted(self.metrics.values(), key=lambda m: m.peak, reverse=True):
+            res += "{:<80} {:>10} {:>12.1f} {:>12.1f} {:>12.1f}\n" \
+                .format(m.name, m.calls, m.peak / 1024, m.growth / 1024, m.retained / 1024)
+
+            for site, size in m.top_sites(sites_limit):
+                res += "    {:<76} {:>10.1f} KiB\n".format(site, size / 1024)
+        return res
+
+    def _snapshot(self) -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ))
+
+
+def _reset_peak():
+    # available since python 3.9 (blender 2.93), the peak is global otherwise
+    if hasattr(tracemalloc, 'reset_peak'):
+        tracemalloc.reset_peak()
+
+
+memory = MemoryTracker()
+
+
+def profile_memory(func):
+    """delegate - measures tracemalloc current and peak memory of a function call while memory.enabled"""
+    name = f"{func.__module__}.{func.__qualname__}"
+
+    @functools.wraps(func)
+    def tracked(*args, **kwargs):
+        if not memory.enabled:
+            return func(*args, **kwargs)
+
+        memory.enter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            memory.exit(name)
+
+    return tracked
+
+
+class Span(object):
+    """single timeline entry, use as context manager"""
+    def __init__(self, tracer: 'Tracer', name: str, cat: str, attrs: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.attrs = attrs # shown as 'args' in the trace viewer
+        self.tid = 0
+        self.start = 0.0 # sec, relative to tracer origin
+        self.duration = 0.0 # sec
+
+    def __enter__(self) -> 'Span':
+        self.tid = threading.get_ident()
+        self.start = time.perf_counter() - self.tracer.origin
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.duration = time.perf_counter() - self.tracer.origin - self.start
+        if exc_type is not None:
+            self.attrs['error'] = exc_type.__name__
+        self.tracer.spans.append(self)
+
+    def to_event(self, pid: int) -> Dict[str, Any]:
+        """complete event ('X') of the chrome trace-event format"""
+        event = dict()
+        event['name'] = self.name
+        event['cat'] = self.cat
+        event['ph'] = 'X'
+        event['ts'] = self.start * 1e6 # us
+        event['dur'] = self.duration * 1e6 # us
+        event['pid'] = pid
+        event['tid'] = self.tid
+        event['args'] = {k: _trace_value(v) for k, v in self.attrs.items()}
+        return event
+
+
+class _NullSpan(object):
+    """used while the tracer is disabled, so the instrumented code stays the same"""
+    def __init__(self):
+        self.attrs: Dict[str, Any] = dict()
+
+    def __enter__(self) -> '_NullSpan':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.attrs.clear()
+
+
+class Tracer(object):
+    """records spans of export stages and writes them as chrome/perfetto trace-event json"""
+    def __init__(self):
+        self.enabled = False
+        self.origin = time.perf_counter()
+        self.spans: List[Span] = list()
+        self._null = _NullSpan()
+
+    def start(self):
+        """enables tracing and drops previously recorded spans"""
+        self.spans.clear()
+        self.origin = time.perf_counter()
+        self.enabled = True
+
+    def stop(self):
+        self.enabled = False
+
+    def span(self, name: str, cat: str = 'export', **attrs) -> Span:
+        if not self.enabled:
+            return self._null
+        return Span(self, name, cat, attrs)
+
+    def to_dict(self) -> Dict[str, Any]:
+        pid = os.getpid()
+        events = [s.to_event(pid) for s in sorted(self.spans, key=lambda s: s.start)]
+
+        meta = dict()
+        meta['name'] = 'process_name'
+        meta['ph'] = 'M'
+        meta['pid'] = pid
+        meta['args'] = {'name': 'g3d_exporter'}
+        events.insert(0, meta)
+
+        root = dict()
+        root['traceEvents'] = events
+        root['displayTimeUnit'] = 'ms'
+        return root
+
+    def dump(self, file: Path) -> Path:
+        """writes recorded spans, the file can be opened with chrome://tracing or ui.perfetto.dev"""
+        file.parent.mkdir(exist_ok=True, parents=True)
+        with open(file, 'w') as f:
+            json.dump(self.to_dict(), f)
+        return file
+
+
+def _trace_value(v: Any) -> Any:
+    if v is None or isinstance(v, (str, int, float, bool)):
+        return v
+    return str(v)
+
+
+tracer = Tracer()
+
+
+def span(name: str, cat: str = 'export', **attrs):
+    """shortcut for tracer.span"""
+    return tracer.span(name, cat, **attrs)
@@ -0,0 +1,366 @@
+# <pep8 compliant>
+"""
+Minimal pure-python replacement of blender mathutils.
+Used when the exporter modules are imported outside of blender (tests, benchmarks, worker processes),
+covers only the subset of the api that is used by the exporter.
+"""
+import math
+from typing import Iterable, List, Sequence, Tuple
+
+
+class Vector(object):
+    def __init__(self, seq: Iterable[float] = (0.0, 0.0, 0.0)):
+        self._data: List[float] = [float(v) for v in seq]
+
+    def __len__(self):
+        return len(self._data)
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __getitem__(self, i):
+        return self._data[i]
+
+    def __setitem__(self, i, value):
+        self._data[i] = float(value)
+
+    def __eq__(self, o):
+        return isinstance(o, Vector) and self._data == o._data
+
+    def __add__(self, o: 'Vector') -> 'Vector':
+        return Vector(a + b for a, b in zip(self._data, o))
+
+    def __sub__(self, o: 'Vector') -> 'Vector':
+        return Vector(a - b for a, b in zip(self._data, o))
+
+    def __mul__(self, f: float) -> 'Vector':
+        return Vector(a * f for a in self._data)
+
+    def __neg__(self) -> 'Vector':
+        return Vector(-a for a in self._data)
+
+    def __repr__(self):
+        return f"Vector({tuple(self._data)})"
+
+    @property
+    def x(self) -> float:
+        return self._data[0]
+
+    @property
+    def y(self) -> float:
+        return self._data[1]
+
+    @property
+    def z(self) -> float:
+        return self._data[2]
+
+    @property
+    def length(self) -> float:
+        return math.sqrt(self.dot(self))
+
+    def dot(self, o: 'Vector') -> float:
+        return sum(a * b for a, b in zip(self._data, o))
+
+    def cross(self, o: 'Vector') -> 'Vector':
+        a, b = self._data, o
+        return Vector((a[1] * b[2] - a[2] * b[1], a[2] * b[0] - a[0] * b[2], a[0] * b[1] - a[1] * b[0]))
+
+    def lerp(self, o: 'Vector', factor: float) -> 'Vector':
+        return Vector(a + (b - a) * factor for a, b in zip(self._data, o))
+
+    def copy(self) -> 'Vector':
+        return Vector(self._data)
+
+
+class Color(Vector):
+    def __init__(self, seq: Iterable[float] = (0.0, 0.0, 0.0)):
+        super().__init__(seq)
+
+
+class Quaternion(object):
+    """wxyz like blender"""
+    def __init__(self, seq: Sequence[float] = (1.0, 0.0, 0.0, 0.0), angle: float = None):
+        if angle is not None:
+            # axis, angle
+            axis = Vector(seq)
+            length = axis.length
+            s = math.sin(angle / 2) / length if length > 0 else 0.0
+            self._data = [math.cos(angle / 2), axis[0] * s, axis[1] * s, axis[2] * s]
+        else:
+            self._data = [float(v) for v in seq]
+
+    def __len__(self):
+        return 4
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __getitem__(self, i):
+        return self._data[i]
+
+    def __setitem__(self, i, value):
+        self._data[i] = float(value)
+
+    def __eq__(self, o):
+        return isinstance(o, Quaternion) and self._data == o._data
+
+    def __repr__(self):
+        return f"Quaternion({tuple(self._data)})"
+
+    @property
+    def w(self) -> float:
+        return self._data[0]
+
+    @property
+    def x(self) -> float:
+        return self._data[1]
+
+    @property
+    def y(self) -> float:
+        return self._data[2]
+
+    @property
+    def z(self) -> float:
+        return self._data[3]
+
+    def __matmul__(self, o):
+        if isinstance(o, Quaternion):
+            w1, x1, y1, z1 = self._data
+            w2, x2, y2, z2 = o._data
+            return Quaternion((w1 * w2 - x1 * x2 - y1 * y2 - z1 * z2,
+                               w1 * x2 + x1 * w2 + y1 * z2 - z1 * y2,
+                               w1 * y2 - x1 * z2 + y1 * w2 + z1 * x2,
+                               w1 * z2 + x1 * y2 - y1 * x2 + z1 * w2))
+        # rotate vector
+        return self.to_matrix() @ Vector(o)
+
+    def dot(self, o: 'Quaternion') -> float:
+        return sum(a * b for a, b in zip(self._data, o))
+
+    def normalized(self) -> 'Quaternion':
+        length = math.sqrt(self.dot(self))
+        if length == 0:
+            return Quaternion()
+        return Quaternion(v / length for v in self._data)
+
+    def conjugated(self) -> 'Quaternion':
+        w, x, y, z = self._data
+        return Quaternion((w, -x, -y, -z))
+
+    def inverted(self) -> 'Quaternion':
+        d = self.dot(self)
+        return Quaternion(v / d for v in self.conjugated())
+
+    def slerp(self, o: 'Quaternion', factor: float) -> 'Quaternion':
+        a, b = self._data, list(o)
+        cos = sum(x * y for x, y in zip(a, b))
+        if cos < 0:
+            # shortest path
+            b = [-v for v in b]
+            cos = -cos
+
+        if cos > 0.9995:
+            return Quaternion(x + (y - x) * factor for x, y in zip(a, b)).normalized()
+
+        theta = math.acos(min(cos, 1.0))
+        sin = math.sin(theta)
+        fa = math.sin((1 - factor) * theta) / sin
+        fb = math.sin(factor * theta) / sin
+        return Quaternion(x * fa + y * fb for x, y in zip(a, b))
+
+    def rotation_difference(self, o: 'Quaternion') -> 'Quaternion':
+        return self.inverted() @ o
+
+    @property
+    def angle(self) -> float:
+        return 2.0 * math.acos(max(-1.0, min(1.0, self.normalized().w)))
+
+    def to_matrix(self) -> 'Matrix':
+        w, x, y, z = self.normalized()
+        return Matrix(((1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)),
+                       (2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)),
+                       (2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y))))
+
+    def copy(self) -> 'Quaternion':
+        return Quaternion(self._data)
+
+
+class Euler(object):
+    def __init__(self, seq: Sequence[float] = (0.0, 0.0, 0.0), order: str = 'XYZ'):
+        if sorted(order) != ['X', 'Y', 'Z']:
+            raise ValueError(f"unsupported rotation order: {order}")
+        self._data = [float(v) for v in seq]
+        self.order = order
+
+    def __len__(self):
+        return 3
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __getitem__(self, i):
+        return self._data[i]
+
+    def __setitem__(self, i, value):
+        self._data[i] = float(value)
+
+    def to_quaternion(self) -> 'Quaternion':
+        axes = {
+            'X': Quaternion((1, 0, 0), self._data[0]),
+            'Y': Quaternion((0, 1, 0), self._data[1]),
+            'Z': Quaternion((0, 0, 1), self._data[2]),
+        }
+        # the first axis of the order is applied first
+        return axes[self.order[2]] @ axes[self.order[1]] @ axes[self.order[0]]
+
+    def to_matrix(self) -> 'Matrix':
+        return self.to_quaternion().to_matrix()
+
+
+class Matrix(object):
+    """square matrix, rows are stored"""
+    def __init__(self, rows: Iterable[Iterable[float]] = None):
+        if rows is None:
+            rows = _identity(4)
+        self._rows: List[List[float]] = [[float(v) for v in row] for row in rows]
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __iter__(self):
+        return iter(self._rows)
+
+    def __getitem__(self, i):
+        return self._rows[i]
+
+    def __eq__(self, o):
+        return isinstance(o, Matrix) and self._rows == o._rows
+
+    def __repr__(self):
+        return f"Matrix({tuple(tuple(r) for r in self._rows)})"
+
+    @staticmethod
+    def Identity(size: int) -> 'Matrix':
+        return Matrix(_identity(size))
+
+    @staticmethod
+    def Translation(v: Sequence[float]) -> 'Matrix':
+        m = _identity(4)
+        m[0][3], m[1][3], m[2][3] = v[0], v[1], v[2]
+        return Matrix(m)
+
+    @staticmethod
+    def Scale(factor: float, size: int, axis: Sequence[float] = None) -> 'Matrix':
+        m = _identity(size)
+        for i in range(min(size, 3)):
+            for j in range(min(size, 3)):
+                if axis is None:
+                    m[i][j] = factor if i == j else 0.0
+                else:
+                    # scale along the unit axis
+                    m[i][j] = (1.0 if i == j else 0.0) + (factor - 1.0) * axis[i] * axis[j]
+        return Matrix(m)
+
+    def __matmul__(self, o):
+        if isinstance(o, Matrix):
+            cols = list(zip(*o._rows))
+            return Matrix([[sum(a * b for a, b in zip(row, col)) for col in cols] for row in self._rows])
+
+        v = list(o)
+        n = len(self._rows)
+        if len(v) == n - 1:
+            # point
+            v.append(1.0)
+            return Vector(sum(a * b for a, b in zip(row, v)) for row in self._rows[:-1])
+        return Vector(sum(a * b for a, b in zip(row, v)) for row in self._rows)
+
+    def copy(self) -> 'Matrix':
+        return Matrix(self._rows)
+
+    def transposed(self) -> 'Matrix':
+        return Matrix(zip(*self._rows))
+
+    def to_3x3(self) -> 'Matrix':
+        return Matrix(row[:3] for row in self._rows[:3])
+
+    def to_4x4(self) -> 'Matrix':
+        m = _identity(4)
+        for i, row in enumerate(self._rows[:4]):
+            for j, v in enumerate(row[:4]):
+                m[i][j] = v
+        return Matrix(m)
+
+    def inverted(self) -> 'Matrix':
+        """gauss-jordan elimination"""
+        n = len(self._rows)
+        a = [row[:] + ident for row, ident in zip(self._rows, _identity(n))]
+
+        for col in range(n):
+            pivot = max(range(col, n), key=lambda r: abs(a[r][col]))
+            if abs(a[pivot][col]) < 1e-12:
+                raise ValueError("matrix does not have an inverse")
+            a[col], a[pivot] = a[pivot], a[col]
+
+            p = a[col][col]
+            a[col] = [v / p for v in a[col]]
+
+            for r in range(n):
+                if r != col and a[r][col] != 0.0:
+                    f = a[r][col]
+                    a[r] = [v - f * c for v, c in zip(a[r], a[col])]
+
+        return Matrix(row[n:] for row in a)
+
+    def to_translation(self) -> Vector:
+        return Vector(row[3] for row in self._rows[:3])
+
+    def to_scale(self) -> Vector:
+        cols = list(zip(*self.to_3x3()._rows))
+        return Vector(math.sqrt(sum(v * v for v in col)) for col in cols)
+
+    def to_quaternion(self) -> Quaternion:
+        return _mat3_to_quat(self._normalized_3x3(self.to_scale()))
+
+    def decompose(self) -> Tuple[Vector, Quaternion, Vector]:
+        scale = self.to_scale()
+        if _det3(self) < 0:
+            # mirrored
+            scale = -scale
+        return self.to_translation(), _mat3_to_quat(self._normalized_3x3(scale)), scale
+
+    def _normalized_3x3(self, scale: Vector) -> List[List[float]]:
+        m = self._rows
+        return [[m[i][j] / scale[j] if scale[j] != 0 else 0.0 for j in range(3)] for i in range(3)]
+
+
+def _identity(size: int) -> List[List[float]]:
+    return [[1.0 if i == j else 0.0 for j in range(size)] for i in range(size)]
+
+
+def _det3(m: Matrix) -> float:
+    return m[0][0] * (m[1][1] * m[2][2] - m[1][2] * m[2][1]) \
+        - m[0][1] * (m[1][0] * m[2][2] - m[1][2] * m[2][0]) \
+        + m[0][2] * (m[1][0] * m[2][1] - m[1][1] * m[2][0])
+
+
+def _mat3_to_quat(r: List[List[float]]) -> Quaternion:
+    trace = r[0][0] + r[1][1] + r[2][2]
+
+    if trace > 0:
+        s = 0.5 / math.sqrt(trace + 1.0)
+        q = (0.25 / s, (r[2][1] - r[1][2]) * s, (r[0][2] - r[2][0]) * s, (r[1][0] - r[0][1]) * s)
+    elif r[0][0] > r[1][1] and r[0][0] > r[2][2]:
+        s = 2.0 * math.sqrt(1.0 + r[0][0] - r[1][1] - r[2][2])
+        q = ((r[2][1] - r[1][2]) / s, 0.25 * s, (r[0][1] + r[1][0]) / s, (r[0][2] + r[2][0]) / s)
+    elif r[1][1] > r[2][2]:
+        s = 2.0 * math.sqrt(1.0 + r[1][1] - r[0][0] - r[2][2])
+        q = ((r[0][2] - r[2][0]) / s, (r[0][1] + r[1][0]) / s, 0.25 * s, (r[1][2] + r[2][1]) / s)
+    else:
+        s = 2.0 * math.sqrt(1.0 + r[2][2] - r[0][0] - r[1][1])
+        q = ((r[1][0] - r[0][1]) / s, (r[0][2] + r[2][0]) / s, (r[1][2] + r[2][1]) / s, 0.25 * s)
+
+    quat = Quaternion(q).normalized()
+    # blender keeps w positive
+    if quat.w < 0:
+        quat = Quaternion(-v for v in quat)
+    return quat
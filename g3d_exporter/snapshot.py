@@ -0,0 +1,114 @@
+# <pep8 compliant>
+"""
+Converted meshes kept between exports, keyed by the content fingerprint of the object.
+Snapshot holds the vertices and indices of the each nodepart, so it can be replayed into another build.
+Blender-free, the builder collects the hashed data.
+"""
+import hashlib
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from g3d_exporter import model
+
+log = logging.getLogger(__name__)
+
+
+class Fingerprint(object):
+    """incremental content hash"""
+    def __init__(self):
+        self._hash = hashlib.blake2b(digest_size=16)
+
+    def add_array(self, array: np.ndarray) -> 'Fingerprint':
+        array = np.ascontiguousarray(array)
+        self._hash.update(f"{array.dtype.str}{array.shape}".encode())
+        self._hash.update(array.tobytes())
+        return self
+
+    def add_value(self, value: Any) -> 'Fingerprint':
+        """str, numbers and their tuples, repr must be stable between sessions"""
+        self._hash.update(repr(value).encode())
+        self._hash.update(b'\0')
+        return self
+
+    def hexdigest(self) -> str:
+        return self._hash.hexdigest()
+
+
+class PartSnapshot(object):
+    """
+    nodepart with its own vertices
+    material - blender material name, materials are built again on replay
+    bones - model.BonePart, read-only
+    """
+    def __init__(self, material: str, attributes: Tuple[model.VertexFlag], primitive_type: str, chunk: int,
+                 bones: List[model.BonePart], vertices: List[Tuple[float]], indices: List[int]):
+        self.material = material
+        self.attributes = attributes
+        self.primitive_type = primitive_type
+        self.chunk = chunk
+        self.bones = bones
+        self.vertices = vertices
+        self.indices = indices # of the vertices above
+
+
+class MeshSnapshot(object):
+    def __init__(self, mesh_name: str, loops: int, chunks: int, parts: List[PartSnapshot]):
+        self.mesh_name = mesh_name # meshpart ids are made of it
+        self.loops = loops
+        self.chunks = chunks
+        self.parts = parts
+
+
+class SnapshotStore(object):
+    """
+    Snapshots of the previous exports, lives as long as the addon is loaded.
+    Snapshots which weren't used by the last build are dropped by retain.
+    """
+    def __init__(self):
+        self.snapshots: Dict[str, MeshSnapshot] = dict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[MeshSnapshot]:
+        snap = self.snapshots.get(key, None)
+        if snap is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return snap
+
+    def put(self, key: str, snap: MeshSnapshot):
+        self.snapshots[key] = snap
+
+    def retain(self, keys: Iterable[str]):
+        keys = set(keys)
+        for key in [k for k in self.snapshots if k not in keys]:
+            del self.snapshots[key]
+        log.debug("retain %d snapshots", len(self.snapshots))
+
+    def clear(self):
+        self.snapshots.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+def local_indices(indices: List[int], vertices: List[Any]) -> Tuple[List[Any], List[int]]:
+    """vertices referenced by the indices in the order of the first reference and the indices of them"""
+    remap: Dict[int, int] = dict()
+    local = list()
+    for i in indices:
+        j = remap.get(i, None)
+        if j is None:
+            j = len(remap)
+            remap[i] = j
+        local.append(j)
+
+    used = [None] * len(remap)
+    for i, j in remap.items():
+        used[j] = vertices[i]
+    return used, local
+
+
+store = SnapshotStore()
@@ -0,0 +1,330 @@
+# <pep8 compliant>
+"""
+Spatial partition of the mesh faces and bounding volumes of the model.
+Blender-free, works on the arrays of face centers and on the built model.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from g3d_exporter import model
+from g3d_exporter.common import *
+from g3d_exporter.profiler import profile
+
+
+class Bounds(object):
+    """axis aligned box and the sphere around its center"""
+    def __init__(self, min: np.ndarray, max: np.ndarray, center: np.ndarray, radius: float):
+        self.min = min
+        self.max = max
+        self.center = center
+        self.radius = radius
+
+    @staticmethod
+    def of_points(points: np.ndarray) -> Optional['Bounds']:
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        if not len(points):
+            return None
+        (lo, hi) = (points.min(axis=0), points.max(axis=0))
+        center = (lo + hi) * 0.5
+        return Bounds(lo, hi, center, float(np.sqrt(np.max(np.sum((points - center) ** 2, axis=1)))))
+
+    @staticmethod
+    def union(bounds: List['Bounds']) -> Optional['Bounds']:
+        if not bounds:
+            return None
+        lo = np.min([b.min for b in bounds], axis=0)
+        hi = np.max([b.max for b in bounds], axis=0)
+        center = (lo + hi) * 0.5
+        radius = max(float(np.linalg.norm(b.center - center)) + b.radius for b in bounds)
+        return Bounds(lo, hi, center, radius)
+
+    def corners(self) -> np.ndarray:
+        """(8, 3)"""
+        return np.array([(x, y, z) for x in (self.min[0], self.max[0])
+                         for y in (self.min[1], self.max[1])
+                         for z in (self.min[2], self.max[2])])
+
+    def transformed(self, matrix: np.ndarray) -> 'Bounds':
+        """box of the transformed corners, sphere is scaled by the largest axis scale"""
+        corners = self.corners() @ matrix[:3, :3].T + matrix[:3, 3]
+        scale = float(np.max(np.linalg.norm(matrix[:3, :3], axis=0)))
+        return Bounds(corners.min(axis=0), corners.max(axis=0),
+                      matrix[:3, :3] @ self.center + matrix[:3, 3], self.radius * scale)
+
+    def to_dict(self) -> Dict[str, Any]:
+        root = dict()
+        root['min'] = self.min.tolist()
+        root['max'] = self.max.tolist()
+        root['center'] = self.center.tolist()
+        root['radius'] = self.radius
+        return root
+
+
+class ModelBounds(object):
+    """
+    nodes - parts and children in the node space
+    meshparts - referenced vertices in the mesh space
+    animations - skinned vertices at the each keytime in the armature space
+    """
+    def __init__(self):
+        self.nodes: Dict[str, Bounds] = dict()
+        self.meshparts: Dict[str, Bounds] = dict()
+        self.animations: Dict[str, Bounds] = dict()
+
+    def to_dict(self) -> Dict[str, Any]:
+        root = dict()
+        root['nodes'] = {k: v.to_dict() for k, v in self.nodes.items()}
+        root['meshparts'] = {k: v.to_dict() for k, v in self.meshparts.items()}
+        root['animations'] = {k: v.to_dict() for k, v in self.animations.items()}
+        return root
+
+
+@profile
+def split_faces(centers: np.ndarray, max_faces: int) -> np.ndarray:
+    """
+    Chunk of the each face: faces are split in halves by the median of their centers
+    along the longest axis until each chunk has max_faces or less (BVH leaves).
+    Chunks are numbered in the depth-first order, so the near chunks have near numbers.
+    """
+    centers = np.asarray(centers, dtype=np.float64).reshape(-1, 3)
+    chunks = np.zeros(len(centers), dtype=np.int64)
+    if max_faces <= 0 or len(centers) <= max_faces:
+        return chunks
+
+    leaves: List[np.ndarray] = list()
+    pending = [np.arange(len(centers))]
+
+    while pending:
+        faces = pending.pop()
+        if len(faces) <= max_faces:
+            leaves.append(faces)
+            continue
+
+        points = centers[faces]
+        axis = np.argmax(points.max(axis=0) - points.min(axis=0))
+        half = len(faces) // 2
+        order = np.argpartition(points[:, axis], half)
+
+        # the lower half goes first
+        pending.append(faces[order[half:]])
+        pending.append(faces[order[:half]])
+
+    for chunk, faces in enumerate(leaves):
+        chunks[faces] = chunk
+    return chunks
+
+
+@profile
+def model_bounds(g3d: model.G3dModel) -> ModelBounds:
+    """bounding volumes of the built model"""
+    res = ModelBounds()
+    parts: Dict[str, Tuple[np.ndarray, model.GMesh, model.GMeshPart]] = dict()
+
+    for mesh in g3d.meshes:
+        table = _vertex_table(mesh)
+        positions = table[:, _attribute_offset(mesh, 'POSITION'):][:, :3]
+        for part in mesh.parts:
+            bounds = Bounds.of_points(positions[np.unique(np.asarray(part.indices, dtype=np.int64))])
+            if bounds is not None:
+                res.meshparts[part.id] = bounds
+                parts[part.id] = (table, mesh, part)
+
+    for node in g3d.nodes:
+        _node_bounds(node, res.meshparts, res.nodes)
+
+    skins = list()
+    for node in g3d.nodes:
+        _collect_skins(node, parts, skins)
+
+    if skins:
+        bones: Dict[str, model.GNode] = dict()
+        parents: Dict[str, Optional[str]] = dict()
+        armatures: Dict[str, Optional[str]] = dict() # bone -> armature node
+        for node in g3d.nodes:
+            _collect_bones(node, None, None, bones, parents, armatures)
+
+        for anim in g3d.animations:
+            bounds = _animation_bounds(anim, skins, bones, parents, armatures)
+            if bounds is not None:
+                res.animations[anim.id] = bounds
+
+    return res
+
+
+def _vertex_table(mesh: model.GMesh) -> np.ndarray:
+    """(vertices, vertex size)"""
+    size = mesh.vertex_size()
+    return np.asarray(mesh.vertices, dtype=np.float64).reshape(-1, size) if size else np.empty((0, 0))
+
+
+def _attribute_offset(mesh: model.GMesh, name: str) -> int:
+    offset = 0
+    for attr in mesh.attributes:
+        if attr.name == name:
+            return offset
+        offset += attr.length
+    return -1
+
+
+def _node_bounds(node: model.GNode, meshparts: Dict[str, Bounds], out: Dict[str, Bounds]) -> Optional[Bounds]:
+    found = [meshparts[p.meshpart] for p in node.parts if p.meshpart in meshparts]
+
+    for child in node.children:
+        bounds = _node_bounds(child, meshparts, out)
+        if bounds is not None:
+            found.append(bounds.transformed(_node_matrix(child)))
+
+    bounds = Bounds.union(found)
+    if bounds is not None:
+        out[node.id] = bounds
+    return bounds
+
+
+def _collect_skins(node: model.GNode, parts: Dict[str, Tuple[np.ndarray, model.GMesh, model.GMeshPart]],
+                   out: List[Tuple[str, np.ndarray, Bounds]]):
+    """(bone, inverted bind matrix, box of the weighted vertices) of the each skinned nodepart bone"""
+    for nodepart in node.parts:
+        if not nodepart.bones or nodepart.meshpart not in parts:
+            continue
+
+        (table, mesh, part) = parts[nodepart.meshpart]
+        offsets = [i for i, attr in enumerate(mesh.attributes) if attr.name.startswith('BLENDWEIGHT')]
+        vertices = table[np.unique(np.asarray(part.indices, dtype=np.int64))]
+        position = _attribute_offset(mesh, 'POSITION')
+
+        starts = [sum(a.length for a in mesh.attributes[:i]) for i in offsets]
+        for bonepart in nodepart.bones:
+            weighted = np.zeros(len(vertices), dtype=bool)
+            for start in starts:
+                weighted |= (vertices[:, start] == bonepart.index) & (vertices[:, start + 1] > 0)
+
+            bounds = Bounds.of_points(vertices[weighted, position:position + 3])
+            if bounds is not None:
+                bind = np.array([list(row) for row in bonepart.matrix], dtype=np.float64)
+                out.append((bonepart.name, np.linalg.inv(bind), bounds))
+
+    for child in node.children:
+        _collect_skins(child, parts, out)
+
+
+def _collect_bones(node: model.GNode, parent: Optional[str], armature: Optional[str], bones: Dict[str, model.GNode],
+                   parents: Dict[str, Optional[str]], armatures: Dict[str, Optional[str]]):
+    """bone nodes have no blender object, the first bone of the same name wins"""
+    is_bone = node.original is None
+    if is_bone and node.id not in bones:
+        bones[node.id] = node
+        parents[node.id] = parent
+        armatures[node.id] = armature
+
+    for child in node.children:
+        if is_bone:
+            _collect_bones(child, node.id, armature, bones, parents, armatures)
+        else:
+            _collect_bones(child, None, node.id, bones, parents, armatures)
+
+
+def _animation_bounds(anim: model.GAnimation, skins: List[Tuple[str, np.ndarray, Bounds]],
+                      bones: Dict[str, model.GNode], parents: Dict[str, Optional[str]],
+                      armatures: Dict[str, Optional[str]]) -> Optional[Bounds]:
+    tracks = {b.bone_id: b for b in anim.bones}
+    times = [b.keytimes for b in anim.bones]
+    times += [np.array([k.keytime for k in getattr(b, name)]) for b in anim.bones
+              for name in ('translation', 'rotation', 'scaling')]
+    times = np.unique(np.concatenate(times)) if times else np.empty(0)
+
+    # only the skins of the animated armatures
+    animated = {armatures[bone] for bone in tracks if bone in bones}
+    skins = [skin for skin in skins if skin[0] in bones and armatures[skin[0]] in animated]
+    if not len(times) or not skins:
+        return None
+
+    poses: Dict[str, np.ndarray] = dict()
+    points = list()
+    for (bone, inv_bind, bounds) in skins:
+        matrices = _bone_poses(bone, times, tracks, bones, parents, poses) @ inv_bind
+        corners = np.einsum('tij,cj->tci', matrices[:, :3, :3], bounds.corners()) + matrices[:, None, :3, 3]
+        points.append(corners.reshape(-1, 3))
+
+    return Bounds.of_points(np.concatenate(points))
+
+
+def _bone_poses(bone: str, times: np.ndarray, tracks: Dict[str, model.GBoneAnimation],
+                bones: Dict[str, model.GNode], parents: Dict[str, Optional[str]],
+                poses: Dict[str, np.ndarray]) -> np.ndarray:
+    """(times, 4, 4) armature space matrices of the bone"""
+    pose = poses.get(bone, None)
+    if pose is None:
+        pose = _local_poses(bones[bone], tracks.get(bone, None), times)
+        parent = parents[bone]
+        if parent is not None:
+            pose = _bone_poses(parent, times, tracks, bones, parents, poses) @ pose
+        poses[bone] = pose
+    return pose
+
+
+def _local_poses(node: model.GNode, track: Optional[model.GBoneAnimation], times: np.ndarray) -> np.ndarray:
+    """the rest pose of the node where the track has no keys"""
+    rest = _node_trs(node)
+    trs = [np.tile(v, (len(times), 1)) for v in rest]
+
+    if track is not None and track.keyframe_count():
+        trs = [_interpolate(times, track.keytimes, values)
+               for values in (track.translations, _continuous(track.rotations), track.scales)]
+    elif track is not None:
+        for i, name in enumerate(('translation', 'rotation', 'scaling')):
+            keys = getattr(track, name)
+            if keys:
+                values = np.array([k.value for k in keys], dtype=np.float64)
+                if name == 'rotation':
+                    values = _continuous(values)
+                trs[i] = _interpolate(times, np.array([k.keytime for k in keys]), values)
+
+    rotations = trs[1] / np.linalg.norm(trs[1], axis=1)[:, None]
+    return _trs_matrices(trs[0], rotations, trs[2])
+
+
+def _interpolate(times: np.ndarray, keytimes: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """linear, the first and the last values are held outside of the keys"""
+    return np.stack([np.interp(times, keytimes, values[:, i]) for i in range(values.shape[1])], axis=1)
+
+
+def _continuous(rotations: np.ndarray) -> np.ndarray:
+    """flips the quaternions to the same hemisphere as the previous ones, so they can be interpolated"""
+    rotations = np.array(rotations, dtype=np.float64)
+    if len(rotations) > 1:
+        flips = np.cumprod(np.where(np.sum(rotations[1:] * rotations[:-1], axis=1) < 0, -1.0, 1.0))
+        rotations[1:] *= flips[:, None]
+    return rotations
+
+
+def _node_trs(node: model.GNode) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """translation, rotation (xyzw) and scale, missing ones are identity"""
+    translation = np.array(list(node.translation) if node.translation is not None else [0.0, 0.0, 0.0])
+    rotation = np.array(conv_quat(node.rotation) if node.rotation is not None else [0.0, 0.0, 0.0, 1.0])
+    scale = np.array(list(node.scale) if node.scale is not None else [1.0, 1.0, 1.0])
+    return translation, rotation, scale
+
+
+def _node_matrix(node: model.GNode) -> np.ndarray:
+    (translation, rotation, scale) = _node_trs(node)
+    return _trs_matrices(translation[None], rotation[None], scale[None])[0]
+
+
+def _trs_matrices(translations: np.ndarray, rotations: np.ndarray, scales: np.ndarray) -> np.ndarray:
+    """(n, 4, 4) of the (n, 3) translations, (n, 4) xyzw unit rotations and (n, 3) scales"""
+    (x, y, z, w) = rotations.T
+    res = np.zeros((len(rotations), 4, 4), dtype=np.float64)
+    res[:, 0, 0] = 1 - 2 * (y * y + z * z)
+    res[:, 0, 1] = 2 * (x * y - z * w)
+    res[:, 0, 2] = 2 * (x * z + y * w)
+    res[:, 1, 0] = 2 * (x * y + z * w)
+    res[:, 1, 1] = 1 - 2 * (x * x + z * z)
+    res[:, 1, 2] = 2 * (y * z - x * w)
+    res[:, 2, 0] = 2 * (x * z - y * w)
+    res[:, 2, 1] = 2 * (y * z + x * w)
+    res[:, 2, 2] = 1 - 2 * (x * x + y * y)
+    res[:, :3, :3] *= scales[:, None, :]
+    res[:, :3, 3] = translations
+    res[:, 3, 3] = 1.0
+    return res
@@ -1,3 +1,10 @@
-import tests.base
-import tests.builder_test
-import tests.common
+try:
+    import bpy
+except ImportError:
+    # outside of blender only blender-free tests can run: tests.encoder_test, tests.encoder_benchmark
+    bpy = None
+
+if bpy is not None:
+    import tests.base
+    import tests.builder_test
+    import tests.common
@@ -0,0 +1,130 @@
+import math
+import pickle
+import unittest
+
+import numpy as np
+
+from g3d_exporter import baker, fcurve, keyframes, profiler
+from g3d_exporter.common import Euler, Matrix, Quaternion, Vector, conv_quat, new_transorm_matrix
+from g3d_exporter.fcurve import BEZIER, LINEAR
+from g3d_exporter.model import G3dCounters
+from tests.fcurve_test import make_curve
+
+
+def make_bone(name: str, shift: float = 0.0, rest: Matrix = None) -> baker.BoneCurves:
+    if rest is None:
+        rot = Quaternion((0.0, 0.0, 1.0), math.radians(90))
+        rest = Matrix.Translation(Vector((0.0, 1.0, 0.0))) @ rot.to_matrix().to_4x4()
+    loc = [make_curve([(0, shift), (10, 3 + shift), (20, -1)], BEZIER, array_index=0)]
+    euler = [make_curve([(0, 0), (20, math.pi)], LINEAR, array_index=2)]
+    return baker.BoneCurves(name, rest, True, 'ZYX', loc, [], [], euler)
+
+
+def make_jobs(count: int, opt: baker.BakeOptions):
+    return [baker.BakeJob(f"armature|action{i}", f"action{i}", [make_bone("Bone", i), make_bone("Bone.001", -i)], opt)
+            for i in range(count)]
+
+
+class BakerTest(unittest.TestCase):
+    """runs in blender and in plain python with numpy"""
+
+    def test_bake(self):
+        (anim, counters) = baker.bake(make_jobs(1, baker.BakeOptions(10))[0])
+
+        self.assertEqual(anim.id, "armature|action0")
+        self.assertEqual([b.bone_id for b in anim.bones], ["Bone", "Bone.001"])
+        self.assertEqual(len(anim.bones[0].keyframes), 21)
+        self.assertAlmostEqual(anim.bones[0].keyframes[-1].keytime, 2000, 3)
+        self.assertEqual(counters.raw_keyframes, 10)
+        self.assertEqual(counters.baked_keyframes, 42)
+
+    def test_trace(self):
+        job = make_jobs(1, baker.BakeOptions(10))[0]
+
+        profiler.tracer.start()
+        try:
+            baker.bake(job)
+        finally:
+            profiler.tracer.stop()
+        action_span = next(s for s in reversed(profiler.tracer.spans) if s.name == 'action')
+        self.assertEqual(action_span.attrs['keyframes'], 42)
+
+    def test_pickle(self):
+        bone = make_bone("Bone", 1.0)
+
+        loaded = pickle.loads(pickle.dumps(bone))
+
+        self.assertEqual(loaded.bone_name, "Bone")
+        for a, b in zip(loaded.eval_trs([0, 5, 15]), bone.eval_trs([0, 5, 15])):
+            np.testing.assert_allclose(a, b)
+
+    def test_compose_rest(self):
+        # same as the pose matrix rest @ loc @ rot @ sca
+        bone = make_bone("Bone", 1.0)
+        (locs, rots, scales) = bone.eval_trs([0, 5, 15])
+
+        for frame, loc, rot, sca in zip([0, 5, 15], locs.tolist(), rots.tolist(), scales.tolist()):
+            euler = Euler((0.0, 0.0, math.pi * frame / 20), "ZYX")
+            local = fcurve.sample_curves(bone.loc_data, [frame], (0.0, 0.0, 0.0))[0]
+            pose = bone.rest @ new_transorm_matrix(Vector(local), euler.to_quaternion(), Vector((1.0, 1.0, 1.0)))
+
+            np.testing.assert_allclose(loc, list(pose.to_translation()), atol=1e-6)
+            np.testing.assert_allclose(sca, list(pose.to_scale()), atol=1e-6)
+            self.assertAlmostEqual(abs(np.dot(rot, conv_quat(pose.to_quaternion()))), 1.0, 6)
+
+    def test_workers(self):
+        opt = baker.BakeOptions(24, 'KEYFRAMES', simplify=keyframes.Tolerance())
+        jobs = make_jobs(4, opt)
+
+        local = baker.bake_all(jobs)
+        parallel = baker.bake_all(jobs, workers=2)
+
+        self.assertEqual([a.id for a, _ in parallel], [a.id for a, _ in local])
+        for (a, ca), (b, cb) in zip(local, parallel):
+            self.assertEqual(ca.baked_keyframes, cb.baked_keyframes)
+            self.assertEqual(ca.removed_keyframes, cb.removed_keyframes)
+            for bone_a, bone_b in zip(a.bones, b.bones):
+                np.testing.assert_array_equal(bone_a.keytimes, bone_b.keytimes)
+                np.testing.assert_array_equal(bone_a.rotations, bone_b.rotations)
+
+    def test_merge_counters(self):
+        counters = G3dCounters()
+        for _, c in baker.bake_all(make_jobs(2, baker.BakeOptions(10))):
+            counters.merge(c)
+
+        self.assertEqual(counters.raw_keyframes, 20)
+        self.assertEqual(counters.baked_keyframes, 84)
+
+    def test_reuse_tracks(self):
+        opt = baker.BakeOptions(10)
+        other_rest = Matrix.Translation(Vector((1.0, 0.0, 0.0)))
+        jobs = [baker.BakeJob("armature|action", "action", [make_bone("Bone"), make_bone("Bone.001", 1)], opt),
+                baker.BakeJob("armature.001|action", "action",
+                              [make_bone("Bone"), make_bone("Bone.001", 1, other_rest)], opt)]
+
+        results = baker.bake_all(jobs)
+
+        (first, first_counters), (second, second_counters) = results
+        self.assertEqual(second.id, "armature.001|action")
+        self.assertIs(first.bones[0], second.bones[0])
+        self.assertIsNot(first.bones[1], second.bones[1])
+        self.assertEqual(first_counters.reused_tracks, 0)
+        self.assertEqual(second_counters.reused_tracks, 1)
+        self.assertEqual(second_counters.baked_keyframes, 21)
+
+    def test_share_animations(self):
+        opt = baker.BakeOptions(10)
+        jobs = [baker.BakeJob(f"{armature}|action", "action", [make_bone("Bone")], opt)
+                for armature in ("armature", "armature.001")]
+
+        results = baker.bake_all(jobs, share=True)
+
+        self.assertEqual(len(results[0][0].bones), 1)
+        self.assertEqual(results[1][0].bones, [])
+        self.assertEqual(results[1][0].shared_with, "armature|action")
+        self.assertIsNone(results[0][0].shared_with)
+        self.assertEqual(results[1][1].shared_animations, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,15 +1,135 @@
 import datetime
+import json
+import os
+import time
+from typing import Callable, Dict
 
 from g3d_exporter import builder, profiler
 from g3d_exporter.builder import *
 from tests.base import BaseTest
 from tests.common import *
 
+# multiplies the size of the each suite case
+scale = int(os.getenv("G3D_BENCH_SCALE", "1"))
+# how many times the suite is repeated
+runs = int(os.getenv("G3D_BENCH_RUNS", "1"))
+# json file to write all runs to, used by 'build.py bench'
+output = os.getenv("G3D_BENCH_OUTPUT", None)
+
+
+class BenchmarkCase(object):
+    def __init__(self, name: str, setup: Callable[[], None], **params):
+        self.name = name
+        self.setup = setup # populates the scene
+        self.params = params
+
+
+def _case_objects(objects: int, triangles: int, materials: int):
+    for i in range(objects):
+        add_triangles(f"obj{i}", triangles, materials)
+
+
+def _case_skinned(meshes: int, bones: int, triangles: int, actions: int):
+    for i in range(meshes):
+        obj_arm = add_skinned(f"skinned{i}", bones, triangles)
+        add_bezier_actions(obj_arm, actions)
+
+
+def _case_instances(objects: int, instances: int, triangles: int):
+    add_instanced_collection("instanced", objects, instances, triangles)
+
+
+def _case_linked(duplicates: int, triangles: int):
+    add_linked("linked", duplicates, triangles)
+
+
+def suite_cases():
+    return [
+        BenchmarkCase("objects", lambda: _case_objects(100 * scale, 10, 1),
+                      objects=100 * scale, triangles=10, materials=1),
+        BenchmarkCase("vertices", lambda: _case_objects(1, 20000 * scale, 1),
+                      objects=1, triangles=20000 * scale, materials=1),
+        BenchmarkCase("materials", lambda: _case_objects(1, 5000 * scale, 16),
+                      objects=1, triangles=5000 * scale, materials=16),
+        BenchmarkCase("skinned", lambda: _case_skinned(2 * scale, 24, 2000, 0),
+                      meshes=2 * scale, bones=24, triangles=2000, actions=0),
+        BenchmarkCase("actions", lambda: _case_skinned(1, 16, 10, 10 * scale),
+                      meshes=1, bones=16, triangles=10, actions=10 * scale),
+        BenchmarkCase("instances", lambda: _case_instances(10, 20 * scale, 100),
+                      objects=10, instances=20 * scale, triangles=100),
+        BenchmarkCase("linked", lambda: _case_linked(100 * scale, 100),
+                      duplicates=100 * scale, triangles=100),
+    ]
+
+
+def run_case(case: BenchmarkCase) -> Dict[str, Any]:
+    """populates the scene, exports it and returns timings in sec"""
+    deselect_all()
+    clear_bpy_data()
+    case.setup()
+
+    opt = ModelOptions()
+
+    start = time.perf_counter()
+    mod = builder.build(opt)
+    build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    encoder.encode_json(mod)
+    encode_json = time.perf_counter() - start
+
+    start = time.perf_counter()
+    encoder.encode_binary(mod)
+    encode_binary = time.perf_counter() - start
+
+    info = G3dModelInfo()
+    info.update(mod)
+
+    result = dict()
+    result['case'] = case.name
+    result['params'] = case.params
+    result['vertices'] = info.vertices
+    result['indices'] = info.indices
+    result['keyframes'] = info.counters.baked_keyframes
+    result['build'] = build
+    result['encode_json'] = encode_json
+    result['encode_binary'] = encode_binary
+    return result
+
+
+def history_file() -> Path:
+    return Path(__file__).parent / f"build/{bpy.app.version_string}/benchmark/history.json"
+
+
+def append_history(results: List[Dict[str, Any]], file: Path = None) -> Path:
+    """appends single suite run to the json history"""
+    file = file or history_file()
+    file.parent.mkdir(exist_ok=True, parents=True)
+
+    history = list()
+    if file.exists():
+        with open(file) as f:
+            history = json.load(f)
+
+    run = dict()
+    run['date'] = datetime.datetime.now().isoformat(timespec='seconds')
+    run['blender'] = bpy.app.version_string
+    run['scale'] = scale
+    run['results'] = results
+    history.append(run)
+
+    with open(file, 'w') as f:
+        json.dump(history, f, indent=2)
+    log.debug("append benchmark history to %s", file)
+    return file
+
 
 class Benchmark(BaseTest):
     def setUp(self):
         super().setUp()
         profiler.metrics.clear()
+        profiler.memory.metrics.clear()
+        profiler.tracer.spans.clear()
 
     def test_mesh(self):
         obj1 = add_triangle("obj1")
@@ -20,20 +140,75 @@ class Benchmark(BaseTest):
         opt = ModelOptions()
         opt.selected_only = True
 
+        profiler.tracer.start()
+        try:
+            mod = builder.build(opt)
+            with profiler.span('encode', format='g3dj'):
+                json = encoder.encode_json(mod)
+        finally:
+            profiler.tracer.stop()
+            dump_metrics()
+
+    def test_mesh_memory(self):
+        obj1 = add_triangle("obj1")
+
+        subsurf = obj1.modifiers.new('SUBSURF', 'SUBSURF')
+        subsurf.levels = 5
+
+        opt = ModelOptions()
+        opt.selected_only = True
+
+        profiler.memory.start()
         try:
             mod = builder.build(opt)
             json = encoder.encode_json(mod)
+            binary = encoder.encode_binary(mod)
         finally:
+            profiler.memory.stop()
             dump_metrics()
 
 
+class BenchmarkSuite(BaseTest):
+    """scalable synthetic scenes, set G3D_BENCH_SCALE to grow them"""
+
+    def test_suite(self):
+        all_runs = list()
+
+        for run in range(runs):
+            results = list()
+
+            for case in suite_cases():
+                with self.subTest(case=case.name, run=run):
+                    result = run_case(case)
+                    log.debug("benchmark %s: %s", case.name, result)
+                    results.append(result)
+
+            append_history(results)
+            all_runs.append(results)
+
+        if output:
+            with open(output, 'w') as f:
+                json.dump(all_runs, f, indent=2)
+
+
 def dump_metrics():
     out_dir = Path(__file__).parent / f"build/{bpy.app.version_string}/benchmark"
     out_dir.mkdir(exist_ok=True, parents=True)
 
     filename = out_dir / f"{datetime.datetime.now().strftime('%Y-%m-%d %H-%M-%S')}.txt"
 
+    if profiler.tracer.spans:
+        trace_file = profiler.tracer.dump(filename.with_suffix(".trace.json"))
+        log.debug("dump trace to %s", trace_file)
+
     with open(filename, 'w') as f:
+        if profiler.memory.metrics:
+            f.write(profiler.memory.format())
+            f.write("\n")
+
+        if not profiler.metrics:
+            return
+
         metrics = sorted(profiler.metrics.values(), key=lambda m: m.total, reverse=True)
         max_metric = max(metrics, key=lambda m: m.total)
 
@@ -1,4 +1,6 @@
-from g3d_exporter import builder
+import tempfile
+
+from g3d_exporter import builder, dirty, profiler, snapshot
 from g3d_exporter.builder import *
 from g3d_exporter.model import *
 from tests.base import BaseTest
@@ -406,6 +408,121 @@ class G3dBuilderTest(BaseTest):
         self.assertEqual(mod.animations[0].bones[0].keyframes[0].keytime, 0)
         self.assertAlmostEqual(mod.animations[0].bones[0].keyframes[-1].keytime, 1000, 3)
 
+    def test_animation_bones_timelines(self):
+        """
+        Outliner:
+        armature
+            Bone            : bezier 10..20
+                Bone.001    : linear 30..40
+        """
+
+        obj1 = add_armature("armature")
+
+        action1 = bpy.data.actions.new("action1")
+
+        flocx = action1.fcurves.new('pose.bones["Bone"].location', index=0, action_group="Bone")
+        flocx.keyframe_points.insert(10, 0)
+        flocx.keyframe_points.insert(20, 3)
+
+        fscax = action1.fcurves.new('pose.bones["Bone.001"].scale', index=0, action_group="Bone.001")
+        fscax.keyframe_points.insert(30, 1).interpolation = 'LINEAR'
+        fscax.keyframe_points.insert(40, 3).interpolation = 'LINEAR'
+
+        opt = ModelOptions()
+        opt.fps = 10
+
+        mod = builder.build(opt)
+
+        bones = mod.animations[0].bones
+        self.assertEqual([b.bone_id for b in bones], ["Bone", "Bone.001"])
+        self.assertEqual(len(bones[0].keyframes), 11)
+        self.assertEqual(len(bones[1].keyframes), 2)
+        self.assertEqual(bones[0].keyframes[0].keytime, 0)
+        self.assertEqual(bones[1].keyframes[0].keytime, 0)
+        self.assertAlmostEqual(bones[0].keyframes[-1].keytime, 1000, 3)
+        self.assertAlmostEqual(bones[1].keyframes[-1].keytime, 1000, 3)
+        self.assertAlmostEqual(bones[0].keyframes[-1].pose.to_translation()[0], 3, 3)
+
+    def test_animation_channels(self):
+        """
+        Outliner:
+        armature
+            Bone            : location bezier 10..20, rotation linear 10..40
+                Bone.001    : rest
+        """
+
+        obj1 = add_armature("armature")
+
+        action1 = bpy.data.actions.new("action1")
+
+        flocx = action1.fcurves.new('pose.bones["Bone"].location', index=0, action_group="Bone")
+        flocx.keyframe_points.insert(10, 0)
+        flocx.keyframe_points.insert(20, 3)
+
+        frotz = action1.fcurves.new('pose.bones["Bone"].rotation_quaternion', index=3, action_group="Bone")
+        frotz.keyframe_points.insert(10, 0).interpolation = 'LINEAR'
+        frotz.keyframe_points.insert(40, 0.5).interpolation = 'LINEAR'
+
+        fscax = action1.fcurves.new('pose.bones["Bone.001"].scale', index=0, action_group="Bone.001")
+        fscax.keyframe_points.insert(10, 1)
+        fscax.keyframe_points.insert(20, 1)
+
+        opt = ModelOptions()
+        opt.fps = 10
+        opt.animation_format = 'CHANNELS'
+
+        mod = builder.build(opt)
+        dump_model(self.test_animation_channels.__name__, mod)
+
+        bones = mod.animations[0].bones
+        self.assertEqual([b.bone_id for b in bones], ["Bone"])
+        self.assertEqual(bones[0].keyframes, [])
+        self.assertEqual(len(bones[0].translation), 11)
+        self.assertEqual(len(bones[0].rotation), 2)
+        self.assertEqual(bones[0].scaling, [])
+        self.assertAlmostEqual(bones[0].rotation[-1].keytime, 3000, 3)
+        self.assertNotIn('keyframes', bones[0].to_dict())
+
+    def test_adaptive_bake(self):
+        obj1 = add_armature("armature")
+
+        action1 = bpy.data.actions.new("action1")
+
+        flocx = action1.fcurves.new('pose.bones["Bone"].location', index=0, action_group="Bone")
+        flocx.keyframe_points.insert(10.5, 0)
+        flocx.keyframe_points.insert(100.5, 3)
+
+        opt = ModelOptions()
+        opt.fps = 30
+        opt.adaptive_bake = True
+        opt.adaptive_error = 0.01
+
+        mod = builder.build(opt)
+        dump_model(self.test_adaptive_bake.__name__, mod)
+
+        keys = mod.animations[0].bones[0].keyframes
+        self.assertLess(len(keys), 90)
+        self.assertEqual(keys[0].keytime, 0)
+        self.assertAlmostEqual(keys[-1].keytime, 3000, 3)
+        self.assertAlmostEqual((keys[-1].pose.to_translation() - keys[0].pose.to_translation()).length, 3, 3)
+
+    def test_action_index(self):
+        obj1 = add_armature("armature")
+
+        action1 = bpy.data.actions.new("action1")
+        action1.fcurves.new('pose.bones["Bone.001"].location', index=0, action_group="Other")
+        action1.use_fake_user = True
+
+        action2 = bpy.data.actions.new("action2")
+        action2.fcurves.new('pose.bones["Hand"].location', index=0, action_group="Hand")
+        action2.use_fake_user = True
+
+        index = ActionIndex(bpy.data.actions)
+
+        self.assertEqual(index.actions_for(obj1.pose.bones.keys()), [action1])
+        self.assertEqual(index.actions_for(["Hand", "Other"]), [action1, action2])
+        self.assertEqual(index.actions_for(["Foot"]), [])
+
     def test_export_in_editmode(self):
         obj1 = add_triangle("obj1")
 
@@ -422,6 +539,242 @@ class G3dBuilderTest(BaseTest):
         self.assertEqual(len(mod.meshes[0].parts), 1)
         self.assertEqual(len(mod.nodes), 1)
 
+    def test_info_counters(self):
+        obj1 = add_armature("armature")
+
+        action1 = bpy.data.actions.new("action1")
+        flocx = action1.fcurves.new('pose.bones["Bone"].location', index=0, action_group="Bone")
+        flocx.keyframe_points.insert(10, 0)
+        flocx.keyframe_points.insert(40, 3)
+
+        add_triangle("obj1", count=2)
+        add_triangle("obj2", mesh=bpy.data.objects["obj1"].data)
+
+        opt = ModelOptions()
+        opt.fps = 30
+
+        mod = builder.build(opt)
+
+        info = G3dModelInfo()
+        info.update(mod)
+        encoder.encode_json(mod, info.sections)
+
+        self.assertEqual(info.counters.input_loops, 6)
+        self.assertEqual(info.vertices, 6)
+        self.assertAlmostEqual(info.dedup_ratio(), 1.0)
+        self.assertEqual(info.nodeparts, {"obj1": 1, "obj2": 1})
+        self.assertEqual(info.counters.raw_keyframes, 2)
+        self.assertEqual(info.counters.baked_keyframes, 31)
+        self.assertIn('build', info.counters.stages)
+        self.assertGreater(info.sections['meshes'], 0)
+        self.assertIn('vertices_per_sec', info.to_dict())
+
+    def test_share_animations(self):
+        obj1 = add_armature("armature")
+        obj2 = add_armature("armature.001")
+
+        action1 = bpy.data.actions.new("action1")
+        flocx = action1.fcurves.new('pose.bones["Bone"].location', index=0, action_group="Bone")
+        flocx.keyframe_points.insert(10, 0)
+        flocx.keyframe_points.insert(40, 3)
+
+        opt = ModelOptions()
+        opt.fps = 30
+        opt.share_animations = True
+
+        mod = builder.build(opt)
+
+        self.assertEqual([a.id for a in mod.animations], [f"{obj1.name}|{action1.name}"])
+        self.assertEqual(mod.animation_aliases, {f"{obj2.name}|{action1.name}": f"{obj1.name}|{action1.name}"})
+
+    def test_lods(self):
+        bpy.ops.mesh.primitive_uv_sphere_add()
+        obj = bpy.context.active_object
+        obj.name = "sphere"
+        obj.data.materials.append(bpy.data.materials.new("sphere_mat"))
+        obj.modifiers.new("subsurf", 'SUBSURF')
+        obj.modifiers.new("bevel", 'BEVEL').show_viewport = False
+        objects = len(bpy.data.objects)
+
+        opt = ModelOptions()
+        opt.lod_count = 2
+        opt.lod_ratio = 0.5
+
+        mod = builder.build(opt)
+        dump_model(self.test_lods.__name__, mod)
+
+        self.assertEqual([n.id for n in mod.nodes], ["sphere", "sphere_LOD1", "sphere_LOD2"])
+        self.assertEqual(len(mod.materials), 1)
+
+        # levels share the mesh of the same attributes
+        self.assertEqual(len(mod.meshes), 1)
+        parts = {p.id: p for p in mod.meshes[0].parts}
+        indices = [len(parts[n.parts[0].meshpart].indices) for n in mod.nodes]
+        self.assertGreater(indices[0], indices[1])
+        self.assertGreater(indices[1], indices[2])
+        # the object isn't changed, the temporary one is removed
+        self.assertEqual([(m.name, m.show_viewport) for m in obj.modifiers], [("subsurf", True), ("bevel", False)])
+        self.assertEqual(len(bpy.data.objects), objects)
+
+    def test_skinned_lods(self):
+        obj_arm = add_armature("armature")
+        bpy.ops.mesh.primitive_uv_sphere_add()
+        obj = bpy.context.active_object
+        obj.name = "sphere"
+        obj.data.materials.append(bpy.data.materials.new("sphere_mat"))
+        make_skinned(obj_arm, obj)
+        obj.vertex_groups['Bone'].add(list(range(len(obj.data.vertices))), 1.0, 'REPLACE')
+
+        opt = ModelOptions()
+        opt.lod_count = 1
+        opt.lod_ratio = 0.5
+
+        mod = builder.build(opt)
+
+        # vertex groups of the object are used by the decimated level
+        nodes = {n.id: n for n in flatten(self._nodes_recursive(n) for n in mod.nodes)}
+        self.assertEqual([b.name for b in nodes["sphere_LOD1"].parts[0].bones], ["Bone"])
+
+    def _nodes_recursive(self, node: GNode):
+        yield node
+        for child in node.children:
+            yield from self._nodes_recursive(child)
+
+    def test_vertex_cache(self):
+        bpy.ops.mesh.primitive_grid_add(x_subdivisions=10, y_subdivisions=10)
+        bpy.context.active_object.data.materials.append(bpy.data.materials.new("grid_mat"))
+
+        opt = ModelOptions()
+        opt.optimize_vertex_cache = True
+        mod = builder.build(opt)
+        # reported only
+        self.assertEqual(mod.counters.cache_triangles, 0)
+
+        opt.measure = True
+        mod = builder.build(opt)
+        self.assertGreater(mod.counters.cache_triangles, 0)
+        self.assertLessEqual(mod.counters.cache_misses_after, mod.counters.cache_misses_before)
+
+    def test_strips(self):
+        bpy.ops.mesh.primitive_grid_add(x_subdivisions=10, y_subdivisions=10)
+        grid = bpy.context.active_object
+        grid.data.materials.append(bpy.data.materials.new("grid_mat"))
+        # separate triangles make the longer strip
+        add_triangle("obj1", count=4)
+
+        opt = ModelOptions()
+        opt.primitive_type = 'TRIANGLE_STRIP'
+
+        mod = builder.build(opt)
+        dump_model(self.test_strips.__name__, mod)
+
+        types = {p.id.rsplit("_mesh", 1)[0]: p.type for p in mod.meshes[0].parts}
+        self.assertEqual(types, {grid.data.name: 'TRIANGLE_STRIP', "obj1_mesh": 'TRIANGLES'})
+        self.assertLess(mod.counters.strip_indices, mod.counters.strip_list_indices)
+
+    def test_chunks(self):
+        add_triangle("obj1", count=8)
+
+        opt = ModelOptions()
+        opt.chunk_faces = 2
+
+        mod = builder.build(opt)
+        dump_model(self.test_chunks.__name__, mod)
+
+        node = mod.nodes[0]
+        self.assertEqual(len(node.parts), 0)
+        self.assertEqual([c.id for c in node.children], [f"obj1_chunk{i}" for i in range(4)])
+        for child in node.children:
+            self.assertEqual(len(child.parts), 1)
+        self.assertEqual(sum(len(p.indices) for p in mod.meshes[0].parts), 24)
+
+    def test_incremental(self):
+        obj1 = add_triangle("obj1", count=2)
+        add_triangle("obj2")
+
+        opt = ModelOptions()
+        opt.incremental = True
+        snapshot.store.clear()
+
+        first = builder.build(opt)
+        second = builder.build(opt)
+
+        self.assertEqual(first.counters.reused_meshes, 0)
+        self.assertEqual(second.counters.reused_meshes, 2)
+        self.assertEqual(encoder.encode_json(first), encoder.encode_json(second))
+
+        # only the changed object is converted again
+        obj1.data.vertices[0].co.x = 5
+        third = builder.build(opt)
+        self.assertEqual(third.counters.reused_meshes, 1)
+        self.assertIn(5.0, third.meshes[0].vertices)
+        self.assertEqual(len(snapshot.store.snapshots), 2)
+
+    def test_dirty_tracking(self):
+        obj1 = add_triangle("obj1", count=2)
+        add_triangle("obj2")
+
+        opt = ModelOptions()
+        opt.incremental = True
+        snapshot.store.clear()
+
+        dirty.register()
+        try:
+            first = builder.build(opt)
+            second = builder.build(opt)
+
+            self.assertEqual(second.counters.reused_meshes, 2)
+            self.assertEqual(set(dirty.tracker.records), {"obj1", "obj2"})
+            self.assertEqual(encoder.encode_json(first), encoder.encode_json(second))
+
+            # the changed object is evaluated again, the other one is replayed without it
+            obj1.data.vertices[0].co.x = 5
+            obj1.data.update()
+            third = builder.build(opt)
+            self.assertEqual(third.counters.reused_meshes, 1)
+            self.assertIn(5.0, third.meshes[0].vertices)
+        finally:
+            dirty.unregister()
+
+    def test_disk_cache(self):
+        add_triangle("obj1", count=2)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            opt = ModelOptions()
+            opt.cache_dir = tmp
+
+            first = builder.build(opt)
+            # the other session
+            snapshot.store.clear()
+            second = builder.build(opt)
+
+            self.assertEqual(first.counters.reused_meshes, 0)
+            self.assertEqual(second.counters.reused_meshes, 1)
+            # output doesn't depend on the cache state
+            self.assertEqual(encoder.encode_json(first), encoder.encode_json(second))
+            self.assertEqual(encoder.encode_binary(first), encoder.encode_binary(second))
+
+    def test_trace(self):
+        add_triangle("obj1")
+
+        profiler.tracer.start()
+        try:
+            builder.build(ModelOptions())
+        finally:
+            profiler.tracer.stop()
+
+        names = [s.name for s in profiler.tracer.spans]
+        self.assertIn('build', names)
+        self.assertIn('object', names)
+        self.assertIn('mesh', names)
+
+        mesh_span = next(s for s in profiler.tracer.spans if s.name == 'mesh')
+        self.assertEqual(mesh_span.attrs['object'], "obj1")
+        self.assertEqual(mesh_span.attrs['indices'], 3)
+
+        events = profiler.tracer.to_dict()['traceEvents']
+        self.assertTrue(all(e['ph'] in ('X', 'M') for e in events))
+
     # def test_shapekeys(self):
     #     """
     #     Outliner:
@@ -533,6 +886,61 @@ class MeshNodeDataBuilderTest(BaseTest):
         self.assertEqual(mesh_builder._get_primitive_type(obj1), 'LINE_STRIP')
         self.assertEqual(mesh_builder._get_primitive_type(obj2), 'TRIANGLES')
 
+    def test_edge_primitives(self):
+        obj = add_triangle("test_edge_primitives", count=2)
+        obj.display_type = 'WIRE'
+
+        opt = ModelOptions()
+        mesh = bpy.data.meshes["test_edge_primitives_mesh"]
+
+        # two separate triangles aren't a single line strip
+        meshdata = MeshNodeDataBuilder(G3Data(), opt).build(obj, mesh, None)
+        self.assertEqual(meshdata.parts[0].meshpart.primitive_type, 'LINES')
+        self.assertEqual(len(meshdata.parts[0].meshpart.indices), 12)
+
+        opt.primitive_type = 'POINTS'
+        meshdata = MeshNodeDataBuilder(G3Data(), opt).build(obj, mesh, None)
+        self.assertEqual(sorted(meshdata.parts[0].meshpart.indices), [0, 1, 2, 3, 4, 5])
+
+        # closed loop of the single triangle
+        obj = add_triangle("test_edge_primitives_single")
+        obj.display_type = 'WIRE'
+        meshdata = MeshNodeDataBuilder(G3Data(), ModelOptions()).build(obj, obj.data, None)
+        indices = meshdata.parts[0].meshpart.indices
+        self.assertEqual(meshdata.parts[0].meshpart.primitive_type, 'LINE_STRIP')
+        self.assertEqual(len(indices), 4)
+        self.assertEqual(indices[0], indices[-1])
+
+    def test_edges_only(self):
+        # polyline and the loose vertex, no faces
+        mesh = bpy.data.meshes.new("test_edges_only_mesh")
+        mesh.from_pydata([(0, 0, 0), (1, 0, 0), (1, 1, 0), (2, 1, 0), (5, 5, 5)], [(0, 1), (1, 2), (2, 3)], [])
+        obj = add_triangle("test_edges_only", mesh=mesh)
+        obj.display_type = 'WIRE'
+
+        mod = builder.build(ModelOptions())
+        dump_model(self.test_edges_only.__name__, mod)
+
+        self.assertEqual(len(mod.nodes[0].parts), 1)
+        part = mod.meshes[0].parts[0]
+        self.assertEqual(part.type, 'LINE_STRIP')
+        self.assertEqual(len(part.indices), 4)
+        # loop attributes aren't made of the vertices
+        self.assertEqual([a.name for a in mod.meshes[0].attributes], ["POSITION", "NORMAL"])
+
+        opt = ModelOptions()
+        opt.primitive_type = 'POINTS'
+        meshdata = MeshNodeDataBuilder(G3Data(), opt).build(obj, mesh, None)
+        self.assertEqual(sorted(meshdata.parts[0].meshpart.indices), [0, 1, 2, 3, 4])
+
+        # an edge per meshpart, the vertices of the mesh are converted once
+        opt.primitive_type = 'LINES'
+        opt.max_indices_per_meshpart = 2
+        g3data = G3Data()
+        meshdata = MeshNodeDataBuilder(g3data, opt).build(obj, mesh, None)
+        self.assertEqual([p.meshpart.indices for p in meshdata.parts], [[0, 1], [1, 2], [2, 3]])
+        self.assertEqual(len(g3data.meshes[0].vertices), 4)
+
 
 class BlendweightAttributeBuilderTest(BaseTest):
     obj1: bpy.types.Object
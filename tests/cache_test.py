@@ -0,0 +1,103 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from g3d_exporter import cache, model, snapshot
+from g3d_exporter.common import Matrix
+
+
+def make_snapshot(name: str = "mesh", triangles: int = 1) -> snapshot.MeshSnapshot:
+    attributes = (model.VertexFlag("POSITION", 3), model.VertexFlag("BLENDWEIGHT0", 2))
+    vertices = [(0.1 * i, 0.2, 1 / 3, 0.0, 1.0) for i in range(triangles * 3)]
+    bones = [model.BonePart("bone", Matrix.Translation((1, 2, 3)), 0)]
+    part = snapshot.PartSnapshot("mat", attributes, 'TRIANGLES', 0, bones, vertices, list(range(triangles * 3)))
+    return snapshot.MeshSnapshot(name, triangles * 3, 1, [part])
+
+
+class DiskCacheTest(unittest.TestCase):
+    """runs in blender and in plain python with numpy"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_roundtrip(self):
+        disk = cache.DiskCache(self.dir, 1024 * 1024)
+        snap = make_snapshot()
+
+        disk.put("key", snap)
+        loaded = disk.get("key")
+
+        self.assertEqual(loaded.mesh_name, "mesh")
+        self.assertEqual((loaded.loops, loaded.chunks), (3, 1))
+        part = loaded.parts[0]
+        self.assertEqual(part.attributes, snap.parts[0].attributes)
+        # floats are exact
+        self.assertEqual(part.vertices, snap.parts[0].vertices)
+        self.assertEqual(part.indices, [0, 1, 2])
+        self.assertEqual(part.bones[0].name, "bone")
+        self.assertEqual(list(part.bones[0].matrix.to_translation()), [1, 2, 3])
+
+        self.assertIsNone(disk.get("missing"))
+        self.assertEqual((disk.hits, disk.misses), (1, 1))
+
+    def test_evict_least_recently_used(self):
+        disk = cache.DiskCache(self.dir, 1024 * 1024)
+        for i, key in enumerate(("a", "b", "c")):
+            disk.put(key, make_snapshot(key, 20))
+            os.utime(disk.path(key), (i, i))
+
+        # a is used recently
+        disk.get("a")
+        disk.max_bytes = disk.size() - 1
+        disk.evict()
+
+        self.assertFalse(disk.path("b").exists())
+        self.assertTrue(disk.path("a").exists())
+        self.assertTrue(disk.path("c").exists())
+        self.assertLessEqual(disk.size(), disk.max_bytes)
+
+    def test_evict_on_write(self):
+        disk = cache.DiskCache(self.dir, 1024 * 1024)
+        disk.put("a", make_snapshot("a", 20))
+        os.utime(disk.path("a"), (0, 0))
+        disk.max_bytes = disk.size() * 3
+
+        evictions = list()
+        evict = disk.evict
+        disk.evict = lambda limit=None: evictions.append(limit) or evict(limit)
+
+        for i, key in enumerate("bcdefg"):
+            disk.put(key, make_snapshot(key, 20))
+            os.utime(disk.path(key), (i + 1, i + 1))
+            self.assertLessEqual(disk.size(), disk.max_bytes)
+
+        # the cache is scanned only when it's full, the eviction leaves a room for the next entry
+        self.assertEqual(len(evictions), 2)
+        self.assertEqual(sorted(p.stem for p in self.dir.iterdir()), ["e", "f", "g"])
+
+    def test_broken_entry(self):
+        disk = cache.DiskCache(self.dir, 1024)
+        self.dir.mkdir(exist_ok=True)
+        disk.path("bad").write_bytes(b"not a cache entry")
+
+        self.assertIsNone(disk.get("bad"))
+        self.assertFalse(disk.path("bad").exists())
+
+    def test_truncated_entry(self):
+        disk = cache.DiskCache(self.dir, 1024 * 1024)
+        disk.put("key", make_snapshot(triangles=4))
+        path = disk.path("key")
+        path.write_bytes(path.read_bytes()[:-10])
+
+        self.assertIsNone(disk.get("key"))
+        self.assertFalse(path.exists())
+        self.assertEqual(disk.misses, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,5 @@
 from pathlib import Path
+from typing import List
 import logging
 
 import bpy
@@ -157,5 +158,85 @@ def make_skinned(obj_arm: bpy.types.Object, obj: bpy.types.Object, strategy='ARM
     bpy.ops.object.parent_set(type=strategy)
 
 
+def add_triangles(name: str, triangles: int, materials: int = 1, select=True) -> bpy.types.Object:
+    """object with separate triangles spread over materials"""
+    obj = add_triangle(name, select=select, count=triangles)
+
+    for i in range(1, materials):
+        obj.data.materials.append(bpy.data.materials.new(f"{name}_mat{i}"))
+
+    for polygon in obj.data.polygons:
+        polygon.material_index = polygon.index % materials
+    return obj
+
+
+def add_skinned(name: str, bones: int, triangles: int, select=True) -> bpy.types.Object:
+    """armature with chained bones and mesh weighted to the bones in turn, returns armature"""
+    obj_arm = add_armature(name + "_armature", select=select, bones_count=bones)
+    obj = add_triangles(name, triangles, select=select)
+    make_skinned(obj_arm, obj)
+
+    names = [b.name for b in obj_arm.data.bones]
+    for v in obj.data.vertices:
+        obj.vertex_groups[names[v.index % len(names)]].add([v.index], 1.0, 'REPLACE')
+
+    obj.select_set(select)
+    obj_arm.select_set(select)
+    return obj_arm
+
+
+def add_bezier_actions(obj_arm: bpy.types.Object, actions: int, keys: int = 4, frames: int = 60) -> List[bpy.types.Action]:
+    """actions with bezier location and rotation curves for the each bone"""
+    result = list()
+    step = frames / max(keys - 1, 1)
+
+    for a in range(actions):
+        action = bpy.data.actions.new(f"{obj_arm.name}_action{a}")
+
+        for bone in obj_arm.pose.bones:
+            bone.rotation_mode = 'QUATERNION'
+            path = f'pose.bones["{bone.name}"]'
+
+            for index in range(3):
+                curve = action.fcurves.new(path + '.location', index=index, action_group=bone.name)
+                for k in range(keys):
+                    point = curve.keyframe_points.insert(1 + k * step, (k + a + index) % 3)
+                    point.interpolation = 'BEZIER'
+
+            for index in range(4):
+                curve = action.fcurves.new(path + '.rotation_quaternion', index=index, action_group=bone.name)
+                for k in range(keys):
+                    point = curve.keyframe_points.insert(1 + k * step, 1.0 if index == 0 else 0.1 * ((k + a) % 5))
+                    point.interpolation = 'BEZIER'
+
+        action.use_fake_user = True
+        result.append(action)
+    return result
+
+
+def add_instanced_collection(name: str, objects: int, instances: int, triangles: int = 1) -> bpy.types.Collection:
+    """excluded collection with objects and its instances in the root collection"""
+    col = add_collection(name)
+    bpy.context.view_layer.layer_collection.children[col.name].exclude = True
+
+    for i in range(objects):
+        obj = add_triangles(f"{name}_obj{i}", triangles)
+        move_to_collection(obj, col.name)
+
+    for i in range(instances):
+        add_collection_instance(col.name).name = f"{name}_instance{i}"
+    return col
+
+
+def add_linked(name: str, duplicates: int, triangles: int = 1) -> List[bpy.types.Object]:
+    """objects sharing the same mesh"""
+    first = add_triangles(name, triangles)
+    result = [first]
+
+    for i in range(1, duplicates):
+        result.append(add_triangle(f"{name}.{i:03}", mesh=first.data, mat=first.data.materials[0]))
+    return result
+
+
 def qualified_classname(o):
     return o.__module__ + '.' + o.__name__
@@ -0,0 +1,72 @@
+import unittest
+from types import SimpleNamespace
+
+from g3d_exporter import dirty, model
+
+
+def update(id_type: str, name: str, geometry: bool = True):
+    return SimpleNamespace(id=SimpleNamespace(id_type=id_type, name=name), is_updated_geometry=geometry)
+
+
+class DirtyTrackerTest(unittest.TestCase):
+    """runs in blender and in plain python"""
+
+    def setUp(self):
+        self.tracker = dirty.DirtyTracker()
+        self.tracker.listening = True
+        self.tracker.begin(("options",))
+
+        self.anim = model.GAnimation("armature|walk")
+        self.record = dirty.ObjectRecord(1, "fp", None)
+        self.tracker.reset({"obj1": self.record, "obj2": dirty.ObjectRecord(2, "fp2", None)},
+                           {"armature|walk": (("key",), self.anim)})
+
+    def test_clean_after_export(self):
+        self.assertIs(self.tracker.clean_record("obj1", "mesh1", ["mat"]), self.record)
+        self.assertIsNone(self.tracker.clean_record("obj3", "mesh3", []))
+        self.assertIs(self.tracker.clean_animation("armature|walk", "armature", "bones", "walk", ("key",)), self.anim)
+        # baked with the other options
+        self.assertIsNone(self.tracker.clean_animation("armature|walk", "armature", "bones", "walk", ("other",)))
+
+    def test_updates(self):
+        self.tracker.on_depsgraph_update([update('OBJECT', "obj1"), update('OBJECT', "obj2", geometry=False),
+                                          update('MATERIAL', "mat"), update('ACTION', "walk")])
+
+        self.assertIsNone(self.tracker.clean_record("obj1", "mesh1", []))
+        # transform only
+        self.assertIsNotNone(self.tracker.clean_record("obj2", "mesh2", []))
+        self.assertIsNone(self.tracker.clean_record("obj2", "mesh2", ["mat"]))
+        self.assertIsNone(self.tracker.clean_animation("armature|walk", "armature", "bones", "walk", ("key",)))
+
+        self.tracker.reset(dict(), dict())
+        self.assertFalse(self.tracker.objects or self.tracker.materials or self.tracker.actions)
+
+    def test_mesh_and_armature_updates(self):
+        self.tracker.on_depsgraph_update([update('MESH', "mesh1"), update('ARMATURE', "bones")])
+
+        self.assertIsNone(self.tracker.clean_record("obj1", "mesh1", []))
+        self.assertFalse(self.tracker.is_clean_armature("armature", "bones"))
+        self.assertTrue(self.tracker.is_clean_armature("other", "other_bones"))
+
+    def test_frame_change(self):
+        self.tracker.on_frame_change()
+
+        # deformed meshes are evaluated again, actions are the same
+        self.assertIsNone(self.tracker.clean_record("obj1", "mesh1", []))
+        self.assertIs(self.tracker.clean_animation("armature|walk", "armature", "bones", "walk", ("key",)), self.anim)
+
+        self.tracker.reset({"obj1": self.record}, dict())
+        self.assertIs(self.tracker.clean_record("obj1", "mesh1", []), self.record)
+
+    def test_invalidate(self):
+        self.tracker.begin(("other options",))
+        self.assertIsNone(self.tracker.clean_record("obj1", "mesh1", []))
+
+        self.tracker.reset({"obj1": self.record}, dict())
+        self.tracker.invalidate()
+        self.assertIsNone(self.tracker.clean_record("obj1", "mesh1", []))
+
+    def test_not_listening(self):
+        tracker = dirty.DirtyTracker()
+        tracker.reset({"obj1": self.record}, dict())
+        self.assertIsNone(tracker.clean_record("obj1", "mesh1", []))
@@ -0,0 +1,71 @@
+"""
+Blender-free micro-benchmark of the encoders over synthetic models.
+    python -m tests.encoder_benchmark [--floats N] [--repeat N] [--animations N] [--output file.json]
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from g3d_exporter import encoder
+from g3d_exporter.model import G3dModel
+from tests.synthetic import make_model, default_attributes
+
+vertex_size = sum(a.length for a in default_attributes)
+
+
+def measure(func: Callable[[G3dModel], Any], mod: G3dModel, repeat: int) -> Dict[str, float]:
+    timings: List[float] = list()
+    size = 0
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        data = func(mod)
+        timings.append(time.perf_counter() - start)
+        size = len(data)
+
+    result = dict()
+    result['min'] = min(timings)
+    result['median'] = statistics.median(timings)
+    result['bytes'] = size
+    return result
+
+
+def run(floats: int, repeat: int, animations: int) -> Dict[str, Any]:
+    vertices = max(3, floats // vertex_size)
+    mod = make_model(vertices, parts=4, nodes=4, animations=animations, bones=16, keyframes=60)
+    floats = vertices * vertex_size
+
+    results = dict()
+    results['floats'] = floats
+    results['animations'] = animations
+
+    for name, func in (('encode_json', encoder.encode_json), ('encode_binary', encoder.encode_binary)):
+        res = measure(func, mod, repeat)
+        res['floats_per_sec'] = floats / res['median'] if res['median'] > 0 else 0.0
+        results[name] = res
+        print("{:<14} floats {:>10} median {:>9.3f} s  min {:>9.3f} s  {:>12.0f} floats/s  {:>10} bytes"
+              .format(name, floats, res['median'], res['min'], res['floats_per_sec'], res['bytes']))
+    return results
+
+
+def main(args: List[str]):
+    parser = argparse.ArgumentParser(prog="tests.encoder_benchmark")
+    parser.add_argument("--floats", type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--animations", type=int, default=0)
+    parser.add_argument("--output", type=Path, default=None)
+    opt = parser.parse_args(args)
+
+    results = [run(floats, opt.repeat, opt.animations) for floats in opt.floats]
+
+    if opt.output:
+        with open(opt.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
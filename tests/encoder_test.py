@@ -0,0 +1,149 @@
+import json
+import math
+import types
+import unittest
+
+from g3d_exporter import encoder, simpleubjson
+from g3d_exporter.common import Matrix, Quaternion, Vector, new_transorm_matrix
+from g3d_exporter.model import *
+from tests.synthetic import make_model
+
+
+class EncoderTest(unittest.TestCase):
+    """runs in blender and in plain python"""
+
+    def test_json(self):
+        mod = make_model(300, parts=2, nodes=2, animations=1, bones=2, keyframes=3)
+
+        decoded = json.loads(encoder.encode_json(mod))
+
+        self.assertEqual(decoded['version'], [0, 1])
+        self.assertEqual(len(decoded['meshes']), 1)
+        self.assertEqual(decoded['meshes'][0]['attributes'], ["POSITION", "NORMAL", "TEXCOORD0", "BLENDWEIGHT0"])
+        self.assertEqual(len(decoded['meshes'][0]['vertices']), 300 * 10)
+        self.assertEqual(decoded['meshes'][0]['parts'][1]['indices'][0], 150)
+        self.assertEqual(len(decoded['nodes'][0]['parts'][0]['bones']), 2)
+        self.assertEqual(len(decoded['animations'][0]['bones'][1]['keyframes']), 3)
+
+        for a, b in zip(decoded['meshes'][0]['vertices'], mod.meshes[0].vertices):
+            self.assertAlmostEqual(a, b, 5)
+
+    def test_binary(self):
+        mod = make_model(30, parts=1, nodes=1, animations=1, bones=1, keyframes=2)
+
+        decoded = _materialize(simpleubjson.decode(encoder.encode_binary(mod)))
+
+        self.assertEqual(decoded['id'], "")
+        self.assertEqual(len(decoded['meshes'][0]['vertices']), 30 * 10)
+        self.assertEqual(decoded['meshes'][0]['parts'][0]['indices'], list(range(30)))
+        self.assertEqual(decoded['nodes'][0]['parts'][0]['meshpartid'], "mesh0_mesh_part0")
+
+        keyframe = decoded['animations'][0]['bones'][0]['keyframes'][1]
+        expect = mod.animations[0].bones[0].keyframes[1]
+        self.assertAlmostEqual(keyframe['keytime'], expect.keytime, 3)
+        for a, b in zip(keyframe['rotation'], conv_quat(expect.pose.to_quaternion())):
+            self.assertAlmostEqual(a, b, 5)
+
+    def test_channels(self):
+        mod = make_model(30, parts=1, nodes=1, animations=1, bones=1, keyframes=2)
+        bone = mod.animations[0].bones[0]
+        bone.keyframes = []
+        bone.rotation = [GChannelKeyframe(0.0, [0.0, 0.0, 0.0, 1.0]), GChannelKeyframe(40.0, [0.0, 1.0, 0.0, 0.0])]
+
+        decoded = json.loads(encoder.encode_json(mod))
+
+        bone = decoded['animations'][0]['bones'][0]
+        self.assertEqual(set(bone), {'boneId', 'rotation'})
+        self.assertAlmostEqual(bone['rotation'][1]['keytime'], 40.0, 3)
+        self.assertEqual(bone['rotation'][1]['value'], [0.0, 1.0, 0.0, 0.0])
+
+    def test_section_sizes(self):
+        mod = make_model(30)
+        mod.id = "model"
+
+        binary_sizes = dict()
+        binary = encoder.encode_binary(mod, binary_sizes)
+        json_sizes = dict()
+        text = encoder.encode_json(mod, json_sizes)
+
+        # measured while encoding the same output
+        self.assertEqual(binary, encoder.encode_binary(mod))
+        self.assertEqual(text, encoder.encode_json(mod))
+
+        self.assertEqual(set(binary_sizes), {'version', 'id', 'meshes', 'materials', 'nodes', 'animations'})
+        self.assertEqual(set(json_sizes), set(binary_sizes))
+        self.assertGreater(binary_sizes['meshes'], 30 * 10 * 4)
+        self.assertLess(sum(binary_sizes.values()), len(binary))
+        self.assertLess(sum(json_sizes.values()), len(text))
+
+        # keys are counted by both encoders
+        self.assertEqual(json_sizes['id'], len('"id": "model"'))
+        self.assertEqual(binary_sizes['id'], len(simpleubjson.encode("id")) + len(simpleubjson.encode("model")))
+
+    def test_animation_aliases(self):
+        mod = make_model(3)
+        mod.animation_aliases = {"armature.001|walk": "armature|walk"}
+
+        info = G3dModelInfo()
+        info.update(mod)
+
+        self.assertIn("  armature.001|walk: armature|walk\n", encoder.encode_info(info))
+        self.assertEqual(json.loads(encoder.encode_metrics(info))['animation_aliases'],
+                         {"armature.001|walk": "armature|walk"})
+
+    def test_info_counters(self):
+        mod = make_model(3)
+        mod.counters.input_loops = 12
+        mod.counters.strip_list_indices = 30
+        mod.counters.strip_indices = 15
+        mod.counters.stages['build'] = 0.5
+
+        info = G3dModelInfo()
+        info.update(mod)
+        mod.counters.input_loops = 0
+
+        # every counter is written, the info keeps its own copy
+        text = encoder.encode_info(info)
+        self.assertIn("input_loops: 12\n", text)
+        self.assertIn("strip_ratio: 0.5000\n", text)
+        self.assertIn("reused_animations: 0\n", text)
+        metrics = json.loads(encoder.encode_metrics(info))
+        self.assertEqual(metrics['input_loops'], 12)
+        self.assertEqual(metrics['stages'], {'build': 0.5})
+        self.assertAlmostEqual(metrics['strip_ratio'], 0.5)
+
+    def test_decompose(self):
+        loc = Vector((1.0, -2.0, 3.0))
+        rot = Quaternion((0.0, 0.0, 1.0), math.radians(30))
+        sca = Vector((1.0, 2.0, 3.0))
+
+        (t, r, s) = new_transorm_matrix(loc, rot, sca).decompose()
+
+        for a, b in zip(t, loc):
+            self.assertAlmostEqual(a, b, 5)
+        for a, b in zip(r, rot):
+            self.assertAlmostEqual(a, b, 5)
+        for a, b in zip(s, sca):
+            self.assertAlmostEqual(a, b, 5)
+
+        inv = new_transorm_matrix(loc, rot, sca).inverted()
+        identity = inv @ new_transorm_matrix(loc, rot, sca)
+        for i in range(4):
+            for j in range(4):
+                self.assertAlmostEqual(identity[i][j], 1.0 if i == j else 0.0, 5)
+
+
+def _materialize(value):
+    """decoded ubjson containers are generators and nested objects are lists of pairs"""
+    if isinstance(value, (types.GeneratorType, list)):
+        value = list(value)
+        if value and all(isinstance(v, tuple) and len(v) == 2 for v in value):
+            return {k: _materialize(v) for k, v in value}
+        return [_materialize(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _materialize(v) for k, v in value.items()}
+    return value
+
+
+if __name__ == '__main__':
+    unittest.main()
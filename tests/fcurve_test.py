@@ -0,0 +1,123 @@
+import random
+import unittest
+
+import numpy as np
+
+from g3d_exporter import fcurve
+from g3d_exporter.fcurve import CurveData, BEZIER, CONSTANT, LINEAR
+
+try:
+    import bpy
+except ImportError:
+    bpy = None
+
+
+def make_curve(points, interpolation, handles=None, extrapolation='CONSTANT', array_index=0) -> CurveData:
+    """handles - list of (left, right) pairs, aligned to 1/3 of the neighbour segments by default"""
+    co = np.array(points, dtype=np.float64)
+
+    if handles is None:
+        handles = list()
+        for i, (x, y) in enumerate(points):
+            prev = points[i - 1] if i > 0 else (x - 1, y)
+            next = points[i + 1] if i + 1 < len(points) else (x + 1, y)
+            handles.append(((x - (x - prev[0]) / 3, y - (y - prev[1]) / 3),
+                            (x + (next[0] - x) / 3, y + (next[1] - y) / 3)))
+
+    left = np.array([h[0] for h in handles], dtype=np.float64)
+    right = np.array([h[1] for h in handles], dtype=np.float64)
+    ipo = np.array([interpolation] * len(points), dtype=np.int8)
+    return CurveData(array_index, co, left, right, ipo, extrapolation)
+
+
+class FCurveTest(unittest.TestCase):
+    """runs in blender and in plain python with numpy"""
+
+    def test_linear(self):
+        curve = make_curve([(0, 0), (10, 5), (20, -5)], LINEAR)
+
+        values = fcurve.sample(curve, [-5, 0, 5, 10, 15, 20, 25])
+
+        np.testing.assert_allclose(values, [0, 0, 2.5, 5, 0, -5, -5])
+
+    def test_constant(self):
+        curve = make_curve([(0, 1), (10, 2)], CONSTANT)
+
+        values = fcurve.sample(curve, [0, 9.99, 10, 11])
+
+        np.testing.assert_allclose(values, [1, 1, 2, 2])
+
+    def test_bezier_line(self):
+        # handles on the segment lines turn the bezier into linear
+        curve = make_curve([(0, 0), (10, 5), (30, -5)], BEZIER)
+
+        frames = np.linspace(0, 30, 61)
+        linear = make_curve([(0, 0), (10, 5), (30, -5)], LINEAR)
+
+        np.testing.assert_allclose(fcurve.sample(curve, frames), fcurve.sample(linear, frames), atol=1e-6)
+
+    def test_bezier_ease(self):
+        # auto-clamped like handles: flat at the keyframes
+        curve = make_curve([(0, 0), (10, 1)], BEZIER, handles=[((-3, 0), (3, 0)), ((7, 1), (13, 1))])
+
+        values = fcurve.sample(curve, [0, 2, 5, 8, 10])
+
+        self.assertAlmostEqual(values[0], 0)
+        self.assertAlmostEqual(values[2], 0.5)
+        self.assertAlmostEqual(values[1] + values[3], 1.0)
+        self.assertLess(values[1], 0.2)
+        self.assertAlmostEqual(values[4], 1)
+
+    def test_bezier_overlapping_handles(self):
+        curve = make_curve([(0, 0), (10, 1)], BEZIER, handles=[((-20, 0), (20, 0)), ((-10, 1), (30, 1))])
+
+        values = fcurve.sample(curve, np.linspace(0, 10, 21))
+
+        self.assertTrue(np.all(np.diff(values) >= -1e-9))
+        self.assertAlmostEqual(values[0], 0)
+        self.assertAlmostEqual(values[-1], 1)
+
+    def test_linear_extrapolation(self):
+        curve = make_curve([(0, 0), (10, 5)], LINEAR, extrapolation='LINEAR')
+
+        values = fcurve.sample(curve, [-10, 20])
+
+        np.testing.assert_allclose(values, [-5, 10])
+
+    def test_sample_curves(self):
+        curve = make_curve([(0, 0), (10, 5)], LINEAR, array_index=2)
+
+        values = fcurve.sample_curves([curve], [0, 10], (1.0, 1.0, 1.0))
+
+        self.assertEqual(values.shape, (2, 3))
+        np.testing.assert_allclose(values[:, 0], [1, 1])
+        np.testing.assert_allclose(values[:, 2], [0, 5])
+
+    @unittest.skipIf(bpy is None, "requires blender")
+    def test_match_blender(self):
+        rnd = random.Random(0)
+        action = bpy.data.actions.new("test_match_blender")
+
+        # easing types aren't vectorized, they are evaluated by blender
+        for interpolation in ('BEZIER', 'LINEAR', 'CONSTANT', 'SINE'):
+            for extrapolation in ('CONSTANT', 'LINEAR'):
+                b_curve = action.fcurves.new(f'location_{interpolation}_{extrapolation}', index=0)
+                for k in range(6):
+                    point = b_curve.keyframe_points.insert(k * 7 + rnd.random() * 5, rnd.uniform(-3, 3))
+                    point.interpolation = interpolation
+                b_curve.extrapolation = extrapolation
+                b_curve.update()
+
+                curve = CurveData.from_fcurve(b_curve)
+                self.assertEqual(curve.supported, interpolation != 'SINE')
+                frames = np.linspace(-10, 60, 701)
+                expect = [b_curve.evaluate(f) for f in frames]
+
+                np.testing.assert_allclose(fcurve.sample(curve, frames), expect, atol=1e-4,
+                                           err_msg=f"{interpolation}/{extrapolation}")
+
+        bpy.data.actions.remove(action)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+import math
+import unittest
+
+from g3d_exporter import keyframes
+from g3d_exporter.keyframes import Tolerance
+from g3d_exporter.model import GBoneAnimation, GBoneKeyframe, GChannelKeyframe
+from g3d_exporter.puremath import Matrix, Quaternion, Vector
+
+
+def make_animation(poses) -> GBoneAnimation:
+    """poses - list of (millis, loc, angle around z, scale)"""
+    keys = list()
+    for millis, loc, angle, scale in poses:
+        rot = Quaternion(Vector((0, 0, 1)), angle).to_matrix().to_4x4()
+        pose = Matrix.Translation(Vector(loc)) @ rot @ Matrix.Scale(scale, 4)
+        keys.append(GBoneKeyframe(millis, pose))
+
+    anim = GBoneAnimation('bone')
+    anim.keyframes = keys
+    return anim
+
+
+class KeyframesTest(unittest.TestCase):
+    def test_linear(self):
+        anim = make_animation([(i * 10.0, (i, 0, 0), 0.0, 1.0) for i in range(10)])
+
+        removed = keyframes.simplify(anim, Tolerance())
+
+        self.assertEqual(8, removed)
+        self.assertEqual([0.0, 90.0], [k.keytime for k in anim.keyframes])
+
+    def test_constant(self):
+        anim = make_animation([(i * 10.0, (1, 2, 3), 0.5, 2.0) for i in range(5)])
+
+        removed = keyframes.simplify(anim, Tolerance())
+
+        self.assertEqual(4, removed)
+        self.assertEqual([0.0], [k.keytime for k in anim.keyframes])
+
+    def test_slerp(self):
+        # constant angular velocity is reproduced by slerp
+        anim = make_animation([(i * 10.0, (0, 0, 0), i * 0.3, 1.0) for i in range(8)])
+
+        self.assertEqual(6, keyframes.simplify(anim, Tolerance()))
+
+    def test_corner(self):
+        poses = [(i * 10.0, (min(i, 4), 0, 0), 0.0, 1.0) for i in range(9)]
+        anim = make_animation(poses)
+
+        keyframes.simplify(anim, Tolerance())
+
+        self.assertEqual([0.0, 40.0, 80.0], [k.keytime for k in anim.keyframes])
+
+    def test_tolerance(self):
+        poses = [(i * 10.0, (i, 0.01 * math.sin(i), 0), 0.0, 1.0) for i in range(10)]
+
+        strict = make_animation(poses)
+        keyframes.simplify(strict, Tolerance())
+        loose = make_animation(poses)
+        keyframes.simplify(loose, Tolerance(translation=0.1))
+
+        self.assertEqual(10, len(strict.keyframes))
+        self.assertEqual(2, len(loose.keyframes))
+
+    def test_scale(self):
+        poses = [(0.0, (0, 0, 0), 0.0, 1.0), (10.0, (0, 0, 0), 0.0, 1.5), (20.0, (0, 0, 0), 0.0, 1.0)]
+        anim = make_animation(poses)
+
+        self.assertEqual(0, keyframes.simplify(anim, Tolerance()))
+
+    def test_channels(self):
+        anim = GBoneAnimation('bone')
+        anim.translation = [GChannelKeyframe(i * 10.0, [i, 2 * i, 0]) for i in range(6)]
+        anim.rotation = [GChannelKeyframe(0.0, [0, 0, 0, 1]), GChannelKeyframe(10.0, [0, 0, 1, 0])]
+        anim.scaling = [GChannelKeyframe(i * 10.0, [1, 1 + (i % 2), 1]) for i in range(4)]
+
+        removed = keyframes.simplify(anim, Tolerance())
+
+        self.assertEqual(4, removed)
+        self.assertEqual([0.0, 50.0], [k.keytime for k in anim.translation])
+        self.assertEqual(2, len(anim.rotation))
+        self.assertEqual(4, len(anim.scaling))
+
+    def test_long_track(self):
+        (interpolate, close) = keyframes.channel_metrics(Tolerance())['translation']
+        checks = [0]
+
+        def counted(a, b):
+            checks[0] += 1
+            return close(a, b)
+
+        # linear runs with a corner every 250 keys
+        n = 2000
+        times = [i * 10.0 for i in range(n)]
+        values = [[float(min(i % 500, 500 - i % 500)), 0, 0] for i in range(n)]
+
+        kept = keyframes._reduce(times, values, interpolate, counted)
+
+        self.assertEqual(kept, list(range(0, n, 250)) + [n - 1])
+        # the segments are bisected, the keys aren't checked for the each extension
+        self.assertLess(checks[0], n * 10)
+        for a, b in zip(kept, kept[1:]):
+            self.assertTrue(keyframes._segment_fits(times, values, a, b, interpolate, close))
+
+    def test_refine_linear(self):
+        (interpolate, close) = keyframes.channel_metrics(Tolerance())['translation']
+
+        times = keyframes.refine([0.0, 7.5, 30.0], lambda ts: [[t, 2 * t, 0] for t in ts], interpolate, close, 0.25)
+
+        self.assertEqual([0.0, 7.5, 30.0], times)
+
+    def test_refine_curve(self):
+        (interpolate, close) = keyframes.channel_metrics(Tolerance(translation=0.01))['translation']
+        sample = lambda ts: [[math.sin(t / 10), 0, 0] for t in ts]
+
+        times = keyframes.refine([0.5, 30.5], sample, interpolate, close, 0.25)
+
+        self.assertEqual(0.5, times[0])
+        self.assertEqual(30.5, times[-1])
+        self.assertLess(len(times), 30)
+        # the result reproduces the curve
+        for a, b in zip(times, times[1:]):
+            mid = (a + b) / 2
+            self.assertTrue(close(sample([mid])[0], interpolate(sample([a])[0], sample([b])[0], 0.5)))
+
+    def test_refine_min_step(self):
+        (interpolate, close) = keyframes.channel_metrics(Tolerance())['translation']
+        step = lambda ts: [[0 if t < 10 else 1, 0, 0] for t in ts]
+
+        times = keyframes.refine([0.0, 20.0], step, interpolate, close, 0.25)
+
+        self.assertTrue(all(b - a >= 0.25 for a, b in zip(times, times[1:])))
+        self.assertLess(len(times), 20)
+
+
+if __name__ == '__main__':
+    unittest.main()
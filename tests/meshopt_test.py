@@ -0,0 +1,104 @@
+import random
+import unittest
+
+from g3d_exporter import meshopt
+
+
+def make_grid(size: int, shuffle: bool = True):
+    """triangle list of size x size quads"""
+    tris = list()
+    for y in range(size):
+        for x in range(size):
+            a = y * (size + 1) + x
+            c = a + size + 1
+            tris.append((a, a + 1, c))
+            tris.append((a + 1, c + 1, c))
+    if shuffle:
+        random.Random(0).shuffle(tris)
+    return [v for tri in tris for v in tri]
+
+
+def triangles(indices):
+    return sorted(tuple(indices[i:i + 3]) for i in range(0, len(indices), 3))
+
+
+def rotated(tri):
+    """the same triangle starting from the least vertex"""
+    i = tri.index(min(tri))
+    return tri[i:] + tri[:i]
+
+
+class MeshoptTest(unittest.TestCase):
+    """runs in blender and in plain python with numpy"""
+
+    def test_cache_misses(self):
+        self.assertEqual(meshopt.cache_misses([0, 1, 2, 1, 2, 3]), 4)
+        self.assertEqual(meshopt.cache_misses([0, 1, 2, 3, 0], cache_size=3), 5)
+        self.assertAlmostEqual(meshopt.acmr([0, 1, 2, 2, 1, 3]), 2.0)
+        self.assertEqual(meshopt.acmr([]), 0.0)
+
+    def test_tipsify(self):
+        indices = make_grid(40)
+
+        optimized = meshopt.tipsify(indices)
+
+        # same triangles with the same winding
+        self.assertEqual(triangles(optimized), triangles(indices))
+        self.assertLess(meshopt.acmr(optimized), 1.0)
+        self.assertGreater(meshopt.acmr(indices), 2.5)
+
+    def test_tipsify_offset(self):
+        # meshpart indices refer to the vertices of the whole mesh
+        indices = [v + 1000 for v in make_grid(4)]
+
+        optimized = meshopt.tipsify(indices)
+
+        self.assertEqual(triangles(optimized), triangles(indices))
+
+    def test_tipsify_single(self):
+        self.assertEqual(meshopt.tipsify([5, 3, 4]), [5, 3, 4])
+
+    def test_stripify(self):
+        indices = meshopt.tipsify(make_grid(20))
+
+        strip = meshopt.stripify(indices)
+
+        # same triangles with the same winding, degenerate joins are dropped
+        self.assertEqual(sorted(map(rotated, meshopt.strip_triangles(strip))), sorted(map(rotated, triangles(indices))))
+        self.assertLess(len(strip), len(indices))
+
+    def test_stripify_joins(self):
+        # two separate triangles, the second one starts at even position
+        strip = meshopt.stripify([0, 1, 2, 3, 4, 5])
+
+        self.assertEqual(meshopt.strip_triangles(strip), [(0, 1, 2), (3, 4, 5)])
+        self.assertEqual(meshopt.stripify([]), [])
+
+    def test_chain_lines(self):
+        self.assertEqual(meshopt.chain_lines([2, 3, 1, 2, 5, 1]), [3, 2, 1, 5])
+        # loop
+        self.assertEqual(meshopt.chain_lines([0, 1, 1, 2, 2, 0]), [0, 1, 2, 0])
+        # two chains and a fork
+        self.assertIsNone(meshopt.chain_lines([0, 1, 2, 3]))
+        self.assertIsNone(meshopt.chain_lines([0, 1, 0, 2, 0, 3]))
+        self.assertEqual(meshopt.chain_lines([]), [])
+
+    def test_vertex_fetch(self):
+        # 5 vertices of 2 floats, vertex 4 isn't referenced
+        vertices = [float(v) for v in range(10)]
+        parts = [[3, 1, 0], [0, 2, 3]]
+
+        (new_vertices, new_parts) = meshopt.optimize_vertex_fetch(vertices, 2, parts)
+
+        self.assertEqual(new_parts, [[0, 1, 2], [2, 3, 0]])
+        self.assertEqual(new_vertices, [6.0, 7.0, 2.0, 3.0, 0.0, 1.0, 4.0, 5.0, 8.0, 9.0])
+        # the same triangles
+        for old, new in zip(parts, new_parts):
+            self.assertEqual([vertices[i * 2] for i in old], [new_vertices[i * 2] for i in new])
+
+    def test_vertex_fetch_empty(self):
+        self.assertEqual(meshopt.optimize_vertex_fetch([], 3, []), ([], []))
+
+
+if __name__ == '__main__':
+    unittest.main()
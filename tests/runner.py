@@ -10,11 +10,29 @@ def main():
 
     sys.path.append(str(Path(__file__).parents[1]))
     import tests
+    import tests.encoder_test
+    import tests.cache_test
+    import tests.dirty_test
+    import tests.baker_test
+    import tests.fcurve_test
+    import tests.keyframes_test
+    import tests.meshopt_test
+    import tests.snapshot_test
+    import tests.spatial_test
 
     classes = [
         tests.builder_test.G3dBuilderTest,
         tests.builder_test.MeshNodeDataBuilderTest,
         tests.builder_test.BlendweightAttributeBuilderTest,
+        tests.encoder_test.EncoderTest,
+        tests.baker_test.BakerTest,
+        tests.cache_test.DiskCacheTest,
+        tests.dirty_test.DirtyTrackerTest,
+        tests.fcurve_test.FCurveTest,
+        tests.keyframes_test.KeyframesTest,
+        tests.meshopt_test.MeshoptTest,
+        tests.snapshot_test.SnapshotTest,
+        tests.spatial_test.SpatialTest,
     ]
 
     # read the cli args that were passed after --
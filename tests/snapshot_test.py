@@ -0,0 +1,45 @@
+import unittest
+
+import numpy as np
+
+from g3d_exporter import snapshot
+
+
+class SnapshotTest(unittest.TestCase):
+    """runs in blender and in plain python with numpy"""
+
+    def test_fingerprint(self):
+        def make(co, name="mesh"):
+            return snapshot.Fingerprint().add_value((name, 1.5)).add_array(np.array(co, dtype=np.float32)).hexdigest()
+
+        self.assertEqual(make([0, 1, 2]), make([0, 1, 2]))
+        self.assertNotEqual(make([0, 1, 2]), make([0, 1, 3]))
+        self.assertNotEqual(make([0, 1, 2]), make([0, 1, 2], "other"))
+        # shape is hashed too
+        a = snapshot.Fingerprint().add_array(np.zeros((2, 3))).hexdigest()
+        b = snapshot.Fingerprint().add_array(np.zeros((3, 2))).hexdigest()
+        self.assertNotEqual(a, b)
+
+    def test_store(self):
+        store = snapshot.SnapshotStore()
+        snap = snapshot.MeshSnapshot("mesh", 3, 1, [])
+
+        self.assertIsNone(store.get("a"))
+        store.put("a", snap)
+        store.put("b", snap)
+        self.assertIs(store.get("a"), snap)
+        self.assertEqual((store.hits, store.misses), (1, 1))
+
+        store.retain(["b"])
+        self.assertIsNone(store.get("a"))
+        self.assertIs(store.get("b"), snap)
+
+    def test_local_indices(self):
+        (vertices, indices) = snapshot.local_indices([7, 5, 6, 6, 5, 8], list("abcdefghi"))
+
+        self.assertEqual(vertices, ["h", "f", "g", "i"])
+        self.assertEqual(indices, [0, 1, 2, 2, 1, 3])
+
+
+if __name__ == '__main__':
+    unittest.main()
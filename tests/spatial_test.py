@@ -0,0 +1,118 @@
+import unittest
+
+import numpy as np
+
+from g3d_exporter import model, spatial
+from g3d_exporter.common import Matrix, Quaternion, Vector
+
+
+def make_skinned_model():
+    """two triangles weighted to the bone at z = 1 and to the root, the bone moves up by 2 in the animation"""
+    mesh = model.GMesh((model.VertexFlag("POSITION", 3), model.VertexFlag("BLENDWEIGHT0", 2)))
+    mesh.vertices = [0, 0, 0, 0, 1,
+                     1, 0, 0, 0, 1,
+                     0, 1, 0, 0, 1,
+                     0, 0, 1, 1, 1,
+                     1, 0, 1, 1, 1,
+                     0, 1, 1, 1, 1]
+    part = model.GMeshPart("part", 'TRIANGLES')
+    part.indices = [0, 1, 2, 3, 4, 5]
+    mesh.parts.append(part)
+
+    root = model.GNode("root")
+    (root.translation, root.rotation, root.scale) = (Vector((0, 0, 0)), Quaternion(), Vector((1, 1, 1)))
+    bone = model.GNode("bone")
+    (bone.translation, bone.rotation, bone.scale) = (Vector((0, 0, 1)), Quaternion(), Vector((1, 1, 1)))
+    root.children.append(bone)
+
+    armature = model.GNode("armature", original=object())
+    armature.children.append(root)
+
+    node = model.GNode("mesh", original=object())
+    (node.translation, node.rotation, node.scale) = (Vector((5, 0, 0)), Quaternion(), Vector((2, 2, 2)))
+    nodepart = model.GNodePart("mat", "part")
+    nodepart.bones = [model.BonePart("root", Matrix.Identity(4), 0),
+                      model.BonePart("bone", Matrix.Translation((0, 0, 1)), 1)]
+    node.parts.append(nodepart)
+
+    parent = model.GNode("parent", original=object())
+    parent.children.append(node)
+
+    track = model.GBoneAnimation("bone")
+    track.set_keyframes([0.0, 1000.0], [[0, 0, 1], [0, 0, 3]], [[0, 0, 0, 1]] * 2, [[1, 1, 1]] * 2)
+    anim = model.GAnimation("move")
+    anim.bones.append(track)
+
+    g3d = model.G3dModel()
+    g3d.meshes.append(mesh)
+    g3d.nodes = [armature, parent]
+    g3d.animations.append(anim)
+    return g3d
+
+
+class SpatialTest(unittest.TestCase):
+    """runs in blender and in plain python with numpy"""
+
+    def test_split_faces(self):
+        # 8 x 4 grid of face centers along x and y
+        centers = np.array([(x, y, 0) for y in range(4) for x in range(8)], dtype=np.float64)
+
+        chunks = spatial.split_faces(centers, 4)
+
+        self.assertEqual(len(np.unique(chunks)), 8)
+        self.assertTrue(np.all(np.bincount(chunks) == 4))
+        # each chunk is a 2 x 2 cell
+        for chunk in range(8):
+            points = centers[chunks == chunk]
+            np.testing.assert_array_equal(points.max(axis=0) - points.min(axis=0), [1, 1, 0])
+
+    def test_split_faces_bounded(self):
+        centers = np.random.default_rng(0).random((1000, 3))
+
+        chunks = spatial.split_faces(centers, 100)
+
+        self.assertLessEqual(np.bincount(chunks).max(), 100)
+        self.assertEqual(chunks.min(), 0)
+
+    def test_split_faces_disabled(self):
+        centers = np.zeros((10, 3))
+        self.assertEqual(spatial.split_faces(centers, 0).tolist(), [0] * 10)
+        self.assertEqual(spatial.split_faces(centers, 10).tolist(), [0] * 10)
+
+    def test_model_bounds(self):
+        bounds = spatial.model_bounds(make_skinned_model())
+
+        part = bounds.meshparts["part"]
+        self.assertEqual(part.min.tolist(), [0, 0, 0])
+        self.assertEqual(part.max.tolist(), [1, 1, 1])
+        self.assertAlmostEqual(part.radius, np.sqrt(0.75))
+
+        # the node space of the parent
+        self.assertEqual(bounds.nodes["mesh"].max.tolist(), [1, 1, 1])
+        self.assertEqual(bounds.nodes["parent"].min.tolist(), [5, 0, 0])
+        self.assertEqual(bounds.nodes["parent"].max.tolist(), [7, 2, 2])
+        self.assertAlmostEqual(bounds.nodes["parent"].radius, np.sqrt(3))
+        self.assertNotIn("armature", bounds.nodes)
+
+        # the upper triangle moves from z = 1 to z = 3
+        anim = bounds.animations["move"]
+        self.assertEqual(anim.min.tolist(), [0, 0, 0])
+        np.testing.assert_allclose(anim.max, [1, 1, 3])
+
+        self.assertEqual(set(bounds.to_dict()), {'nodes', 'meshparts', 'animations'})
+
+    def test_bounds_union(self):
+        a = spatial.Bounds.of_points([[0, 0, 0], [1, 1, 1]])
+        b = spatial.Bounds.of_points([[2, 2, 2], [3, 3, 3]])
+
+        union = spatial.Bounds.union([a, b])
+
+        self.assertEqual(union.min.tolist(), [0, 0, 0])
+        self.assertEqual(union.max.tolist(), [3, 3, 3])
+        self.assertAlmostEqual(union.radius, np.sqrt(27) / 2)
+        self.assertIsNone(spatial.Bounds.union([]))
+        self.assertIsNone(spatial.Bounds.of_points([]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+"""blender-free generators of G3dModel instances"""
+import random
+
+from g3d_exporter.common import Matrix, Quaternion, Vector, new_transorm_matrix
+from g3d_exporter.model import *
+
+default_attributes = (
+    VertexFlag("POSITION", 3),
+    VertexFlag("NORMAL", 3),
+    VertexFlag("TEXCOORD0", 2),
+    VertexFlag("BLENDWEIGHT0", 2),
+)
+
+
+def make_mesh(vertices: int, parts: int = 1, attributes: Tuple[VertexFlag] = default_attributes,
+              rnd: random.Random = None) -> GMesh:
+    """mesh with random vertex data and triangle parts referencing all the vertices"""
+    rnd = rnd or random.Random(0)
+
+    mesh = GMesh(attributes)
+    floats = vertices * mesh.vertex_size()
+    mesh.vertices = [rnd.uniform(-100.0, 100.0) for _ in range(floats)]
+
+    triangles = vertices // 3
+    per_part = max(1, triangles // parts)
+
+    for p in range(parts):
+        part = GMeshPart(f"mesh_part{p}", 'TRIANGLES')
+        first = p * per_part * 3
+        last = vertices if p == parts - 1 else first + per_part * 3
+        part.indices = list(range(first, last - (last - first) % 3))
+        mesh.parts.append(part)
+    return mesh
+
+
+def make_animation(id: str, bones: int, keyframes: int, rnd: random.Random = None) -> GAnimation:
+    rnd = rnd or random.Random(0)
+
+    anim = GAnimation(id)
+    for b in range(bones):
+        bone = GBoneAnimation(f"Bone.{b:03}")
+        keys = list()
+        for k in range(keyframes):
+            loc = Vector((rnd.random(), rnd.random(), rnd.random()))
+            rot = Quaternion((rnd.random(), rnd.random(), rnd.random(), rnd.random())).normalized()
+            keys.append(GBoneKeyframe(k * 1000.0 / 30, new_transorm_matrix(loc, rot, Vector((1, 1, 1)))))
+        bone.keyframes = keys
+        anim.bones.append(bone)
+    return anim
+
+
+def make_model(vertices: int, meshes: int = 1, parts: int = 4, nodes: int = 4,
+               animations: int = 0, bones: int = 8, keyframes: int = 30, seed: int = 0) -> G3dModel:
+    """vertices - per mesh"""
+    rnd = random.Random(seed)
+    mod = G3dModel()
+
+    for m in range(meshes):
+        mesh = make_mesh(vertices, parts, rnd=rnd)
+        for p in mesh.parts:
+            p.id = f"mesh{m}_{p.id}"
+        mod.meshes.append(mesh)
+
+    material = GMaterial("material")
+    material.attributes['diffuse'] = [0.8, 0.8, 0.8]
+    mod.materials.append(material)
+
+    for n in range(nodes):
+        node = GNode(f"node{n}")
+        node.translation = Vector((rnd.random(), rnd.random(), rnd.random()))
+        node.rotation = Quaternion()
+        node.scale = Vector((1.0, 1.0, 1.0))
+
+        for mesh in mod.meshes:
+            for p in mesh.parts:
+                part = GNodePart(material.id, p.id)
+                part.bones = [BonePart(f"Bone.{b:03}", Matrix.Identity(4), b) for b in range(bones)]
+                node.parts.append(part)
+        mod.nodes.append(node)
+
+    for a in range(animations):
+        mod.animations.append(make_animation(f"armature|action{a}", bones, keyframes, rnd))
+
+    return mod